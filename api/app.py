@@ -1,10 +1,22 @@
+import os
 from flask import Flask
-from flasgger import Swagger
-from src.auth import init_firebase
+from src.auth import get_env_level, init_firebase
+from src.cancellation import init_cancellation
+from src.compression import init_compression
+from src.json_codec import CodecJSONProvider
 from api.routes import api_bp
+from src.controllers.conversation_controller import register_websocket
+from src.services.model_manager import get_model_manager
+from src.services.interaction_queue import get_interaction_queue, write_behind_enabled
 
-def create_app():
-    app = Flask(__name__)
+def swagger_enabled() -> bool:
+    """SWAGGER_ENABLED toggles the /apidocs UI; it defaults to off in prod."""
+    default = 'false' if get_env_level() == 'prod' else 'true'
+    return os.getenv('SWAGGER_ENABLED', default).lower() == 'true'
+
+def init_swagger(app):
+    # Imported here: flasgger is only needed when the docs are served
+    from flasgger import Swagger
     
     app.config['SWAGGER'] = {
         'title': 'AutismyVR AI Service API',
@@ -19,13 +31,31 @@ def create_app():
         }
     }
     Swagger(app)
+
+def create_app():
+    app = Flask(__name__)
+    app.json = CodecJSONProvider(app)
+    
+    if swagger_enabled():
+        init_swagger(app)
     
-    try:
-        init_firebase()
-    except Exception as e:
-        print(f"Firebase initialization skipped (will initialize on first auth): {e}")
+    # Authentication is bypassed in dev, so firebase_admin is not even imported there
+    if get_env_level() != 'dev':
+        try:
+            init_firebase()
+        except Exception as e:
+            print(f"Firebase initialization skipped (will initialize on first auth): {e}")
     
     app.register_blueprint(api_bp)
+    register_websocket(app)
+    init_compression(app)
+    init_cancellation(app)
+    
+    get_model_manager().start()
+    
+    if write_behind_enabled():
+        # Starts the flush worker, which also sends entries journaled before a restart
+        get_interaction_queue()
             
     return app
 
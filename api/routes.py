@@ -1,8 +1,12 @@
 from flask import Blueprint
 from src.controllers.chat_controller import chat_bp
 from src.controllers.audio_controller import audio_bp
+from src.controllers.health_controller import health_bp
+from src.controllers.liveportrait_controller import liveportrait_bp
 
 api_bp = Blueprint('api', __name__)
 
 api_bp.register_blueprint(chat_bp)
 api_bp.register_blueprint(audio_bp)
+api_bp.register_blueprint(health_bp)
+api_bp.register_blueprint(liveportrait_bp)
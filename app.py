@@ -1,50 +1,56 @@
 import streamlit as st
+from src.services.chat_service import get_chat_service
 from ui.chat_session_manager import ChatSessionManager
 
+@st.cache_resource
+def load_chat_service():
+    """ChatService and its clients, built once per Streamlit process instead of on every rerun."""
+    return get_chat_service()
+
+def new_chat():
+    st.session_state.chat_manager = ChatSessionManager(load_chat_service())
+    st.session_state.messages = []
+
+def format_timings(timings: dict) -> str:
+    return " · ".join(f"{stage[:-3].replace('_', ' ')} {ms:.0f} ms" for stage, ms in timings.items())
+
 # Streamlit UI entrypoint
 st.title("AutismyVR Chat")
 st.write("Hello 👋")
 
-# Initialize chat history if it doesn't exist
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# The manager holds the session and its recent turns, so it must survive reruns
+if "chat_manager" not in st.session_state:
+    new_chat()
+
+with st.sidebar:
+    st.button("New chat", on_click=new_chat)
+    st.caption(f"Session: {st.session_state.chat_manager.session_uuid or 'not started'}")
 
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("timings"):
+            st.caption(format_timings(message["timings"]))
 
 # Accept user input and process response
 if user_prompt := st.chat_input("What is up?"):
-    # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": user_prompt})
-
-    # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(user_prompt)
 
-    # Initialize the chat session manager
-    chat_manager = ChatSessionManager()
-
-    # Display assistant's response in chat message container
+    chat_manager = st.session_state.chat_manager
     with st.chat_message("assistant"):
-        response_stream = st.empty()  # Placeholder for streamed content
-        full_response = ""
-
         try:
-            # Process and stream response in chunks
-            for chunk in chat_manager.response_generator(user_prompt):
-                full_response += chunk
-                response_stream.markdown(full_response)  # Update the placeholder with streamed content
-
-            # Add assistant's full response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": full_response})
+            # Tokens are rendered as the model produces them
+            full_response = st.write_stream(chat_manager.response_generator(user_prompt))
+            st.caption(format_timings(chat_manager.timings))
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": full_response,
+                "timings": chat_manager.timings
+            })
         except Exception as e:
-            # Display the error message
             error_message = f"Probably OLLAMA service not running. The error exception message: {str(e)}"
             st.session_state.messages.append({"role": "assistant", "content": error_message})
             st.error(error_message)
-
-else:
-    if len(st.session_state.messages) > 0:
-        st.session_state.messages.append({"role": "assistant", "content": st.write('Enter a valid prompt!')})
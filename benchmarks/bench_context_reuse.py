@@ -0,0 +1,77 @@
+"""
+Prompt evaluation per turn of a growing conversation, replaying the full
+history with every message versus continuing from the stored Ollama context
+(OLLAMA_CONTEXT_REUSE).
+
+Both variants run the same scripted conversation against the configured
+Ollama. For each turn the table shows the prompt tokens Ollama evaluated
+(prompt_eval_count) and the latency; with history replay the count grows with
+the conversation, with context reuse it stays at the size of the new message.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_context_reuse.py [--model llama3.2] [--turns 8]
+"""
+import argparse
+from benchmarks.common import print_table, timed
+from src.clients.ollama_client import OllamaClient
+from src.services.generation_budget import get_budget
+
+PROMPTS = [
+    "Hi! My name is Sam and I like trains.",
+    "What is your favourite kind of train?",
+    "I get nervous when the station is loud. What can I do?",
+    "Can you remind me what my name is?",
+    "How fast can a high-speed train go?",
+    "What should I say to a classmate who also likes trains?",
+    "Can you give me a short breathing exercise?",
+    "Thanks! What did we talk about so far?"
+]
+
+def replay_history(client: OllamaClient, prompts: list, budget) -> list:
+    history, turns = [], []
+    for prompt in prompts:
+        result, elapsed_ms = timed(client.request, prompt, budget=budget, history=list(history))
+        if not result:
+            raise RuntimeError("Ollama request failed (is Ollama running?)")
+        turns.append((result['prompt_eval_count'], elapsed_ms))
+        history += [{'role': 'user', 'content': prompt}, {'role': 'assistant', 'content': result['content']}]
+    return turns
+
+def reuse_context(client: OllamaClient, prompts: list, budget) -> list:
+    context, turns = None, []
+    for prompt in prompts:
+        result, elapsed_ms = timed(client.generate, prompt, budget=budget, context=context)
+        if not result:
+            raise RuntimeError("Ollama request failed (is Ollama running?)")
+        turns.append((result['prompt_eval_count'], elapsed_ms))
+        context = result['context']
+    print(f"Final context: {len(context)} tokens, {len(context) * context.itemsize} bytes as array('i')")
+    return turns
+
+def run(model: str, turns: int):
+    client = OllamaClient(model=model)
+    budget = get_budget('text')
+    prompts = (PROMPTS * (turns // len(PROMPTS) + 1))[:turns]
+
+    replayed = replay_history(client, prompts, budget)
+    reused = reuse_context(client, prompts, budget)
+
+    rows = [
+        [turn, replay_tokens, replay_ms, reuse_tokens, reuse_ms]
+        for turn, ((replay_tokens, replay_ms), (reuse_tokens, reuse_ms)) in enumerate(zip(replayed, reused), 1)
+    ]
+    rows.append([
+        'total',
+        sum(t for t, _ in replayed), sum(ms for _, ms in replayed),
+        sum(t for t, _ in reused), sum(ms for _, ms in reused)
+    ])
+
+    print(f"\nModel: {model}, {turns} turns\n")
+    print_table(['turn', 'replay_prompt_tokens', 'replay_ms', 'context_prompt_tokens', 'context_ms'], rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='llama3.2')
+    parser.add_argument('--turns', type=int, default=8)
+    args = parser.parse_args()
+    run(args.model, args.turns)
@@ -0,0 +1,66 @@
+"""
+First-turn latency of ChatService.create_text_session, sequential versus
+speculative title generation (SPECULATIVE_TITLE).
+
+Rails is replaced by an in-memory fake so only title and reply generation are
+measured. Ollama is used for real unless --fake-llm-ms is given, in which case
+the reply and the title are simulated with fixed delays.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_first_turn.py [--runs 5]
+    PYTHONPATH=. python benchmarks/bench_first_turn.py --fake-llm-ms 800 --fake-title-ms 300
+"""
+import argparse
+import time
+import uuid
+from benchmarks.common import percentile, print_table, timed
+from src.services.chat_service import ChatService
+
+PROMPT = "I want to practice saying hello to a new classmate."
+
+class FakeRailsClient:
+    def create_chat_session(self, firebase_uid, title=None, mode="text"):
+        return {"session_uuid": str(uuid.uuid4()), "title": title, "mode": mode}
+
+    def create_interaction(self, **kwargs):
+        return {"id": 1}
+
+def _fake_request(delay_ms, content):
+    def request(*args, **kwargs):
+        time.sleep(delay_ms / 1000)
+        return {"content": content, "total_duration": 0, "eval_count": 0}
+    return request
+
+def run(runs: int, fake_llm_ms: float = None, fake_title_ms: float = None):
+    service = ChatService()
+    service.rails_client = FakeRailsClient()
+    if fake_llm_ms is not None:
+        service.ollama_client.request = _fake_request(fake_llm_ms, "Hello! Nice to meet you.")
+        service.title_service.ollama.request = _fake_request(fake_title_ms or 0, "Saying hello")
+    
+    rows = []
+    for speculative in (False, True):
+        service.title_service.speculative = speculative
+        latencies = []
+        fallbacks = 0
+        for _ in range(runs):
+            result, elapsed_ms = timed(service.create_text_session, PROMPT, 'bench-user')
+            latencies.append(elapsed_ms)
+            fallbacks += result['title'] == service.title_service.fallback_title(PROMPT)
+        rows.append([
+            'speculative' if speculative else 'sequential',
+            runs,
+            percentile(latencies, 50),
+            percentile(latencies, 95),
+            fallbacks
+        ])
+    
+    print_table(['mode', 'runs', 'p50_ms', 'p95_ms', 'fallback_titles'], rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--fake-llm-ms', type=float)
+    parser.add_argument('--fake-title-ms', type=float)
+    args = parser.parse_args()
+    run(args.runs, args.fake_llm_ms, args.fake_title_ms)
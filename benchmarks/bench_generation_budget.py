@@ -0,0 +1,82 @@
+"""
+Latency versus reply length for each generation budget.
+
+Runs a fixed set of prompts through OllamaClient once per channel budget
+(text, audio, title) and once unbounded, then reports latency and output
+length so the GEN_BUDGET_* settings can be tuned.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_generation_budget.py [--model gemma2:1b] [--runs 3]
+"""
+import argparse
+from benchmarks.common import percentile, print_table, timed
+from src.clients.ollama_client import OllamaClient
+from src.services.generation_budget import GenerationBudget, get_budget
+
+PROMPTS = [
+    "Hi! How are you today?",
+    "Can you explain why the sky is blue?",
+    "I feel nervous about meeting new people at school. What can I do?",
+    "Tell me about your favourite animal and why you like it."
+]
+
+def run(model: str, runs: int):
+    client = OllamaClient(model=model)
+    budgets = {
+        'unbounded': GenerationBudget(),
+        'text': get_budget('text'),
+        'audio': get_budget('audio'),
+        'title': get_budget('title')
+    }
+    
+    rows = []
+    samples = []
+    for name, budget in budgets.items():
+        latencies, tokens, words = [], [], []
+        for _ in range(runs):
+            for prompt in PROMPTS:
+                result, elapsed_ms = timed(client.request, prompt, budget=budget)
+                if not result:
+                    continue
+                latencies.append(elapsed_ms)
+                tokens.append(result.get('eval_count', 0))
+                words.append(len(result['content'].split()))
+                samples.append((tokens[-1], elapsed_ms))
+        if not latencies:
+            print(f"{name}: no successful requests (is Ollama running?)")
+            continue
+        rows.append([
+            name,
+            budget.max_tokens or '-',
+            budget.target_sentences or '-',
+            sum(tokens) / len(tokens),
+            sum(words) / len(words),
+            percentile(latencies, 50),
+            percentile(latencies, 95)
+        ])
+    
+    print(f"Model: {model}, {runs} run(s) x {len(PROMPTS)} prompts\n")
+    print_table(['budget', 'max_tokens', 'sentences', 'avg_tokens', 'avg_words', 'p50_ms', 'p95_ms'], rows)
+    
+    if len(samples) > 1:
+        slope, intercept = _fit(samples)
+        print(f"\nLatency ~= {intercept:.0f} ms + {slope:.1f} ms/token "
+              f"(fit over {len(samples)} requests)")
+
+def _fit(samples):
+    """Least-squares line through (tokens, latency_ms) samples."""
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+    if var_x == 0:
+        return 0.0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+    return slope, mean_y - slope * mean_x
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='gemma2:1b')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    run(args.model, args.runs)
@@ -0,0 +1,69 @@
+"""
+Cold-start profile of the API: runs `python -X importtime` on a module in a
+fresh interpreter and reports the slowest imports by cumulative time, plus
+the total import time and the wall time of create_app().
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_import_time.py --top 20
+    ENV_LEVEL=prod PYTHONPATH=. python benchmarks/bench_import_time.py --module api.wsgi
+"""
+import argparse
+import os
+import subprocess
+import sys
+from benchmarks.common import print_table
+
+CREATE_APP_SNIPPET = (
+    "import time; from api.app import create_app; "
+    "start_time = time.perf_counter(); create_app(); "
+    "print((time.perf_counter() - start_time) * 1000)"
+)
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `-X importtime` output.
+
+    Args:
+        stderr: Interpreter stderr containing 'import time: self | cumulative | name' lines
+
+    Returns:
+        List of (name, self_ms, cumulative_ms, depth), in import order
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        entries.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return entries
+
+def _run(args: list) -> subprocess.CompletedProcess:
+    # Warm-up and background work are not part of the import profile
+    env = {**os.environ, 'OLLAMA_WARMUP': 'off', 'BALANCER_HEALTH_INTERVAL': '0'}
+    return subprocess.run([sys.executable] + args, capture_output=True, text=True, env=env, check=True)
+
+def run(module: str, top: int):
+    entries = parse_importtime(_run(['-X', 'importtime', '-c', f'import {module}']).stderr)
+    # Top-level imports (depth 0) add up to the total; nested ones are already counted in their parents
+    total_ms = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)[:top]
+    print_table(
+        ['module', 'self_ms', 'cumulative_ms', 'pct_of_total'],
+        [[name, self_ms, cumulative, 100 * cumulative / total_ms] for name, self_ms, cumulative, _ in slowest]
+    )
+
+    create_app_ms = float(_run(['-c', CREATE_APP_SNIPPET]).stdout.strip().splitlines()[-1])
+    print()
+    print_table(
+        ['module', 'modules_imported', 'import_ms', 'create_app_ms'],
+        [[module, len(entries), total_ms, create_app_ms]]
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='api.app')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+    run(args.module, args.top)
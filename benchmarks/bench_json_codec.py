@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of JSON encoding and decoding of large history payloads,
+comparing the stdlib json module with orjson (when installed), the two
+backends of src/json_codec.py.
+
+The payload mimics GET /history?all=true: --interactions interaction dicts
+with prompts and replies of about --text-size characters.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_json_codec.py --interactions 5000 --text-size 2000
+"""
+import argparse
+import json
+import random
+from benchmarks.common import percentile, print_table, timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WORDS = ['hello', 'today', 'feel', 'calm', 'breathe', 'together', 'música', 'ção', 'great', 'question', 'why']
+
+def build_payload(interactions: int, text_size: int) -> list:
+    rng = random.Random(42)
+
+    def text():
+        words = []
+        while sum(len(w) + 1 for w in words) < text_size:
+            words.append(rng.choice(WORDS))
+        return ' '.join(words).capitalize() + '.'
+
+    return [
+        {
+            "session_uuid": f"00000000-0000-0000-0000-{i // 50:012d}",
+            "session_title": f"Session {i // 50}",
+            "prompt": text(),
+            "response": text(),
+            "created_at": f"2024-01-01T00:{i % 60:02d}:00Z",
+            "model_used": "llama3.2"
+        } for i in range(interactions)
+    ]
+
+def backends() -> dict:
+    codecs = {
+        'json': (
+            lambda obj: json.dumps(obj, separators=(',', ':')).encode('utf-8'),
+            json.loads
+        ),
+        # What Flask's default jsonify does: sorted keys and ASCII escapes
+        'json (flask default)': (
+            lambda obj: json.dumps(obj, sort_keys=True).encode('utf-8'),
+            json.loads
+        )
+    }
+    if orjson is not None:
+        codecs['orjson'] = (orjson.dumps, orjson.loads)
+        codecs['orjson (sorted)'] = (lambda obj: orjson.dumps(obj, option=orjson.OPT_SORT_KEYS), orjson.loads)
+    return codecs
+
+def run(interactions: int, text_size: int, repeat: int):
+    payload = build_payload(interactions, text_size)
+    rows = []
+    for name, (encode, decode) in backends().items():
+        encoded, encode_ms, decode_ms = None, [], []
+        for _ in range(repeat):
+            encoded, elapsed = timed(encode, payload)
+            encode_ms.append(elapsed)
+            _, elapsed = timed(decode, encoded)
+            decode_ms.append(elapsed)
+        megabytes = len(encoded) / 1e6
+        rows.append([
+            name, megabytes,
+            percentile(encode_ms, 50), megabytes / (percentile(encode_ms, 50) / 1000),
+            percentile(decode_ms, 50), megabytes / (percentile(decode_ms, 50) / 1000)
+        ])
+
+    print(f"{interactions} interactions, ~{text_size} characters per text field, median of {repeat} runs")
+    if orjson is None:
+        print("orjson is not installed; only the stdlib backend is measured")
+    print_table(['backend', 'size_mb', 'encode_ms', 'encode_mb_s', 'decode_ms', 'decode_mb_s'], rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interactions', type=int, default=5000)
+    parser.add_argument('--text-size', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.interactions, args.text_size, args.repeat)
@@ -0,0 +1,55 @@
+"""
+Long-term memory index (src/services/memory_index.py): append throughput,
+open time and top-k query latency for one user with many exchanges.
+
+Random unit vectors stand in for embeddings, so no embedding model is
+needed; query cost depends only on the entry count and the dimension
+(384 for all-minilm, 768 for nomic-embed-text).
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_memory_index.py --entries 100000 --dim 384
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+from benchmarks.common import percentile, print_table, timed
+from src.services.memory_index import MemoryIndex
+
+def run(entries: int, dim: int, queries: int, top_k: int, batch: int):
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as directory:
+        memory_index = MemoryIndex(directory, 'bench')
+        add_ms = 0.0
+        for start in range(0, entries, batch):
+            count = min(batch, entries - start)
+            rows = [
+                {"session_uuid": f"session-{(start + n) // 50}", "prompt": f"Prompt {start + n}", "response": "Reply."}
+                for n in range(count)
+            ]
+            _, elapsed = timed(memory_index.add, rng.standard_normal((count, dim), dtype=np.float32), rows)
+            add_ms += elapsed
+
+        reopened, open_ms = timed(MemoryIndex, directory, 'bench')
+        query_vectors = rng.standard_normal((queries + 5, dim), dtype=np.float32)
+        for query in query_vectors[:5]:
+            reopened.search(query, top_k)
+        latencies = [timed(reopened.search, query, top_k)[1] for query in query_vectors[5:]]
+
+        size_mb = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+
+    print(f"{entries} entries x {dim} dims, top {top_k}, {queries} queries\n")
+    print_table(
+        ['entries', 'disk_mb', 'add_entries_s', 'open_ms', 'query_p50_ms', 'query_p95_ms'],
+        [[entries, size_mb, entries / (add_ms / 1000), open_ms, percentile(latencies, 50), percentile(latencies, 95)]]
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=12)
+    parser.add_argument('--batch', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.entries, args.dim, args.queries, args.top_k, args.batch)
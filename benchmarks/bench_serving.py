@@ -0,0 +1,70 @@
+"""
+HTTP load test for comparing serving profiles (Werkzeug dev server versus
+gunicorn) on the same endpoint.
+
+Sends --requests requests from --concurrency client threads and reports
+throughput and latency percentiles.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_serving.py --url http://localhost:5001/chat \\
+        --json '{"prompt": "Hi"}' --concurrency 16 --requests 200
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmarks.common import percentile, print_table
+
+_local = threading.local()
+
+def _session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+def _send(url: str, payload, headers: dict, timeout: float):
+    start_time = time.perf_counter()
+    try:
+        if payload is None:
+            response = _session().get(url, headers=headers, timeout=timeout)
+        else:
+            response = _session().post(url, json=payload, headers=headers, timeout=timeout)
+        ok = response.status_code < 500
+    except requests.RequestException:
+        ok = False
+    return ok, (time.perf_counter() - start_time) * 1000
+
+def run(url: str, payload, headers: dict, concurrency: int, total: int, timeout: float):
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _send(url, payload, headers, timeout), range(total)))
+    elapsed = time.perf_counter() - start_time
+    
+    latencies = [ms for ok, ms in results if ok]
+    print_table(
+        ['url', 'concurrency', 'requests', 'errors', 'req_per_s', 'p50_ms', 'p95_ms', 'p99_ms'],
+        [[
+            url, concurrency, total, total - len(latencies), total / elapsed,
+            percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99)
+        ]]
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--json', help='JSON body; sends POST when given, GET otherwise')
+    parser.add_argument('--token', help='Firebase ID token for stag/prod')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+    run(
+        args.url,
+        json.loads(args.json) if args.json else None,
+        {'Authorization': f'Bearer {args.token}'} if args.token else {},
+        args.concurrency,
+        args.requests,
+        args.timeout
+    )
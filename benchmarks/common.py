@@ -0,0 +1,34 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import math
+import time
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed milliseconds)."""
+    start_time = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start_time) * 1000
+
+def print_table(headers, rows):
+    """Print rows as a plain-text table with aligned columns."""
+    cells = [[str(h) for h in headers]] + [[_format(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    
+    for index, row in enumerate(cells):
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print('  '.join('-' * width for width in widths))
+
+def _format(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return str(value)
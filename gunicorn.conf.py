@@ -0,0 +1,38 @@
+"""
+Production serving profile for the API.
+
+    gunicorn -c gunicorn.conf.py api.wsgi:app
+
+The app is preloaded in the master process so services, Firebase, prompt
+files and model warm-up run once before the workers are forked. Each worker
+serves requests from a thread pool; LLM calls spend most of their time waiting
+on Ollama, so threads scale better than processes.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
+preload_app = True
+
+# Must exceed the slowest request: Ollama read timeout plus TTS and LivePortrait
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+# On SIGTERM, workers stop accepting and get this long to finish in-flight requests
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '180'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+def post_fork(server, worker):
+    from src.lifecycle import after_fork
+    after_fork()
+
+def worker_exit(server, worker):
+    from src.lifecycle import shutdown
+    shutdown(timeout=graceful_timeout)
+
+def on_exit(server):
+    from src.lifecycle import shutdown
+    shutdown(timeout=graceful_timeout)
@@ -0,0 +1,4 @@
+-- Rolling conversation summary of long sessions
+ALTER TABLE chat_sessions
+ADD COLUMN IF NOT EXISTS summary TEXT,
+ADD COLUMN IF NOT EXISTS summarized_turns INTEGER NOT NULL DEFAULT 0;
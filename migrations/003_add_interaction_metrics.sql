@@ -0,0 +1,5 @@
+-- Per-interaction token counts and stage timings (JSON, milliseconds per stage)
+ALTER TABLE interactions
+ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER,
+ADD COLUMN IF NOT EXISTS completion_tokens INTEGER,
+ADD COLUMN IF NOT EXISTS timings TEXT;
@@ -0,0 +1,3 @@
+-- Keyset pagination of a user's sessions and a session's interactions (direct DB reads)
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_firebase_uid_id ON chat_sessions(firebase_uid, id);
+CREATE INDEX IF NOT EXISTS idx_interactions_session_id_id ON interactions(session_id, id);
@@ -0,0 +1,2 @@
+-- Day-windowed interaction metrics (GET /metrics/interactions)
+CREATE INDEX IF NOT EXISTS idx_interactions_created_at ON interactions(created_at);
@@ -1,22 +1,23 @@
 # Ollama Client Connector
-import ollama
+from src.clients.ollama_client import get_ollama_client
 
 
 class OllamaClient:
     # Ollama Model
     llm_model = "llama3.2"
 
-    def request(self, prompt):
+    def request(self, prompt, options=None):
         try:
-            # Generate the response
-            response = ollama.chat(
+            # Generate the response through the shared, pooled client
+            response = get_ollama_client().chat(
                 model=self.llm_model,
                 messages=[
                     {
                         'role': 'user',
                         'content': prompt
                     }
-                ]
+                ],
+                options=options
             )
 
             return {"content": response['message']['content'], "total_duration": response['total_duration']}
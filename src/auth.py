@@ -4,10 +4,9 @@ Firebase Authentication module for validating ID tokens from Unity clients.
 import os
 from functools import wraps
 from flask import request, jsonify, g
-import firebase_admin
-from firebase_admin import credentials, auth
 
-# Initialize Firebase Admin SDK
+# Initialize Firebase Admin SDK. firebase_admin is imported on first use: it is
+# heavy and not needed at all in dev, where authentication is bypassed.
 _firebase_app = None
 
 def init_firebase():
@@ -23,6 +22,9 @@ def init_firebase():
     if _firebase_app is not None:
         return _firebase_app
     
+    import firebase_admin
+    from firebase_admin import credentials
+    
     try:
         # Option 1: Path to service account JSON file
         cred_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
@@ -65,6 +67,8 @@ def verify_firebase_token(token: str):
     if _firebase_app is None:
         init_firebase()
     
+    from firebase_admin import auth
+    
     try:
         decoded_token = auth.verify_id_token(token)
         return decoded_token
@@ -0,0 +1,207 @@
+"""
+Request cancellation: stop working on a turn once nobody will see its result.
+
+Each HTTP request runs in a CancelScope holding its deadline (the
+X-Request-Deadline header) and a probe telling whether the client is still
+connected. Backend calls cap their timeouts to the time left and check the
+scope first; Ollama generations are abandoned between chunks, which closes
+the connection and makes Ollama stop generating. A cancelled turn raises
+RequestCancelled at the next check, so later stages (TTS, LivePortrait, the
+Rails write) never start.
+"""
+import contextvars
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+CLIENT_CLOSED_REQUEST = 499
+
+_current_scope = contextvars.ContextVar('cancel_scope', default=None)
+
+class RequestCancelled(Exception):
+    pass
+
+class ClientDisconnected(RequestCancelled):
+    pass
+
+class DeadlineExceeded(RequestCancelled):
+    pass
+
+class CancelScope:
+    """
+    Cancellation state of one request or turn.
+
+    Args:
+        deadline: Absolute time.time() after which the work is abandoned, if any
+        probe: Callable returning True once the client is gone, if any; it is
+            called at most every probe_interval seconds
+    """
+
+    def __init__(self, deadline: float = None, probe=None, probe_interval: float = 0.2):
+        self.deadline = deadline
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.reason = None
+        self._probed_at = 0
+
+    def cancel(self, reason: str = 'disconnected'):
+        self.reason = self.reason or reason
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason:
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.reason = 'deadline'
+        elif self.probe is not None and time.time() - self._probed_at >= self.probe_interval:
+            self._probed_at = time.time()
+            if self.probe():
+                self.reason = 'disconnected'
+        return self.reason is not None
+
+    def check(self):
+        """
+        Raises:
+            DeadlineExceeded: If the deadline passed
+            ClientDisconnected: If the client is gone
+        """
+        if self.cancelled:
+            if self.reason == 'deadline':
+                raise DeadlineExceeded("Request deadline exceeded")
+            raise ClientDisconnected("Client disconnected")
+
+    def timeout(self, default: float) -> float:
+        """default capped to the time left before the deadline (checks the scope first)."""
+        self.check()
+        if self.deadline is None:
+            return default
+        return min(default, self.deadline - time.time())
+
+def current_scope():
+    """The CancelScope of the running request, or None outside one."""
+    return _current_scope.get()
+
+def check_cancelled():
+    """Raise RequestCancelled if the running request was cancelled."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+def backend_timeout(default: float) -> float:
+    """Timeout for a backend call: default, capped to the running request's deadline."""
+    scope = _current_scope.get()
+    return scope.timeout(default) if scope is not None else default
+
+@contextmanager
+def cancel_scope(scope: CancelScope):
+    """Run the enclosed code (and what it calls on this thread) in scope."""
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+@contextmanager
+def closing_stream(iterable):
+    """
+    Iterate a stream and close it when done or abandoned, which for an
+    Ollama response closes the connection and ends the generation.
+    """
+    iterator = iter(iterable)
+    try:
+        yield iterator
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+def submit_in_scope(executor, fn, *args, **kwargs):
+    """Submit to an executor so that fn runs in the caller's cancel scope."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def parse_deadline(value: str) -> float:
+    """
+    Parse X-Request-Deadline: Unix time in seconds (fractions allowed) or an
+    ISO 8601 timestamp with a UTC offset.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            raise ValueError("Deadline timestamp needs a UTC offset")
+        return parsed.timestamp()
+
+def socket_probe(environ: dict):
+    """
+    Disconnect probe for the client socket of a WSGI request (gunicorn and
+    the Werkzeug server expose it), or None when it is not available.
+
+    While a request is being answered the client sends nothing more, so a
+    socket that reads as closed means the client hung up.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None or not hasattr(sock, 'recv'):
+        return None
+
+    def probe() -> bool:
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
+    return probe
+
+def init_cancellation(app):
+    """
+    Run every request in a CancelScope: its X-Request-Deadline (400 if
+    malformed, 504 if already past) and client disconnects. Disconnect
+    detection is disabled with CANCEL_ON_DISCONNECT=false, and skipped for
+    requests with an Idempotency-Key: their client disconnects to retry, and
+    the retry collects the result of the turn still running.
+    """
+    from flask import g, jsonify, request
+
+    watch_disconnects = os.getenv('CANCEL_ON_DISCONNECT', 'true').lower() == 'true'
+
+    @app.before_request
+    def open_scope():
+        deadline = request.headers.get('X-Request-Deadline')
+        if deadline:
+            try:
+                deadline = parse_deadline(deadline)
+            except ValueError:
+                return jsonify({"error": "X-Request-Deadline must be a Unix timestamp or ISO 8601 time"}), 400
+            if deadline <= time.time():
+                return jsonify({"error": "Request deadline exceeded"}), 504
+
+        probe = None
+        if watch_disconnects and not request.headers.get('Idempotency-Key'):
+            probe = socket_probe(request.environ)
+        scope = CancelScope(deadline or None, probe)
+        g.cancel_scope = scope
+        g.cancel_scope_token = _current_scope.set(scope)
+
+    @app.teardown_request
+    def close_scope(error=None):
+        token = g.pop('cancel_scope_token', None)
+        if token is not None:
+            try:
+                _current_scope.reset(token)
+            except ValueError:
+                # Streamed responses are torn down from another context
+                pass
+
+def cancelled_response(error: RequestCancelled):
+    """Response for a cancelled request: 504 past the deadline, 499 when the client left."""
+    from flask import jsonify
+
+    if isinstance(error, DeadlineExceeded):
+        return jsonify({"error": str(error)}), 504
+    return jsonify({"error": str(error)}), CLIENT_CLOSED_REQUEST
@@ -0,0 +1,192 @@
+"""
+Least-outstanding-requests load balancing across a pool of backend URLs,
+with active health checks and, for Ollama, awareness of the models each
+node has loaded.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from src.cancellation import RequestCancelled
+from src.clients.http import http
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+def http_probe(health_path: str = '/'):
+    """Probe that treats any non-5xx answer on health_path as healthy."""
+    def probe(url: str):
+        response = http().get(f'{url}{health_path}', timeout=2)
+        return response.status_code < 500, None
+    return probe
+
+class BackendNode:
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.models = set()
+        self.last_checked = None
+
+    def snapshot(self) -> dict:
+        return {
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'served': self.served,
+            'consecutive_failures': self.failures,
+            'models': sorted(self.models)
+        }
+
+class LoadBalancer:
+    """
+    Routes each request to the healthy node with the fewest requests in flight.
+    
+    When a model is given, nodes that report it loaded are preferred unless they
+    are more than model_slack requests busier than the least loaded node. A node
+    is marked unhealthy after max_failures consecutive failed requests or a
+    failed probe, and back in rotation after a successful probe. If no node is
+    healthy, all nodes are tried.
+    """
+
+    def __init__(self, name: str, urls: list, probe=None, health_interval: float = None,
+                 max_failures: int = 3, model_slack: int = 2):
+        prefix = name.upper()
+        self.name = name
+        self.nodes = [BackendNode(url) for url in urls]
+        self.probe = probe or http_probe(os.getenv(f'{prefix}_HEALTH_PATH', '/'))
+        self.health_interval = health_interval if health_interval is not None else float(os.getenv('BALANCER_HEALTH_INTERVAL', '10'))
+        self.max_failures = max_failures
+        self.model_slack = model_slack
+        self._lock = threading.Lock()
+        self._checker = None
+        self._stop = threading.Event()
+
+    @property
+    def urls(self) -> list:
+        return [node.url for node in self.nodes]
+
+    def ordered(self, model: str = None) -> list:
+        """URLs from most to least preferred for the next request."""
+        self.start_health_checks()
+        with self._lock:
+            return [n.url for n in self._ranked(model)]
+
+    def acquire(self, model: str = None, exclude=()) -> str:
+        """
+        Pick the best node and count a request on it, in one step, so
+        concurrent requests see each other's load. Release it with end().
+        
+        Args:
+            model: Model the request needs, for Ollama
+            exclude: URLs not to pick (already tried), unless nothing else is left
+            
+        Returns:
+            URL of the node
+        """
+        self.start_health_checks()
+        with self._lock:
+            ranked = self._ranked(model)
+            node = next((n for n in ranked if n.url not in exclude), ranked[0])
+            node.outstanding += 1
+            node.served += 1
+            return node.url
+
+    def begin(self, url: str):
+        with self._lock:
+            node = self._node(url)
+            node.outstanding += 1
+            node.served += 1
+
+    def end(self, url: str, success: bool = True):
+        with self._lock:
+            node = self._node(url)
+            node.outstanding = max(0, node.outstanding - 1)
+            if success:
+                node.failures = 0
+            else:
+                node.failures += 1
+                if node.failures >= self.max_failures:
+                    node.healthy = False
+
+    @contextmanager
+    def lease(self, model: str = None):
+        """Hold the best node for the duration of a request and yield its URL."""
+        url = self.acquire(model)
+        success = False
+        try:
+            yield url
+            success = True
+        except (RequestCancelled, GeneratorExit):
+            # Abandoned by the caller (a cancelled request, or a closed stream),
+            # not a failure of the node
+            success = True
+            raise
+        finally:
+            self.end(url, success)
+
+    def check_health(self):
+        """Probe every node once, updating health and loaded models."""
+        for node in self.nodes:
+            try:
+                healthy, models = self.probe(node.url)
+            except Exception:
+                healthy, models = False, None
+            with self._lock:
+                node.healthy = healthy
+                node.last_checked = time.time()
+                if healthy:
+                    node.failures = 0
+                if models is not None:
+                    node.models = set(models)
+
+    def start_health_checks(self):
+        if self.health_interval <= 0 or (self._checker and self._checker.is_alive()):
+            return
+        with self._lock:
+            if self._checker and self._checker.is_alive():
+                return
+            self._stop.clear()
+            self._checker = threading.Thread(target=self._run, name=f'{self.name}-health', daemon=True)
+            self._checker.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {node.url: node.snapshot() for node in self.nodes}
+
+    def _run(self):
+        while True:
+            self.check_health()
+            if self._stop.wait(self.health_interval):
+                break
+
+    def _ranked(self, model: str = None) -> list:
+        candidates = [n for n in self.nodes if n.healthy] or list(self.nodes)
+        by_load = sorted(candidates, key=lambda n: (n.outstanding, n.served))
+        if model:
+            least = by_load[0].outstanding
+            preferred = [n for n in by_load if model in n.models and n.outstanding <= least + self.model_slack]
+            by_load = preferred + [n for n in by_load if n not in preferred]
+        return by_load
+
+    def _node(self, url: str) -> BackendNode:
+        for node in self.nodes:
+            if node.url == url:
+                return node
+        raise KeyError(url)
+
+def get_balancer(name: str, urls: list, probe=None) -> LoadBalancer:
+    """Return the process-wide balancer for name, creating it on first use."""
+    with _balancers_lock:
+        if name not in _balancers:
+            _balancers[name] = LoadBalancer(name, urls, probe=probe)
+        return _balancers[name]
+
+def balancer_states() -> dict:
+    with _balancers_lock:
+        balancers = dict(_balancers)
+    return {name: balancer.snapshot() for name, balancer in balancers.items()}
@@ -0,0 +1,12 @@
+"""
+The requests library, shared by the HTTP clients.
+
+requests is imported on the first call instead of at module import, so that
+importing api.app stays light and new containers come up fast.
+"""
+
+def http():
+    """Return the requests module, importing it on first use."""
+    import requests
+
+    return requests
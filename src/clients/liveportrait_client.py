@@ -1,9 +1,15 @@
-import requests
 import os
+from src.clients.http import http
+from src.clients.resilience import get_backend, split_urls
 
 class LivePortraitClient:
     def __init__(self):
-        self.api_url = os.getenv('LIVEPORTRAIT_API_URL', 'http://localhost:8002')
+        self.backend = get_backend(
+            'liveportrait',
+            split_urls(os.getenv('LIVEPORTRAIT_API_URL', 'http://localhost:8002')),
+            max_timeout=float(os.getenv('LIVEPORTRAIT_TIMEOUT', '120'))
+        )
+        self.api_url = self.backend.urls[0]
         self.enabled = os.getenv('LIVEPORTRAIT_ENABLED', 'false').lower() == 'true'
     
     def generate(self, text: str, audio_url: str = None) -> dict:
@@ -15,20 +21,32 @@ class LivePortraitClient:
             audio_url: Optional audio URL for lip-sync
             
         Returns:
-            LivePortrait data or None if disabled
+            LivePortrait data or None if disabled, failed or the circuit is open
         """
         if not self.enabled:
             return None
         
-        try:
-            response = requests.post(
-                f'{self.api_url}/generate',
+        def post(api_url, timeout):
+            response = http().post(
+                f'{api_url}/generate',
                 json={'text': text, 'audio_url': audio_url},
-                timeout=120
+                timeout=timeout
             )
             response.raise_for_status()
             return response.json()
+        
+        try:
+            return self.backend.call(post)
         except Exception as e:
             print(f"LivePortrait generation error: {e}")
             return None
 
+_liveportrait_client = None
+
+def get_liveportrait_client() -> LivePortraitClient:
+    """Return the process-wide LivePortraitClient, shared by the services."""
+    global _liveportrait_client
+    
+    if _liveportrait_client is None:
+        _liveportrait_client = LivePortraitClient()
+    return _liveportrait_client
@@ -0,0 +1,211 @@
+"""
+Load-adaptive model routing: when the configured model of an endpoint is
+too busy or too slow to answer within the endpoint's latency target, the
+request moves to the next (smaller) model the endpoint allows.
+
+Every Ollama call reports to the router, so it knows how many requests each
+model has in flight and how fast each model has recently been generating.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Fallbacks after an endpoint's configured model, largest first
+DEFAULT_ROUTES = {
+    'text': ['gemma2:1b', 'gemma2:270m'],
+    'audio': ['gemma2:270m']
+}
+DEFAULT_SLO_MS = {'text': 8000, 'audio': 3000}
+# Seconds a model picked by choose() counts as busy before its call starts
+RESERVATION_TTL = 10
+
+_model_router = None
+_model_router_lock = threading.Lock()
+
+def model_routing_enabled() -> bool:
+    return os.getenv('MODEL_ROUTING', 'false').lower() == 'true'
+
+class _ModelStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.tokens_per_second = None
+        self.overhead_ms = None
+        self.completion_tokens = None
+        self.updated_at = None
+        self.routed = 0
+        self.reserved = deque()
+
+class ModelRouter:
+    """
+    Picks the model for each request from an endpoint's allow-list.
+
+    The estimated latency of a model is the time it needs for one reply,
+    from the moving averages of its load and prompt evaluation time, reply
+    length and tokens per second, times the number of rounds it will wait
+    behind the requests in flight (parallel at a time). The first allowed
+    model whose estimate is within the endpoint's SLO is chosen; a model
+    without recent measurements counts as fast, so traffic returns to the
+    preferred model once its stats expire and it is idle; a busy model keeps
+    being estimated from its last measurements. A model chosen for a request
+    counts as busy from that moment, so a burst spreads over the models. If
+    no model meets the SLO, the fastest estimate wins.
+
+    The allow-list of an endpoint is MODEL_ROUTER_<ENDPOINT>_MODELS
+    (comma-separated, preferred first; by default the endpoint's configured
+    model followed by DEFAULT_ROUTES) and its SLO MODEL_ROUTER_<ENDPOINT>_SLO_MS.
+
+    Args:
+        parallel: Requests a model serves at once (MODEL_ROUTER_PARALLEL, default 1,
+            matching Ollama's OLLAMA_NUM_PARALLEL)
+        stats_ttl: Seconds after which a model's measurements are ignored
+            (MODEL_ROUTER_STATS_TTL, default 60)
+        smoothing: Weight of the newest measurement in the moving averages
+    """
+
+    def __init__(self, parallel: int = None, stats_ttl: float = None, smoothing: float = 0.3):
+        self.parallel = max(1, parallel or int(os.getenv('MODEL_ROUTER_PARALLEL', '1')))
+        self.stats_ttl = stats_ttl if stats_ttl is not None else float(os.getenv('MODEL_ROUTER_STATS_TTL', '60'))
+        self.smoothing = smoothing
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """Calls in flight belong to the parent process."""
+        self._lock = threading.Lock()
+        for stats in self._models.values():
+            stats.in_flight = 0
+            stats.reserved.clear()
+
+    @contextmanager
+    def track(self, model: str):
+        """
+        Count a call to a model as in flight until it ends.
+
+        Yields:
+            Dict for the caller to fill with Ollama's eval_count and durations
+            (nanoseconds), which update the model's averages
+        """
+        observed = {}
+        with self._lock:
+            stats = self._stats(model)
+            stats.in_flight += 1
+            if stats.reserved:
+                # The call choose() reserved the model for has started
+                stats.reserved.popleft()
+        try:
+            yield observed
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                self._observe(stats, observed)
+
+    def estimate_ms(self, model: str):
+        """Expected latency of a new request to a model, or None without recent measurements."""
+        with self._lock:
+            return self._estimate(self._stats(model))
+
+    def allowed(self, endpoint: str, default: str) -> list:
+        """Models an endpoint may use, preferred first."""
+        configured = os.getenv(f'MODEL_ROUTER_{endpoint.upper()}_MODELS')
+        if configured:
+            return [m.strip() for m in configured.split(',') if m.strip()]
+        return list(dict.fromkeys([default] + DEFAULT_ROUTES.get(endpoint, [])))
+
+    def slo_ms(self, endpoint: str) -> float:
+        return float(os.getenv(f'MODEL_ROUTER_{endpoint.upper()}_SLO_MS', DEFAULT_SLO_MS.get(endpoint, 8000)))
+
+    def choose(self, endpoint: str, default: str) -> str:
+        """
+        Model for the next request of an endpoint.
+
+        Args:
+            endpoint: 'text' or 'audio'
+            default: The endpoint's configured model
+
+        Returns:
+            Model name from the endpoint's allow-list
+        """
+        slo = self.slo_ms(endpoint)
+        with self._lock:
+            best = None
+            for model in self.allowed(endpoint, default):
+                stats = self._stats(model)
+                estimate = self._estimate(stats)
+                if estimate is None or estimate <= slo:
+                    best = (estimate, model)
+                    break
+                if best is None or estimate < best[0]:
+                    best = (estimate, model)
+            chosen = self._stats(best[1])
+            chosen.routed += 1
+            chosen.reserved.append(time.time())
+            return best[1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                model: {
+                    'in_flight': stats.in_flight,
+                    'tokens_per_second': _rounded(stats.tokens_per_second),
+                    'overhead_ms': _rounded(stats.overhead_ms),
+                    'completion_tokens': _rounded(stats.completion_tokens),
+                    'estimate_ms': _rounded(self._estimate(stats)),
+                    'routed': stats.routed
+                } for model, stats in self._models.items()
+            }
+
+    def _estimate(self, stats: _ModelStats):
+        while stats.reserved and time.time() - stats.reserved[0] > RESERVATION_TTL:
+            stats.reserved.popleft()
+        busy = stats.in_flight + len(stats.reserved)
+        if stats.updated_at is None:
+            return None
+        if not busy and time.time() - stats.updated_at > self.stats_ttl:
+            return None
+        reply_ms = stats.overhead_ms + stats.completion_tokens / stats.tokens_per_second * 1000
+        return (busy // self.parallel + 1) * reply_ms
+
+    def _observe(self, stats: _ModelStats, observed: dict):
+        eval_count = observed.get('eval_count')
+        eval_duration = observed.get('eval_duration')
+        if not eval_count or not eval_duration:
+            return
+        overhead_ms = ((observed.get('load_duration') or 0) + (observed.get('prompt_eval_duration') or 0)) / 1e6
+        measured = {
+            'tokens_per_second': eval_count / (eval_duration / 1e9),
+            'overhead_ms': overhead_ms,
+            'completion_tokens': eval_count
+        }
+        fresh = stats.updated_at is None or time.time() - stats.updated_at > self.stats_ttl
+        for name, value in measured.items():
+            previous = getattr(stats, name)
+            setattr(stats, name, value if fresh else previous + self.smoothing * (value - previous))
+        stats.updated_at = time.time()
+
+    def _stats(self, model: str) -> _ModelStats:
+        if model not in self._models:
+            self._models[model] = _ModelStats()
+        return self._models[model]
+
+def _rounded(value):
+    return round(value, 1) if value is not None else None
+
+def routed(client, endpoint: str, router: ModelRouter = None):
+    """
+    The Ollama client to answer an endpoint's request with: the client
+    itself, or one for the model the router picks instead.
+    """
+    if router is None:
+        return client
+    return client.for_model(router.choose(endpoint, client.llm_model))
+
+def get_model_router() -> ModelRouter:
+    global _model_router
+
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter()
+    return _model_router
@@ -1,37 +1,415 @@
-import ollama
 import os
+import queue
+import threading
+import time
+from array import array
+from src.cancellation import RequestCancelled, closing_stream, current_scope
+from src.clients.balancer import get_balancer
+from src.clients.http import http
+from src.clients.model_router import get_model_router
+from src.clients.resilience import split_urls
+
+DEFAULT_KEEP_ALIVE = '30m'
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def ollama_hosts() -> list:
+    """OLLAMA_HOST accepts a comma-separated list of Ollama nodes."""
+    hosts = split_urls(os.getenv('OLLAMA_HOST', 'http://localhost:11434'))
+    return [host if '://' in host else f'http://{host}' for host in hosts]
+
+def get_ollama_client(host: str = None) -> 'ollama.Client':
+    """
+    Return the process-wide Ollama client for a host (the first configured
+    host by default).
+    
+    Each client is created once with explicit connect and read timeouts and a
+    bounded connection pool so HTTP connections are reused across requests
+    and services. ollama (and the httpx/pydantic stack behind it) is only
+    imported here, on first use, to keep it off the cold-start path.
+    """
+    host = host or ollama_hosts()[0]
+    
+    if host not in _clients:
+        with _clients_lock:
+            if host not in _clients:
+                import httpx
+                import ollama
+                
+                _clients[host] = ollama.Client(
+                    host=host,
+                    timeout=httpx.Timeout(
+                        float(os.getenv('OLLAMA_READ_TIMEOUT', '120')),
+                        connect=float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5'))
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv('OLLAMA_MAX_CONNECTIONS', '20')),
+                        max_keepalive_connections=int(os.getenv('OLLAMA_MAX_KEEPALIVE_CONNECTIONS', '10'))
+                    )
+                )
+    return _clients[host]
+
+def reset_ollama_clients():
+    """Drop the pooled clients, e.g. in a forked worker that must not share sockets with its parent."""
+    global _clients_lock
+    
+    _clients_lock = threading.Lock()
+    _clients.clear()
+
+def ollama_probe(host: str):
+    """Health probe for an Ollama node, returning the models it has loaded."""
+    response = http().get(f'{host}/api/ps', timeout=2)
+    response.raise_for_status()
+    return True, [normalize_model_name(m.get('model') or m['name']) for m in response.json().get('models', [])]
+
+def get_ollama_balancer():
+    """Model-aware least-outstanding-requests balancer over the Ollama nodes."""
+    return get_balancer('ollama', ollama_hosts(), probe=ollama_probe)
+
+def normalize_model_name(model: str) -> str:
+    """Ollama reports untagged models with the implicit ':latest' tag."""
+    return model if ':' in model else f'{model}:latest'
+
+def get_keep_alive(model: str):
+    """
+    Resolve the keep_alive for a model.
+    
+    OLLAMA_KEEP_ALIVE sets the default and OLLAMA_KEEP_ALIVE_MODELS overrides it
+    per model, e.g. 'llama3.2=1h,gemma2:270m=-1'.
+    
+    Args:
+        model: Model name
+        
+    Returns:
+        keep_alive duration string (or -1 to keep the model loaded indefinitely)
+    """
+    overrides = {}
+    for entry in os.getenv('OLLAMA_KEEP_ALIVE_MODELS', '').split(','):
+        if '=' in entry:
+            name, value = entry.rsplit('=', 1)
+            overrides[normalize_model_name(name.strip())] = value.strip()
+    
+    keep_alive = overrides.get(normalize_model_name(model), os.getenv('OLLAMA_KEEP_ALIVE', DEFAULT_KEEP_ALIVE))
+    return int(keep_alive) if keep_alive.lstrip('-').isdigit() else keep_alive
 
 class OllamaClient:
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, options: dict = None):
         self.llm_model = model or os.getenv('OLLAMA_MODEL', 'llama3.2')
-        self.ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+        self.options = options or {}
 
-    def request(self, prompt: str, system_prompt: str = None):
-        try:
-            messages = []
-            if system_prompt:
-                messages.append({
-                    'role': 'system',
-                    'content': system_prompt
-                })
-            messages.append({
-                'role': 'user',
-                'content': prompt
-            })
+    def for_model(self, model: str) -> 'OllamaClient':
+        """This client, or one with the same options for another model."""
+        return self if model == self.llm_model else OllamaClient(model=model, options=self.options)
+
+    def request(self, prompt: str, system_prompt: str = None, options: dict = None, budget=None,
+                history: list = None):
+        """
+        Send a chat request through the shared Ollama client.
+        
+        Args:
+            prompt: User message
+            system_prompt: Optional system prompt
+            options: Generation options (num_ctx, num_predict, temperature, ...)
+                overriding the client defaults for this call
+            budget: Optional GenerationBudget capping the reply length; its
+                instruction is appended to the system prompt and the reply is
+                trimmed to its target sentence count
+            history: Optional earlier turns as chat messages ({"role", "content"})
             
-            response = ollama.chat(
-                model=self.llm_model,
-                messages=messages
-            )
+        Returns:
+            Dict with content, token counts (eval_count, prompt_eval_count) and
+            Ollama's durations in nanoseconds (total_duration, load_duration,
+            prompt_eval_duration, eval_duration), or None on error
+            
+        Raises:
+            RequestCancelled: If the calling request was cancelled
+        """
+        try:
+            with get_model_router().track(self.llm_model) as observed, \
+                    get_ollama_balancer().lease(model=normalize_model_name(self.llm_model)) as host:
+                response = _complete(
+                    get_ollama_client(host).chat,
+                    'message',
+                    model=self.llm_model,
+                    messages=self._messages(prompt, system_prompt, budget, history),
+                    options=self._options(options, budget),
+                    keep_alive=get_keep_alive(self.llm_model)
+                )
+                observed.update(eval_count=response.get('eval_count', 0), **_durations(response))
+
+            content = response['message']['content']
+            if budget:
+                content = budget.apply(content, truncated=response.get('done_reason') == 'length')
 
             return {
-                "content": response['message']['content'],
-                "total_duration": response.get('total_duration', 0)
+                "content": content,
+                "total_duration": response.get('total_duration', 0),
+                "eval_count": response.get('eval_count', 0),
+                "prompt_eval_count": response.get('prompt_eval_count', 0),
+                **_durations(response)
             }
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"Ollama error occurred: {e}")
             return None
     
-    def request_with_prompt(self, prompt: str, system_prompt: str):
-        return self.request(prompt, system_prompt)
+    def generate(self, prompt: str, system_prompt: str = None, options: dict = None, budget=None,
+                 context=None, history: list = None):
+        """
+        Continue a conversation from its KV context through /api/generate.
+        
+        With a context, only the new prompt is sent and evaluated; the system
+        prompt and earlier turns are already part of the context. Without one,
+        the system prompt and any history (rendered as a transcript) start a
+        new context.
+        
+        Args:
+            prompt: User message
+            system_prompt: Optional system prompt, used when starting a context
+            options: Generation options overriding the client defaults
+            budget: Optional GenerationBudget, as in request()
+            context: Token ids returned by the previous turn (list or array('i'))
+            history: Earlier turns as chat messages, used when starting a context
+            
+        Returns:
+            Dict with the fields of request() plus context (array('i')), or
+            None on error
+            
+        Raises:
+            RequestCancelled: If the calling request was cancelled
+        """
+        if context is None:
+            if budget and budget.instruction():
+                system_prompt = f"{system_prompt}\n\n{budget.instruction()}" if system_prompt else budget.instruction()
+            if history:
+                prompt = _transcript(history, prompt)
+        else:
+            system_prompt = None
+        
+        try:
+            with get_model_router().track(self.llm_model) as observed, \
+                    get_ollama_balancer().lease(model=normalize_model_name(self.llm_model)) as host:
+                response = _complete(
+                    get_ollama_client(host).generate,
+                    'response',
+                    model=self.llm_model,
+                    prompt=prompt,
+                    system=system_prompt,
+                    context=list(context) if context is not None else None,
+                    options=self._options(options, budget),
+                    keep_alive=get_keep_alive(self.llm_model)
+                )
+                observed.update(eval_count=response.get('eval_count', 0), **_durations(response))
+            
+            content = response['response']
+            if budget:
+                content = budget.apply(content, truncated=response.get('done_reason') == 'length')
+            
+            return {
+                "content": content,
+                "total_duration": response.get('total_duration', 0),
+                "eval_count": response.get('eval_count', 0),
+                "prompt_eval_count": response.get('prompt_eval_count', 0),
+                "context": array('i', response.get('context') or []),
+                **_durations(response)
+            }
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            print(f"Ollama error occurred: {e}")
+            return None
+    
+    def request_with_prompt(self, prompt: str, system_prompt: str, options: dict = None, budget=None,
+                            history: list = None):
+        return self.request(prompt, system_prompt, options=options, budget=budget, history=history)
+    
+    def stream(self, prompt: str, system_prompt: str = None, options: dict = None, budget=None,
+               history: list = None, stats: dict = None):
+        """
+        Stream a chat reply token by token.
+        
+        Same arguments as request(). The budget caps tokens and adds its
+        instruction, but the streamed text is not trimmed afterwards. When
+        given, `stats` is filled with the token counts and durations of
+        request() once the stream ends.
+        
+        Yields:
+            Content chunks as Ollama produces them
+            
+        Raises:
+            RequestCancelled: If the calling request was cancelled; the stream
+                is closed, which stops the generation
+            Exception: If the request fails; chunks already yielded stand
+        """
+        try:
+            with get_model_router().track(self.llm_model) as observed, \
+                    get_ollama_balancer().lease(model=normalize_model_name(self.llm_model)) as host, \
+                    closing_stream(_read_stream(get_ollama_client(host).chat(
+                        model=self.llm_model,
+                        messages=self._messages(prompt, system_prompt, budget, history),
+                        options=self._options(options, budget),
+                        keep_alive=get_keep_alive(self.llm_model),
+                        stream=True
+                    ), current_scope())) as chunks:
+                for chunk in chunks:
+                    content = chunk['message']['content']
+                    if content:
+                        yield content
+                    if chunk.get('done'):
+                        observed.update(
+                            eval_count=chunk.get('eval_count', 0),
+                            prompt_eval_count=chunk.get('prompt_eval_count', 0),
+                            **_durations(chunk)
+                        )
+                        if stats is not None:
+                            stats.update(observed)
+        except Exception as e:
+            print(f"Ollama stream error occurred: {e}")
+            raise
+    
+    def embed(self, texts: list):
+        """
+        Embed texts with the client's model (an embedding model, e.g. all-minilm).
+        
+        Args:
+            texts: Strings to embed
+            
+        Returns:
+            One vector (list of floats) per text, or None on error
+        """
+        try:
+            with get_ollama_balancer().lease(model=normalize_model_name(self.llm_model)) as host:
+                response = get_ollama_client(host).embed(
+                    model=self.llm_model,
+                    input=texts,
+                    keep_alive=get_keep_alive(self.llm_model)
+                )
+            return response['embeddings']
+        except Exception as e:
+            print(f"Ollama embed error occurred: {e}")
+            return None
+    
+    def _messages(self, prompt: str, system_prompt: str, budget, history: list) -> list:
+        if budget and budget.instruction():
+            system_prompt = f"{system_prompt}\n\n{budget.instruction()}" if system_prompt else budget.instruction()
+        
+        messages = []
+        if system_prompt:
+            messages.append({
+                'role': 'system',
+                'content': system_prompt
+            })
+        messages.extend(history or [])
+        messages.append({
+            'role': 'user',
+            'content': prompt
+        })
+        return messages
+    
+    def _options(self, options: dict, budget):
+        return {**self.options, **(budget.options() if budget else {}), **(options or {})} or None
+
+def _complete(call, text_key: str, **kwargs):
+    """
+    Run a non-streaming chat/generate call. Within a cancel scope it is
+    streamed and reassembled instead, so a cancelled request closes the
+    connection between chunks, which stops the generation on the Ollama side.
+    
+    Args:
+        call: Client method (chat or generate)
+        text_key: Where the chunks carry their text ('message' or 'response')
+        
+    Returns:
+        The response, as the non-streaming call returns it
+    """
+    scope = current_scope()
+    if scope is None:
+        return call(**kwargs)
+    
+    scope.check()
+    parts, last = [], {}
+    with closing_stream(_read_stream(call(stream=True, **kwargs), scope)) as chunks:
+        for chunk in chunks:
+            parts.append(chunk['message']['content'] if text_key == 'message' else chunk['response'])
+            last = chunk
+    
+    response = {
+        key: last.get(key)
+        for key in ('done_reason', 'context', 'eval_count', 'prompt_eval_count', 'total_duration',
+                    'load_duration', 'prompt_eval_duration', 'eval_duration')
+    }
+    text = ''.join(parts)
+    response[text_key] = {'role': 'assistant', 'content': text} if text_key == 'message' else text
+    return response
+
+def _read_stream(chunks, scope):
+    """
+    Yield the chunks of an Ollama stream, checking scope (if any) before each
+    one, and close the stream when done or abandoned.
+    
+    The shared clients have a fixed read timeout, so under a deadline the
+    chunks are read on a helper thread and waited for no longer than the time
+    left: a reply that stalls before or between chunks (e.g. while Ollama
+    loads the model) fails with DeadlineExceeded at the deadline. The helper
+    stops and closes the stream when its next chunk arrives.
+    
+    Raises:
+        RequestCancelled: If the scope is cancelled
+    """
+    if scope is None or scope.deadline is None:
+        with closing_stream(chunks):
+            for chunk in chunks:
+                if scope is not None:
+                    scope.check()
+                yield chunk
+        return
+    
+    received = queue.Queue()
+    abandoned = threading.Event()
+    
+    def read():
+        try:
+            with closing_stream(chunks):
+                for chunk in chunks:
+                    if abandoned.is_set():
+                        return
+                    received.put((chunk, None))
+            received.put((None, None))
+        except Exception as e:
+            received.put((None, e))
+    
+    threading.Thread(target=read, name='ollama-stream', daemon=True).start()
+    try:
+        while True:
+            scope.check()
+            try:
+                wait = scope.deadline - time.time()
+                if scope.probe is not None:
+                    # Keep polling for disconnects while waiting
+                    wait = min(wait, max(scope.probe_interval, 0.05))
+                chunk, error = received.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                continue
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            scope.check()
+            yield chunk
+    finally:
+        abandoned.set()
+
+def _durations(response) -> dict:
+    return {
+        key: response.get(key) or 0
+        for key in ('total_duration', 'load_duration', 'prompt_eval_duration', 'eval_duration')
+    }
 
+def _transcript(history: list, prompt: str) -> str:
+    """Earlier chat turns and the new message as one plain-text prompt."""
+    speakers = {'user': 'User', 'assistant': 'Assistant', 'system': 'Context'}
+    lines = [f"{speakers.get(m['role'], m['role'])}: {m['content']}" for m in history]
+    lines.append(f"User: {prompt}")
+    return '\n\n'.join(lines)
@@ -1,11 +1,41 @@
 import os
-import requests
-from typing import Dict, List, Optional
+from src import json_codec
+from src.cancellation import backend_timeout
+from src.clients.http import http
+from src.clients.single_flight import SingleFlight
+from typing import Dict, Iterator, List, Optional
+
+class PartialWriteError(Exception):
+    """
+    A write of several interactions failed part way: the first len(created)
+    were stored before error. response is the failed request's, if any.
+    """
+    def __init__(self, created: List[Dict], error: Exception):
+        super().__init__(str(error))
+        self.created = created
+        self.error = error
+        self.response = getattr(error, 'response', None)
+
+def rails_coalescing_enabled() -> bool:
+    return os.getenv('RAILS_COALESCE_READS', 'true').lower() == 'true'
 
 class RailsClient:
+    """
+    Client of the Rails API that stores sessions and interactions.
+
+    Concurrent identical reads (same method, arguments and user) share one
+    upstream request and one parsed result unless RAILS_COALESCE_READS=false,
+    so results of the read methods must not be modified in place.
+    """
+
     def __init__(self):
         self.base_url = os.getenv("RAILS_API_URL", "http://localhost:3000")
         self.timeout = int(os.getenv("RAILS_API_TIMEOUT", "30"))
+        self.reads = SingleFlight() if rails_coalescing_enabled() else None
+    
+    def after_fork(self):
+        if self.reads is not None:
+            self.reads.after_fork()
     
     def _headers(self, firebase_uid: str) -> Dict[str, str]:
         return {
@@ -19,38 +49,43 @@ class RailsClient:
             "title": title,
             "mode": mode
         }
-        response = requests.post(
+        response = http().post(
             url,
-            json=data,
+            data=json_codec.dumps_bytes(data),
             headers=self._headers(firebase_uid),
-            timeout=self.timeout
+            timeout=backend_timeout(self.timeout)
         )
         response.raise_for_status()
-        return response.json()
+        return json_codec.loads(response.content)
     
     def get_chat_session(self, session_uuid: str, firebase_uid: str) -> Dict:
         url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}"
-        response = requests.get(
+        return self._get('get_chat_session', url, firebase_uid)
+    
+    def update_chat_session(self, session_uuid: str, firebase_uid: str, **fields) -> Dict:
+        """Update fields of a session (e.g. summary and summarized_turns)."""
+        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}"
+        response = http().patch(
             url,
+            data=json_codec.dumps_bytes(fields),
             headers=self._headers(firebase_uid),
-            timeout=self.timeout
+            timeout=backend_timeout(self.timeout)
         )
         response.raise_for_status()
-        return response.json()
+        return json_codec.loads(response.content)
     
     def list_chat_sessions(self, firebase_uid: str) -> List[Dict]:
         url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions"
-        response = requests.get(
-            url,
-            headers=self._headers(firebase_uid),
-            timeout=self.timeout
-        )
-        response.raise_for_status()
-        return response.json()
+        return self._get('list_chat_sessions', url, firebase_uid)
     
     def create_interaction(self, session_uuid: str, firebase_uid: str, prompt: str, response: str, 
                           audio_response_url: Optional[str] = None, liveportrait_data: Optional[str] = None,
-                          model_used: Optional[str] = None) -> Dict:
+                          model_used: Optional[str] = None, prompt_tokens: Optional[int] = None,
+                          completion_tokens: Optional[int] = None, timings: Optional[Dict] = None) -> Dict:
+        """
+        Store an interaction. prompt_tokens, completion_tokens and timings
+        (milliseconds per stage) are sent only when known.
+        """
         url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}/interactions"
         data = {
             "prompt": prompt,
@@ -59,22 +94,137 @@ class RailsClient:
             "liveportrait_data": liveportrait_data,
             "model_used": model_used
         }
-        response = requests.post(
+        metrics = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "timings": timings}
+        data.update({key: value for key, value in metrics.items() if value is not None})
+        response = http().post(
             url,
-            json=data,
+            data=json_codec.dumps_bytes(data),
             headers=self._headers(firebase_uid),
-            timeout=self.timeout
+            timeout=backend_timeout(self.timeout)
         )
         response.raise_for_status()
-        return response.json()
+        return json_codec.loads(response.content)
     
-    def get_interactions(self, session_uuid: str, firebase_uid: str) -> List[Dict]:
-        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}/interactions"
-        response = requests.get(
+    def create_interactions(self, firebase_uid: str, interactions: List[Dict]) -> List[Dict]:
+        """
+        Create several interactions, possibly across sessions, in one request.
+        
+        The bulk route (POST /interactions/bulk) has to be added on the Rails
+        side. Until it is, Rails answers 404 or 405 and the interactions are
+        created one request at a time instead; if one of those fails, the
+        PartialWriteError says which were already stored.
+        
+        Args:
+            firebase_uid: Firebase user ID
+            interactions: Interaction payloads, each with its session_uuid, in
+                the order they must be stored
+            
+        Returns:
+            Created interactions, in the same order
+            
+        Raises:
+            PartialWriteError: If a one-at-a-time write failed after storing some
+        """
+        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/interactions/bulk"
+        response = http().post(
             url,
+            data=json_codec.dumps_bytes({"interactions": interactions}),
             headers=self._headers(firebase_uid),
-            timeout=self.timeout
+            timeout=backend_timeout(self.timeout)
         )
+        if response.status_code in (404, 405):
+            created = []
+            for interaction in interactions:
+                try:
+                    created.append(self.create_interaction(firebase_uid=firebase_uid, **interaction))
+                except Exception as e:
+                    raise PartialWriteError(created, e) from e
+            return created
         response.raise_for_status()
-        return response.json()
+        return json_codec.loads(response.content)
+    
+    def get_interactions(self, session_uuid: str, firebase_uid: str) -> List[Dict]:
+        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}/interactions"
+        return self._get('get_interactions', url, firebase_uid)
+
+    def list_chat_sessions_page(self, firebase_uid: str, page: int, per_page: int) -> List[Dict]:
+        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions"
+        return self._get('list_chat_sessions_page', url, firebase_uid, {"page": page, "per_page": per_page})
+    
+    def get_interactions_page(self, session_uuid: str, firebase_uid: str, page: int, per_page: int) -> List[Dict]:
+        url = f"{self.base_url}/apps/artificial_intelligence/api/v1/chat_sessions/{session_uuid}/interactions"
+        return self._get('get_interactions_page', url, firebase_uid, {"page": page, "per_page": per_page})
+    
+    def iter_chat_sessions(self, firebase_uid: str, per_page: int = 100) -> Iterator[Dict]:
+        """Yield a user's sessions, fetching one page at a time."""
+        return self._paginate(lambda page: self.list_chat_sessions_page(firebase_uid, page, per_page), per_page)
+    
+    def iter_interactions(self, session_uuid: str, firebase_uid: str, per_page: int = 100) -> Iterator[Dict]:
+        """Yield a session's interactions, fetching one page at a time."""
+        return self._paginate(lambda page: self.get_interactions_page(session_uuid, firebase_uid, page, per_page), per_page)
+    
+    def coalescing_stats(self) -> Dict:
+        """Upstream calls and coalesced calls per read method."""
+        return self.reads.stats() if self.reads else {}
+    
+    def _get(self, method: str, url: str, firebase_uid: str, params: Optional[Dict] = None):
+        """GET and parse a resource, sharing the request with identical concurrent reads."""
+        def fetch():
+            response = http().get(
+                url,
+                params=params,
+                headers=self._headers(firebase_uid),
+                timeout=backend_timeout(self.timeout)
+            )
+            response.raise_for_status()
+            return json_codec.loads(response.content)
+        
+        return self._coalesced(method, (url, firebase_uid, tuple(sorted(params.items())) if params else None), fetch)
+    
+    def _coalesced(self, method: str, key, fetch):
+        if self.reads is None:
+            return fetch()
+        return self.reads.do(method, key, fetch)
+    
+    def _paginate(self, fetch_page, per_page: int) -> Iterator[Dict]:
+        """
+        Yield the items of consecutive pages until a short page. A Rails
+        endpoint that ignores page/per_page answers every page with the same
+        rows, so a page that is longer than per_page or starts with the same
+        item as the previous one ends the iteration, as does the
+        RAILS_MAX_PAGES cap (default 10000).
+        """
+        max_pages = int(os.getenv('RAILS_MAX_PAGES', '10000'))
+        previous_first = None
+        for page in range(1, max_pages + 1):
+            items = fetch_page(page)
+            if not items:
+                return
+            first = _item_key(items[0])
+            if page > 1 and first == previous_first:
+                print(f"Rails ignored pagination (page {page} repeats page {page - 1}); stopping")
+                return
+            yield from items
+            if len(items) != per_page:
+                return
+            previous_first = first
+        print(f"Stopped paginating after RAILS_MAX_PAGES={max_pages} pages")
 
+def _item_key(item):
+    return item.get("id", item.get("session_uuid")) if isinstance(item, dict) else item
+
+_rails_client = None
+
+def get_rails_client() -> RailsClient:
+    """
+    Return the process-wide RailsClient, shared by the services: with
+    DIRECT_DB_READS=true, one that reads from the database (see
+    DatabaseReadClient).
+    """
+    global _rails_client
+    
+    if _rails_client is None:
+        from src.clients.db_read_client import DatabaseReadClient, direct_db_reads_enabled
+        
+        _rails_client = DatabaseReadClient() if direct_db_reads_enabled() else RailsClient()
+    return _rails_client
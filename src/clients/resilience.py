@@ -0,0 +1,244 @@
+"""
+Shared resilience layer for the HTTP backends (Whisper, TTS, LivePortrait):
+a circuit breaker per backend, timeouts adapted to the observed p99 latency
+and optional hedged requests across several backend URLs.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from src.cancellation import DeadlineExceeded, backend_timeout
+from src.clients.balancer import LoadBalancer, get_balancer
+from src.clients.http import http
+
+_backends = {}
+_backends_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedge')
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.opened_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a call that says nothing about the backend's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened_count += 1
+                self.state = 'open'
+                self.opened_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'opened_count': self.opened_count
+            }
+
+class LatencyTracker:
+    """Sliding window of successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[max(1, math.ceil(pct / 100 * len(samples))) - 1]
+
+    def __len__(self):
+        return len(self._samples)
+
+class ResilientBackend:
+    """
+    Wraps calls to one backend.
+    
+    The timeout passed to each attempt is p99 * TIMEOUT_MULTIPLIER clamped to
+    [min_timeout, max_timeout]; until min_samples calls succeeded, max_timeout
+    is used. With hedging enabled and several URLs, a second URL is tried when
+    the first has not answered after the hedge delay (p95 by default) and the
+    first success wins. URLs are ordered by the backend's load balancer.
+    """
+
+    def __init__(self, name: str, urls: list, max_timeout: float, min_timeout: float = None,
+                 hedge: bool = None, hedge_delay: float = None, failure_threshold: int = None,
+                 reset_timeout: float = None, balancer: LoadBalancer = None):
+        prefix = name.upper()
+        self.name = name
+        self.balancer = balancer or LoadBalancer(name, urls)
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout if min_timeout is not None else float(os.getenv(f'{prefix}_MIN_TIMEOUT', '2'))
+        self.timeout_multiplier = float(os.getenv(f'{prefix}_TIMEOUT_MULTIPLIER', '2'))
+        self.min_samples = 20
+        self.hedge = hedge if hedge is not None else os.getenv(f'{prefix}_HEDGE', 'false').lower() == 'true'
+        if hedge_delay is None and os.getenv(f'{prefix}_HEDGE_DELAY_MS'):
+            hedge_delay = float(os.getenv(f'{prefix}_HEDGE_DELAY_MS')) / 1000
+        self.hedge_delay = hedge_delay
+        self.breaker = CircuitBreaker(
+            failure_threshold or int(os.getenv(f'{prefix}_BREAKER_FAILURES', '5')),
+            reset_timeout or float(os.getenv(f'{prefix}_BREAKER_RESET', '30'))
+        )
+        self.latency = LatencyTracker()
+        self.hedged_calls = 0
+
+    @property
+    def urls(self) -> list:
+        return self.balancer.urls
+
+    def timeout(self) -> float:
+        p99 = self.latency.percentile(99)
+        if p99 is None or len(self.latency) < self.min_samples:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def call(self, fn):
+        """
+        Run fn(url, timeout) against the backend. Within a request's cancel
+        scope the timeout is capped to the request's deadline.
+        
+        Raises:
+            CircuitOpenError: If the breaker is open
+            RequestCancelled: If the request was cancelled or ran out of time
+            Exception: The last error if every attempt failed
+        """
+        full_timeout = self.timeout()
+        timeout = backend_timeout(full_timeout)
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        
+        start_time = time.time()
+        try:
+            if self.hedge and len(self.urls) > 1:
+                result = self._hedged(fn, timeout)
+            else:
+                result = self._attempt(fn, self.balancer.acquire(), timeout)
+        except Exception as e:
+            if timeout < full_timeout and _is_timeout(e):
+                # Cut short by the request's deadline, not slow by itself
+                self.breaker.release()
+                raise DeadlineExceeded(f"{self.name} call exceeded the request deadline") from e
+            if _counts_as_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        
+        self.latency.record(time.time() - start_time)
+        self.breaker.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        p50, p99 = self.latency.percentile(50), self.latency.percentile(99)
+        return {
+            **self.breaker.snapshot(),
+            'urls': self.urls,
+            'timeout_seconds': round(self.timeout(), 3),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+            'hedged_calls': self.hedged_calls
+        }
+
+    def _attempt(self, fn, url: str, timeout: float):
+        """Call fn on a node acquired from the balancer and release it."""
+        try:
+            result = fn(url, timeout)
+        except Exception as e:
+            self.balancer.end(url, success=not _counts_as_failure(e))
+            raise
+        self.balancer.end(url)
+        return result
+
+    def _hedged(self, fn, timeout: float):
+        delay = self.hedge_delay if self.hedge_delay is not None else (self.latency.percentile(95) or timeout / 2)
+        tried = [self.balancer.acquire()]
+        pending = {_hedge_executor.submit(self._attempt, fn, tried[0], timeout)}
+        last_error = None
+        
+        while pending:
+            more = len(tried) < len(self.urls)
+            done, pending = wait(pending, timeout=delay if more else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+            if more and (not done or not pending):
+                # Primary is slow (or failed): fire at the next URL
+                if not done:
+                    self.hedged_calls += 1
+                tried.append(self.balancer.acquire(exclude=tried))
+                pending.add(_hedge_executor.submit(self._attempt, fn, tried[-1], timeout))
+        raise last_error
+
+def _counts_as_failure(error: Exception) -> bool:
+    """Client errors (4xx) mean the backend is healthy; everything else counts."""
+    if isinstance(error, http().HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return True
+
+def _is_timeout(error: Exception) -> bool:
+    return isinstance(error, (http().Timeout, TimeoutError))
+
+def split_urls(value: str) -> list:
+    """Split a comma-separated list of backend URLs."""
+    return [url.strip().rstrip('/') for url in value.split(',') if url.strip()]
+
+def get_backend(name: str, urls: list, max_timeout: float) -> ResilientBackend:
+    """Return the process-wide ResilientBackend for name, creating it on first use."""
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = ResilientBackend(name, urls, max_timeout, balancer=get_balancer(name, urls))
+        return _backends[name]
+
+def backend_states() -> dict:
+    with _backends_lock:
+        backends = dict(_backends)
+    return {name: backend.snapshot() for name, backend in backends.items()}
@@ -0,0 +1,102 @@
+"""
+Single-flight request coalescing: concurrent identical calls share one
+execution and its result.
+
+Unity clients open with GET /history and several GET /history/<uuid> at
+once, often from more than one device, so the same Rails reads arrive
+together. The first caller of a key runs the call; callers arriving while it
+runs wait for it and get the same result (or exception) instead of sending
+their own request.
+"""
+import threading
+from src.cancellation import RequestCancelled, current_scope
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key. Results are shared between callers,
+    so they must be treated as read-only.
+
+    Counters are kept per group (e.g. the RailsClient method): calls that
+    ran, and calls coalesced into one already running.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """Calls in flight belong to the parent process."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, group: str, key, fn):
+        """
+        Run fn(), or wait for the running call with the same group and key.
+
+        A caller waiting inside a cancel scope stops waiting once its own
+        request is cancelled. If the running call was cancelled by its
+        caller's request, the waiters run it again themselves.
+
+        Args:
+            group: Counter group
+            key: Hashable identity of the call within the group
+            fn: Callable without arguments
+
+        Returns:
+            fn's result
+
+        Raises:
+            RequestCancelled: If the waiting caller's request was cancelled
+            Exception: The error the shared call raised
+        """
+        while True:
+            with self._lock:
+                counters = self._counters.setdefault(group, {'calls': 0, 'coalesced': 0})
+                call = self._calls.get((group, key))
+                leader = call is None
+                if leader:
+                    call = self._calls[(group, key)] = _Call()
+                    counters['calls'] += 1
+                else:
+                    counters['coalesced'] += 1
+
+            if leader:
+                return self._run(group, key, call, fn)
+
+            self._wait(call)
+            if isinstance(call.error, RequestCancelled):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {group: dict(counters) for group, counters in self._counters.items()}
+
+    def _run(self, group: str, key, call: _Call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop((group, key), None)
+            call.done.set()
+
+    def _wait(self, call: _Call):
+        scope = current_scope()
+        if scope is None:
+            call.done.wait()
+            return
+        while not call.done.wait(scope.probe_interval or 0.2):
+            scope.check()
@@ -1,9 +1,15 @@
-import requests
 import os
+from src.clients.http import http
+from src.clients.resilience import get_backend, split_urls
 
 class TTSClient:
     def __init__(self):
-        self.api_url = os.getenv('TTS_API_URL', 'http://localhost:8001')
+        self.backend = get_backend(
+            'tts',
+            split_urls(os.getenv('TTS_API_URL', 'http://localhost:8001')),
+            max_timeout=float(os.getenv('TTS_TIMEOUT', '60'))
+        )
+        self.api_url = self.backend.urls[0]
     
     def synthesize(self, text: str, voice: str = 'default') -> bytes:
         """
@@ -16,15 +22,27 @@ class TTSClient:
         Returns:
             Audio data as bytes
         """
-        try:
-            response = requests.post(
-                f'{self.api_url}/synthesize',
+        def post(api_url, timeout):
+            response = http().post(
+                f'{api_url}/synthesize',
                 json={'text': text, 'voice': voice},
-                timeout=60
+                timeout=timeout
             )
             response.raise_for_status()
             return response.content
+        
+        try:
+            return self.backend.call(post)
         except Exception as e:
             print(f"TTS synthesis error: {e}")
             raise
 
+_tts_client = None
+
+def get_tts_client() -> TTSClient:
+    """Return the process-wide TTSClient, shared by the services."""
+    global _tts_client
+    
+    if _tts_client is None:
+        _tts_client = TTSClient()
+    return _tts_client
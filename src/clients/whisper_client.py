@@ -1,9 +1,15 @@
-import requests
 import os
+from src.clients.http import http
+from src.clients.resilience import get_backend, split_urls
 
 class WhisperClient:
     def __init__(self):
-        self.api_url = os.getenv('WHISPER_API_URL', 'http://localhost:8000')
+        self.backend = get_backend(
+            'whisper',
+            split_urls(os.getenv('WHISPER_API_URL', 'http://localhost:8000')),
+            max_timeout=float(os.getenv('WHISPER_TIMEOUT', '60'))
+        )
+        self.api_url = self.backend.urls[0]
     
     def transcribe(self, audio_file_path: str) -> str:
         """
@@ -17,15 +23,28 @@ class WhisperClient:
         """
         try:
             with open(audio_file_path, 'rb') as f:
-                files = {'file': f}
-                response = requests.post(
-                    f'{self.api_url}/transcribe',
-                    files=files,
-                    timeout=60
+                audio_data = f.read()
+            
+            def post(api_url, timeout):
+                response = http().post(
+                    f'{api_url}/transcribe',
+                    files={'file': (os.path.basename(audio_file_path), audio_data)},
+                    timeout=timeout
                 )
                 response.raise_for_status()
                 return response.json().get('text', '')
+            
+            return self.backend.call(post)
         except Exception as e:
             print(f"Whisper transcription error: {e}")
             raise
 
+_whisper_client = None
+
+def get_whisper_client() -> WhisperClient:
+    """Return the process-wide WhisperClient, shared by the services."""
+    global _whisper_client
+    
+    if _whisper_client is None:
+        _whisper_client = WhisperClient()
+    return _whisper_client
@@ -0,0 +1,66 @@
+"""
+Response compression and conditional GET helpers for the JSON endpoints.
+"""
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('br', 'gzip')
+
+def init_compression(app):
+    """
+    Compress JSON responses of at least COMPRESSION_MIN_BYTES (default 1024)
+    with brotli (when installed) or gzip, whichever the client prefers.
+    Disabled with COMPRESSION_ENABLED=false.
+    """
+    if os.getenv('COMPRESSION_ENABLED', 'true').lower() != 'true':
+        return
+
+    min_bytes = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+
+    @app.after_request
+    def compress(response):
+        if (
+            response.mimetype != 'application/json'
+            or response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < min_bytes:
+            return response
+
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))))
+        response.headers['Content-Encoding'] = encoding
+
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+def matching_etag(etag: str):
+    """
+    The variant of this ETag (plain or with an encoding suffix added by
+    init_compression) named in the request's If-None-Match, or None.
+    """
+    for candidate in [etag] + [f'{etag}-{encoding}' for encoding in ENCODINGS]:
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def _choose_encoding():
+    available = [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+    return request.accept_encodings.best_match(available)
@@ -1,5 +1,7 @@
 from src.controllers.chat_controller import chat_bp
 from src.controllers.audio_controller import audio_bp
+from src.controllers.health_controller import health_bp
+from src.controllers.liveportrait_controller import liveportrait_bp
+from src.controllers.conversation_controller import register_websocket
 
-__all__ = ['chat_bp', 'audio_bp']
-
+__all__ = ['chat_bp', 'audio_bp', 'health_bp', 'liveportrait_bp', 'register_websocket']
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify, g
-from src.services.audio_service import AudioService
+from src.services.audio_service import get_audio_service
+from src.lazy import LazyProxy
 from src.auth import require_firebase_auth
+from src.cancellation import RequestCancelled, cancelled_response
+from src.idempotency import idempotent
 import os
 
 audio_bp = Blueprint('audio', __name__)
-audio_service = AudioService()
+audio_service = LazyProxy(get_audio_service)
+
+def _optional_bool(value):
+    return None if value is None else value.lower() == 'true'
 
 @audio_bp.route('/audio2audio', methods=['POST'])
 @require_firebase_auth
+@idempotent
 def create_audio_chat():
     """
     Create a new audio chat session.
@@ -22,6 +29,11 @@ def create_audio_chat():
         name: Authorization
         type: string
         required: true
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Client-chosen key; a retry with the same key replays the first response instead of running again
       - in: formData
         name: audio
         type: file
@@ -31,6 +43,10 @@ def create_audio_chat():
         name: liveportrait
         type: boolean
         description: Enable LivePortrait generation
+      - in: query
+        name: liveportrait_async
+        type: boolean
+        description: Return a LivePortrait job ID instead of waiting for the animation (default LIVEPORTRAIT_ASYNC)
     responses:
       201:
         description: Audio chat session created
@@ -47,15 +63,22 @@ def create_audio_chat():
               type: string
             liveportrait:
               type: object
+            liveportrait_job_id:
+              type: string
+            liveportrait_status:
+              type: string
       400:
         description: Bad Request
       401:
         description: Unauthorized
+      422:
+        description: Idempotency-Key already used for a different request
       500:
         description: Internal Server Error
     """
     firebase_uid = g.firebase_uid
     liveportrait = request.args.get('liveportrait', '').lower() == 'true'
+    liveportrait_async = _optional_bool(request.args.get('liveportrait_async'))
     
     if 'audio' not in request.files:
         return jsonify({"error": "Audio file is required"}), 400
@@ -68,14 +91,18 @@ def create_audio_chat():
         result = audio_service.create_audio_session(
             audio_file, 
             firebase_uid, 
-            liveportrait=liveportrait
+            liveportrait=liveportrait,
+            liveportrait_async=liveportrait_async
         )
         return jsonify(result), 201
+    except RequestCancelled as e:
+        return cancelled_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @audio_bp.route('/audio2audio/<uuid:session_uuid>', methods=['POST'])
 @require_firebase_auth
+@idempotent
 def send_audio_message(session_uuid):
     """
     Send audio to an existing audio chat session.
@@ -89,6 +116,11 @@ def send_audio_message(session_uuid):
         name: Authorization
         type: string
         required: true
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Client-chosen key; a retry with the same key replays the first response instead of running again
       - in: path
         name: session_uuid
         type: string
@@ -102,6 +134,10 @@ def send_audio_message(session_uuid):
         name: liveportrait
         type: boolean
         description: Enable LivePortrait generation
+      - in: query
+        name: liveportrait_async
+        type: boolean
+        description: Return a LivePortrait job ID instead of waiting for the animation (default LIVEPORTRAIT_ASYNC)
     responses:
       200:
         description: Audio message processed
@@ -109,6 +145,8 @@ def send_audio_message(session_uuid):
         description: Bad Request
       401:
         description: Unauthorized
+      422:
+        description: Idempotency-Key already used for a different request
       404:
         description: Session not found
       500:
@@ -116,6 +154,7 @@ def send_audio_message(session_uuid):
     """
     firebase_uid = g.firebase_uid
     liveportrait = request.args.get('liveportrait', '').lower() == 'true'
+    liveportrait_async = _optional_bool(request.args.get('liveportrait_async'))
     
     if 'audio' not in request.files:
         return jsonify({"error": "Audio file is required"}), 400
@@ -129,9 +168,12 @@ def send_audio_message(session_uuid):
             str(session_uuid),
             audio_file,
             firebase_uid,
-            liveportrait=liveportrait
+            liveportrait=liveportrait,
+            liveportrait_async=liveportrait_async
         )
         return jsonify(result), 200
+    except RequestCancelled as e:
+        return cancelled_response(e)
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
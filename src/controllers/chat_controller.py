@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify, g
-from src.services.chat_service import ChatService
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
+from src.services.chat_service import get_chat_service
+from src.lazy import LazyProxy
 from src.auth import require_firebase_auth
+from src.cancellation import RequestCancelled, cancelled_response
+from src.idempotency import idempotent
+from src.compression import matching_etag
+from src import json_codec
 import os
+import uuid
+import zlib
 
 chat_bp = Blueprint('chat', __name__)
-chat_service = ChatService()
+chat_service = LazyProxy(get_chat_service)
 
 @chat_bp.route('/chat', methods=['POST'])
 @require_firebase_auth
+@idempotent
 def create_chat():
     """
     Create a new text chat session.
@@ -22,6 +30,11 @@ def create_chat():
         type: string
         required: true
         description: Firebase ID token as 'Bearer <token>'
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Client-chosen key; a retry with the same key replays the first response instead of running again
       - in: body
         name: body
         schema:
@@ -50,6 +63,8 @@ def create_chat():
         description: Bad Request
       401:
         description: Unauthorized
+      422:
+        description: Idempotency-Key already used for a different request
       500:
         description: Internal Server Error
     """
@@ -63,11 +78,14 @@ def create_chat():
     try:
         result = chat_service.create_text_session(prompt, firebase_uid)
         return jsonify(result), 201
+    except RequestCancelled as e:
+        return cancelled_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @chat_bp.route('/chat/<uuid:session_uuid>', methods=['POST'])
 @require_firebase_auth
+@idempotent
 def send_message(session_uuid):
     """
     Send a message to an existing chat session.
@@ -81,6 +99,11 @@ def send_message(session_uuid):
         name: Authorization
         type: string
         required: true
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Client-chosen key; a retry with the same key replays the first response instead of running again
       - in: path
         name: session_uuid
         type: string
@@ -102,6 +125,8 @@ def send_message(session_uuid):
         description: Bad Request
       401:
         description: Unauthorized
+      422:
+        description: Idempotency-Key already used for a different request
       404:
         description: Session not found
       500:
@@ -117,11 +142,86 @@ def send_message(session_uuid):
     try:
         result = chat_service.send_text_message(str(session_uuid), prompt, firebase_uid)
         return jsonify(result), 200
+    except RequestCancelled as e:
+        return cancelled_response(e)
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@chat_bp.route('/chat/batch', methods=['POST'])
+@require_firebase_auth
+def send_batch():
+    """
+    Send several messages to one or more existing chat sessions in one request.
+    Sessions are processed concurrently, messages within a session in order.
+    Results stream back as NDJSON as each message completes, followed by one
+    line reporting the bulk write of all interactions.
+    ---
+    tags:
+      - Chat
+    security:
+      - Bearer: []
+    parameters:
+      - in: header
+        name: Authorization
+        type: string
+        required: true
+      - in: body
+        name: body
+        schema:
+          type: object
+          required:
+            - messages
+          properties:
+            messages:
+              type: array
+              items:
+                type: object
+                required:
+                  - session_uuid
+                  - prompt
+                properties:
+                  session_uuid:
+                    type: string
+                    format: uuid
+                  prompt:
+                    type: string
+    produces:
+      - application/x-ndjson
+    responses:
+      200:
+        description: NDJSON stream of result, error and persisted events
+      400:
+        description: Bad Request
+      401:
+        description: Unauthorized
+    """
+    data = request.get_json(silent=True) or {}
+    messages = data.get('messages')
+    firebase_uid = g.firebase_uid
+    max_messages = int(os.getenv('CHAT_BATCH_MAX_MESSAGES', '100'))
+    
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "Messages are required"}), 400
+    
+    if len(messages) > max_messages:
+        return jsonify({"error": f"At most {max_messages} messages per batch"}), 400
+    
+    for message in messages:
+        if not isinstance(message, dict) or not message.get('prompt'):
+            return jsonify({"error": "Each message requires a prompt"}), 400
+        try:
+            message['session_uuid'] = str(uuid.UUID(str(message.get('session_uuid'))))
+        except ValueError:
+            return jsonify({"error": "Each message requires a valid session_uuid"}), 400
+    
+    def generate():
+        for event in chat_service.send_text_batch(messages, firebase_uid):
+            yield json_codec.dumps_bytes(event) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @chat_bp.route('/history', methods=['GET'])
 @require_firebase_auth
 def list_sessions():
@@ -133,23 +233,82 @@ def list_sessions():
       - Chat
     security:
       - Bearer: []
+    parameters:
+      - in: query
+        name: all
+        type: boolean
+        required: false
+        description: Return all interactions of the user in any environment
+      - in: query
+        name: format
+        type: string
+        enum: [json, ndjson]
+        required: false
+        description: ndjson streams all interactions, one JSON object per line,
+          fetched page by page (gzip-compressed when the client accepts gzip)
+      - in: header
+        name: If-None-Match
+        type: string
+        required: false
+        description: ETag of a previous response
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: List of sessions or interactions
+      304:
+        description: Not modified since the response with the given ETag
     """
     firebase_uid = g.firebase_uid
     env_level = os.getenv('ENV_LEVEL', 'dev').lower()
     
+    if request.args.get('format') == 'ndjson':
+        return _export_history(firebase_uid)
+    
     try:
-        if env_level == 'dev':
-            result = chat_service.get_all_interactions(firebase_uid)
+        if env_level == 'dev' or request.args.get('all', 'false').lower() == 'true':
+            view, build = 'interactions', chat_service.get_all_interactions
         else:
-            result = chat_service.get_user_sessions(firebase_uid)
+            view, build = 'sessions', chat_service.get_user_sessions
         
-        return jsonify(result), 200
+        sessions = chat_service.list_sessions(firebase_uid)
+        etag = chat_service.sessions_etag(firebase_uid, sessions, view)
+        matched = matching_etag(etag)
+        if matched:
+            return _not_modified(matched)
+        
+        return _with_etag(jsonify(build(firebase_uid, sessions=sessions)), etag), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _export_history(firebase_uid: str):
+    """Stream every interaction as NDJSON without holding the history in memory."""
+    def generate():
+        try:
+            for interaction in chat_service.export_interactions(firebase_uid):
+                yield json_codec.dumps_bytes(interaction) + b'\n'
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band
+            yield json_codec.dumps_bytes({"error": f"Export interrupted: {e}"}) + b'\n'
+    
+    headers = {'Vary': 'Accept-Encoding'}
+    body = generate()
+    if request.accept_encodings['gzip']:
+        headers['Content-Encoding'] = 'gzip'
+        body = _gzip(body)
+    
+    return Response(stream_with_context(body), mimetype='application/x-ndjson', headers=headers)
+
+def _gzip(chunks):
+    """Compress a stream of byte chunks into a single gzip member as it is produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 @chat_bp.route('/history/<uuid:session_uuid>', methods=['GET'])
 @require_firebase_auth
 def get_session_history(session_uuid):
@@ -166,15 +325,42 @@ def get_session_history(session_uuid):
         type: string
         format: uuid
         required: true
+      - in: header
+        name: If-None-Match
+        type: string
+        required: false
+        description: ETag of a previous response
     responses:
       200:
         description: Session history
+      304:
+        description: Not modified since the response with the given ETag
+      404:
+        description: Session not found
     """
     firebase_uid = g.firebase_uid
     
     try:
+        etag = chat_service.session_etag(str(session_uuid), firebase_uid)
+        if etag is None:
+            return jsonify({"error": "Session not found or access denied"}), 404
+        matched = matching_etag(etag)
+        if matched:
+            return _not_modified(matched)
+        
         result = chat_service.get_session_history(str(session_uuid), firebase_uid)
-        return jsonify(result), 200
+        return _with_etag(jsonify(result), etag), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _with_etag(response, etag: str):
+    response.set_etag(etag)
+    # Per-user data: clients may keep it but must revalidate before reuse
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _not_modified(etag: str):
+    response = _with_etag(Response(status=304), etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
@@ -0,0 +1,203 @@
+from flask import request
+from src.auth import get_env_level, verify_firebase_token
+from src.cancellation import CancelScope, RequestCancelled, cancel_scope
+from src.services.conversation import Conversation
+from src import json_codec
+import base64
+import os
+import queue
+import socket
+import threading
+
+class SlowClientError(ConnectionError):
+    """The client stopped reading and its send queue stayed full."""
+
+class SocketSender:
+    """
+    Bounded outgoing queue for one WebSocket, drained by a writer thread.
+
+    send() blocks while the queue is full, which pauses the producer (and with
+    it the Ollama stream) instead of buffering without limit. A client that
+    reads nothing for `send_timeout` seconds is disconnected.
+
+    Args:
+        ws: WebSocket connection
+        max_queued: Queued events (WS_SEND_QUEUE_SIZE, default 64)
+        send_timeout: Seconds to wait for room in the queue (WS_SEND_TIMEOUT, default 30)
+    """
+    def __init__(self, ws, max_queued: int = None, send_timeout: float = None):
+        self.ws = ws
+        self.queue = queue.Queue(maxsize=max_queued or int(os.getenv('WS_SEND_QUEUE_SIZE', '64')))
+        self.send_timeout = send_timeout if send_timeout is not None else float(os.getenv('WS_SEND_TIMEOUT', '30'))
+        self.closed = threading.Event()
+        self._writer = threading.Thread(target=self._run, name='ws-sender', daemon=True)
+        self._writer.start()
+
+    def send(self, event: dict):
+        """
+        Queue an event for the client.
+
+        Raises:
+            SlowClientError: If the client is gone or too slow; the connection is then closed
+        """
+        if self.closed.is_set():
+            raise SlowClientError("Connection closed")
+        try:
+            self.queue.put(json_codec.dumps(event), timeout=self.send_timeout)
+        except queue.Full:
+            print(f"WebSocket client not reading for {self.send_timeout}s, disconnecting")
+            self.abort()
+            raise SlowClientError("Client too slow")
+
+    def close(self, timeout: float = 5):
+        """Let the writer flush queued events, then stop it."""
+        if not self.closed.is_set():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                self.abort()
+        self._writer.join(timeout)
+
+    def abort(self):
+        """Stop immediately, dropping queued events and unblocking a stalled write."""
+        self.closed.set()
+        sock = getattr(self.ws, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self.closed.is_set():
+            try:
+                message = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            try:
+                self.ws.send(message)
+            except Exception:
+                break
+        self.closed.set()
+
+def _optional_bool(value):
+    return None if value is None else value.lower() == 'true'
+
+def _authenticate(ws) -> str:
+    """
+    Firebase UID for the connecting client: dev bypasses auth like require_firebase_auth.
+
+    Browsers cannot set headers on a WebSocket handshake, so without an
+    Authorization header the first client frame must be {"type": "auth",
+    "token": ...}, sent within WS_AUTH_TIMEOUT seconds (default 10). Tokens
+    are never read from the URL, which ends up in access logs.
+    """
+    if get_env_level() == 'dev':
+        return 'dev-user'
+
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.lower().startswith('bearer '):
+        return verify_firebase_token(auth_header[7:])['uid']
+
+    frame = ws.receive(timeout=float(os.getenv('WS_AUTH_TIMEOUT', '10')))
+    try:
+        message = json_codec.loads(frame) if isinstance(frame, str) else {}
+    except ValueError:
+        message = {}
+    if not isinstance(message, dict) or message.get('type') != 'auth' or not message.get('token'):
+        raise ValueError("Missing Authorization header or auth frame")
+    return verify_firebase_token(message['token'])['uid']
+
+def conversation_socket(ws):
+    """
+    Persistent conversation over a WebSocket (/ws/conversation).
+
+    Query parameters: session_uuid (omit to start a new session on the first
+    turn), mode ('text' or 'audio'), liveportrait and liveportrait_async. In
+    stag/prod, a client that cannot send an Authorization header sends
+    {"type": "auth", "token": ...} as its first frame.
+
+    Client frames are JSON {"type": "text", "prompt": ...} or
+    {"type": "audio", "data": <base64 WAV>}, or a binary frame with the WAV
+    itself. Turns are answered in order, one at a time. Server frames are JSON
+    events: ready, session, transcript, token, audio, avatar, reply, done and error.
+    """
+    try:
+        firebase_uid = _authenticate(ws)
+    except ValueError as e:
+        ws.send(json_codec.dumps({'type': 'error', 'error': str(e)}))
+        ws.close(reason=1008, message='Unauthorized')
+        return
+
+    sender = SocketSender(ws)
+    try:
+        try:
+            conversation = Conversation(
+                firebase_uid,
+                sender.send,
+                mode=request.args.get('mode', 'text'),
+                liveportrait=request.args.get('liveportrait', 'false').lower() == 'true',
+                liveportrait_async=_optional_bool(request.args.get('liveportrait_async'))
+            )
+            conversation.open(request.args.get('session_uuid'))
+        except Exception as e:
+            sender.send({'type': 'error', 'error': str(e)})
+            return
+        sender.send({
+            'type': 'ready',
+            'session_uuid': conversation.session_uuid,
+            'mode': conversation.mode,
+            'history_turns': len(conversation.history) // 2
+        })
+
+        idle_timeout = float(os.getenv('WS_IDLE_TIMEOUT', '300'))
+        while not sender.closed.is_set():
+            frame = ws.receive(timeout=idle_timeout)
+            if frame is None:
+                sender.send({'type': 'error', 'error': 'Idle timeout'})
+                return
+            try:
+                # A turn stops at its next backend call or Ollama chunk once the client is gone
+                with cancel_scope(CancelScope(probe=sender.closed.is_set, probe_interval=0)):
+                    _handle_frame(conversation, frame)
+            except (SlowClientError, RequestCancelled):
+                return
+            except Exception as e:
+                print(f"WebSocket turn error: {e}")
+                sender.send({'type': 'error', 'error': str(e)})
+    finally:
+        sender.close()
+
+def _handle_frame(conversation: Conversation, frame):
+    if isinstance(frame, bytes):
+        conversation.send_audio(frame)
+        return
+
+    message = json_codec.loads(frame)
+    if message.get('type') == 'text' and message.get('prompt'):
+        conversation.send_text(message['prompt'])
+    elif message.get('type') == 'audio' and message.get('data'):
+        conversation.send_audio(base64.b64decode(message['data']))
+    else:
+        raise ValueError("Expected a text frame with a prompt or an audio frame")
+
+def register_websocket(app):
+    """
+    Mount /ws/conversation when flask-sock is installed.
+
+    WebSocket connections hold a server thread each, so size GUNICORN_THREADS
+    for the expected number of open conversations.
+    """
+    try:
+        from flask_sock import Sock
+    except ImportError:
+        print("flask-sock is not installed; /ws/conversation is disabled")
+        return
+
+    app.config.setdefault('SOCK_SERVER_OPTIONS', {
+        'ping_interval': float(os.getenv('WS_PING_INTERVAL', '25')),
+        'max_message_size': int(os.getenv('WS_MAX_MESSAGE_BYTES', str(10 * 1024 * 1024)))
+    })
+    Sock(app).route('/ws/conversation')(conversation_socket)
@@ -0,0 +1,128 @@
+from flask import Blueprint, jsonify, request
+from src.clients.balancer import balancer_states
+from src.clients.model_router import get_model_router
+from src.clients.rails_client import get_rails_client
+from src.clients.resilience import backend_states
+from src.services.interaction_metrics import get_interaction_stats
+from src.services.interaction_queue import get_interaction_queue, write_behind_enabled
+from src.services.liveportrait_jobs import get_liveportrait_jobs
+from src.services.model_manager import get_model_manager
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/healthz/models', methods=['GET'])
+def models_health():
+    """
+    Report the load state of the Ollama models used by the service.
+    ---
+    tags:
+      - Health
+    responses:
+      200:
+        description: All configured models are loaded
+        schema:
+          type: object
+          properties:
+            ready:
+              type: boolean
+            warmup:
+              type: string
+            models:
+              type: object
+      503:
+        description: One or more models are not loaded (never with OLLAMA_WARMUP=off)
+    """
+    status = get_model_manager().status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Runtime metrics: circuit breaker state, adaptive timeout, latency and node
+    load per backend, the Ollama node pool, in-flight requests and generation
+    speed per model, coalesced Rails reads, LivePortrait job counts and, with
+    write-behind persistence, pending and dead journal entries.
+    ---
+    tags:
+      - Health
+    responses:
+      200:
+        description: Metrics by component
+        schema:
+          type: object
+          properties:
+            backends:
+              type: object
+            balancers:
+              type: object
+            models:
+              type: object
+            rails_reads:
+              type: object
+            liveportrait_jobs:
+              type: object
+            interaction_queue:
+              type: object
+    """
+    return jsonify({
+        "backends": backend_states(),
+        "balancers": balancer_states(),
+        "models": get_model_router().snapshot(),
+        "rails_reads": get_rails_client().coalescing_stats(),
+        "liveportrait_jobs": get_liveportrait_jobs().stats(),
+        "interaction_queue": get_interaction_queue().stats() if write_behind_enabled() else {}
+    }), 200
+
+@health_bp.route('/metrics/interactions', methods=['GET'])
+def interaction_metrics():
+    """
+    Stage latency and token percentiles of the stored interactions, per day,
+    model and session mode, read from the interactions table.
+    ---
+    tags:
+      - Health
+    parameters:
+      - name: days
+        in: query
+        type: integer
+        required: false
+        default: 7
+        description: Days to cover, today included (1-90)
+      - name: model
+        in: query
+        type: string
+        required: false
+        description: Only this model
+      - name: mode
+        in: query
+        type: string
+        enum: [text, audio]
+        required: false
+        description: Only this mode
+    responses:
+      200:
+        description: p50/p95 per stage in milliseconds, token counts and generation rate per group
+        schema:
+          type: object
+          properties:
+            days:
+              type: integer
+            groups:
+              type: array
+              items:
+                type: object
+      400:
+        description: Invalid parameters
+    """
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= 90:
+        return jsonify({"error": "days must be an integer between 1 and 90"}), 400
+    mode = request.args.get('mode')
+    if mode and mode not in ('text', 'audio'):
+        return jsonify({"error": "mode must be 'text' or 'audio'"}), 400
+    
+    groups = get_interaction_stats().aggregate(days=days, model=request.args.get('model'), mode=mode)
+    return jsonify({"days": days, "groups": groups}), 200
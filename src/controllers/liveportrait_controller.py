@@ -0,0 +1,105 @@
+from flask import Blueprint, Response, g, jsonify, stream_with_context
+from src.services.liveportrait_jobs import get_liveportrait_jobs
+from src.auth import require_firebase_auth
+from src import json_codec
+
+liveportrait_bp = Blueprint('liveportrait', __name__)
+
+FINAL_STATUSES = ('done', 'failed')
+
+@liveportrait_bp.route('/liveportrait/jobs/<uuid:job_id>', methods=['GET'])
+@require_firebase_auth
+def get_job(job_id):
+    """
+    Get the status and, once done, the result of one of the user's LivePortrait jobs.
+    ---
+    tags:
+      - Audio
+    security:
+      - Bearer: []
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        format: uuid
+        required: true
+    responses:
+      200:
+        description: Job status
+        schema:
+          type: object
+          properties:
+            job_id:
+              type: string
+            status:
+              type: string
+              enum: [queued, running, done, failed]
+            result:
+              type: object
+            error:
+              type: string
+      401:
+        description: Unauthorized
+      404:
+        description: Job not found, expired or owned by another user
+    """
+    job = get_liveportrait_jobs().get(str(job_id), firebase_uid=g.firebase_uid)
+    if not job:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job), 200
+
+@liveportrait_bp.route('/liveportrait/jobs/<uuid:job_id>/events', methods=['GET'])
+@require_firebase_auth
+def stream_job(job_id):
+    """
+    Server-sent events for a LivePortrait job: one 'status' event per status
+    change and a final 'done' or 'failed' event carrying the job, then the
+    stream closes.
+    ---
+    tags:
+      - Audio
+    security:
+      - Bearer: []
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        format: uuid
+        required: true
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: Event stream
+      401:
+        description: Unauthorized
+      404:
+        description: Job not found, expired or owned by another user
+    """
+    jobs = get_liveportrait_jobs()
+    job = jobs.get(str(job_id), firebase_uid=g.firebase_uid)
+    firebase_uid = g.firebase_uid
+    if not job:
+        return jsonify({"error": "Job not found or expired"}), 404
+    
+    def events(job):
+        while True:
+            if job is None:
+                yield 'event: failed\ndata: {"error": "Job expired"}\n\n'
+                return
+            event = job['status'] if job['status'] in FINAL_STATUSES else 'status'
+            yield f"event: {event}\ndata: {json_codec.dumps(job)}\n\n"
+            if job['status'] in FINAL_STATUSES:
+                return
+            
+            previous = job['status']
+            job = jobs.wait(job['job_id'], last_status=previous, firebase_uid=firebase_uid)
+            while job and job['status'] == previous:
+                yield ': keep-alive\n\n'
+                job = jobs.wait(job['job_id'], last_status=previous, firebase_uid=firebase_uid)
+    
+    return Response(
+        stream_with_context(events(job)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
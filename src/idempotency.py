@@ -0,0 +1,237 @@
+"""
+Idempotency-Key support for endpoints that clients retry after a timeout.
+
+A request carrying an Idempotency-Key header runs at most once per user and
+endpoint: a retry after the first attempt completed replays the stored
+response, and a retry while it is still running waits for that run instead
+of starting another Whisper/LLM/TTS pass and storing a duplicate interaction.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import Response, g, jsonify, make_response, request
+from src.cancellation import CLIENT_CLOSED_REQUEST
+
+MAX_KEY_LENGTH = 255
+
+_idempotency_store = None
+_idempotency_store_lock = threading.Lock()
+
+class _Flight:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+
+class IdempotencyStore:
+    """
+    Responses of requests made with an idempotency key, kept for
+    IDEMPOTENCY_TTL seconds (default 86400).
+
+    Keys are claimed in a local SQLite file shared by the workers of a host,
+    so a retry that lands on another worker is deduplicated too. Within a
+    process, requests for a running key wait on the running computation;
+    across processes they poll the file until it completes. A claim older
+    than lock_timeout is taken to belong to a worker that died. Server
+    errors and turns abandoned by their client are not stored, so the next
+    retry runs again. At most IDEMPOTENCY_MAX_KEYS (default 10000) responses
+    are kept, oldest dropped.
+
+    Args:
+        path: SQLite file (IDEMPOTENCY_PATH, default data/idempotency.db)
+        ttl: Seconds a completed response is replayed for
+        max_entries: Stored responses kept
+        lock_timeout: Seconds after which a running claim is considered abandoned
+            (IDEMPOTENCY_LOCK_TIMEOUT, default 300)
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None, lock_timeout: float = None):
+        self.path = path or os.getenv('IDEMPOTENCY_PATH', 'data/idempotency.db')
+        self.ttl = ttl if ttl is not None else float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+        self.max_entries = max_entries or int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+        self.lock_timeout = lock_timeout if lock_timeout is not None else float(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '300'))
+        self.poll_interval = 0.1
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._claims = 0
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+
+    def after_fork(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._connect()
+
+    def run(self, key: str, fingerprint: str, compute):
+        """
+        Run compute once per key.
+
+        Args:
+            key: Scoped idempotency key
+            fingerprint: Digest of the request, to reject a key reused for another request
+            compute: Callable returning (status_code, body bytes, mimetype)
+
+        Returns:
+            Tuple ((status_code, body, mimetype), replayed), or None when the
+            key belongs to a different request
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    claimed = self._claim(key, fingerprint)
+                    if claimed is True:
+                        flight = self._flights[key] = _Flight(fingerprint)
+                        break
+
+            if flight is not None:
+                if flight.fingerprint != fingerprint:
+                    return None
+                flight.done.wait()
+                if flight.result is not None:
+                    return flight.result, True
+                continue
+
+            if claimed is None:
+                return None
+            if claimed != 'running':
+                return claimed, True
+            time.sleep(self.poll_interval)
+
+        try:
+            result = compute()
+        except BaseException:
+            self._release(key, flight, None)
+            raise
+        self._release(key, flight, result)
+        return result, False
+
+    def _claim(self, key: str, fingerprint: str):
+        """
+        True if the key was claimed for this request, the stored result if it
+        completed, 'running' if another process runs it, None if it belongs
+        to a different request.
+        """
+        now = time.time()
+        self._claims += 1
+        if self._claims % 1000 == 1:
+            self._prune(now)
+
+        inserted = self._conn.execute(
+            "INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, status, created_at) VALUES (?, ?, 'running', ?)",
+            (key, fingerprint, now)
+        ).rowcount
+        if inserted:
+            return True
+
+        row = self._conn.execute(
+            "SELECT fingerprint, status, status_code, body, mimetype, created_at FROM idempotency_keys WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return self._claim(key, fingerprint)
+        stored_fingerprint, status, status_code, body, mimetype, created_at = row
+        expired = now - created_at > (self.ttl if status == 'done' else self.lock_timeout)
+        if expired:
+            self._conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND created_at = ?", (key, created_at))
+            return self._claim(key, fingerprint)
+        if stored_fingerprint != fingerprint:
+            return None
+        return (status_code, body, mimetype) if status == 'done' else 'running'
+
+    def _release(self, key: str, flight: _Flight, result):
+        with self._lock:
+            if result is not None and result[0] < 500 and result[0] != CLIENT_CLOSED_REQUEST:
+                self._conn.execute(
+                    "UPDATE idempotency_keys SET status = 'done', status_code = ?, body = ?, mimetype = ?, created_at = ? "
+                    "WHERE key = ?",
+                    (result[0], result[1], result[2], time.time(), key)
+                )
+            else:
+                self._conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+            flight.result = result
+            del self._flights[key]
+        flight.done.set()
+
+    def _prune(self, now: float):
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE (status = 'done' AND created_at < ?) OR created_at < ?",
+            (now - self.ttl, now - max(self.ttl, self.lock_timeout))
+        )
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE status = 'done' AND key NOT IN "
+            "(SELECT key FROM idempotency_keys WHERE status = 'done' ORDER BY created_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                status_code INTEGER,
+                body BLOB,
+                mimetype TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _idempotency_store
+
+    if _idempotency_store is None:
+        with _idempotency_store_lock:
+            if _idempotency_store is None:
+                _idempotency_store = IdempotencyStore()
+    return _idempotency_store
+
+def _request_fingerprint() -> str:
+    digest = hashlib.sha256(request.query_string)
+    if request.files:
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(name.encode('utf-8'))
+            for chunk in iter(lambda: upload.stream.read(65536), b''):
+                digest.update(chunk)
+            upload.stream.seek(0)
+    else:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on an authenticated view (apply below
+    require_firebase_auth). Keys are scoped to the user, method and path.
+    Replayed responses carry Idempotent-Replayed: true; a key reused with a
+    different request body gets 422.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        def compute():
+            response = make_response(view(*args, **kwargs))
+            return response.status_code, response.get_data(), response.mimetype
+
+        scoped_key = f"{g.firebase_uid}:{request.method}:{request.path}:{key}"
+        outcome = get_idempotency_store().run(scoped_key, _request_fingerprint(), compute)
+        if outcome is None:
+            return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+
+        (status_code, body, mimetype), replayed = outcome
+        response = Response(body, status=status_code, mimetype=mimetype)
+        if replayed:
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    return decorated
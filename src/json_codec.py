@@ -0,0 +1,66 @@
+"""
+JSON codec shared by the controllers, the services and the Rails client.
+
+Uses orjson when it is installed, which is several times faster on history
+payloads full of long text fields, and the stdlib json module otherwise.
+Both backends produce the same bytes: compact JSON with non-ASCII characters
+as UTF-8 instead of \\u escapes. Datetimes, dates and dataclasses go through
+the caller's default under both (orjson would otherwise encode them itself, in
+a different format than e.g. Flask's); UUIDs are encoded as their canonical
+string either way. The one difference left is the exponent of very small or
+large floats (1e-7 against 1e-07), which parses to the same value.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+) if orjson is not None else 0
+
+def dumps_bytes(obj, sort_keys: bool = False, default=None) -> bytes:
+    """Serialize obj to UTF-8 encoded JSON."""
+    if orjson is not None:
+        option = _ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return dumps(obj, sort_keys=sort_keys, default=default).encode('utf-8')
+
+def dumps(obj, sort_keys: bool = False, default=None) -> str:
+    """Serialize obj to a JSON string."""
+    if orjson is not None:
+        return dumps_bytes(obj, sort_keys=sort_keys, default=default).decode('utf-8')
+    return json.dumps(obj, sort_keys=sort_keys, default=default, separators=(',', ':'), ensure_ascii=False)
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider (jsonify, request.get_json) backed by the codec.
+
+    Keeps Flask's key sorting and its `default` conversions for types the
+    backend does not handle itself. Compact output, which response() asks
+    for with separators=(',', ':'), is the codec's own; calls with other
+    json.dumps arguments (e.g. indent for pretty-printed debug responses)
+    go to the stdlib.
+    """
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.get('separators') == (',', ':'):
+            del kwargs['separators']
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, sort_keys=self.sort_keys, default=self.default)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
@@ -0,0 +1,33 @@
+"""
+Deferred construction of module-level singletons.
+"""
+import threading
+
+class LazyProxy:
+    """
+    Stand-in for an object that is only built on first attribute access.
+    
+    Lets modules keep a module-level name (e.g. a controller's service) that
+    callers and tests can use or patch as before, without constructing the
+    object, and importing what it needs, at import time.
+    
+    Args:
+        factory: Zero-argument callable returning the real object
+    """
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+    
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, '_target', self._factory())
+        return self._target
+    
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
@@ -0,0 +1,75 @@
+"""
+Process lifecycle hooks for multi-process serving (see gunicorn.conf.py).
+
+With app preloading, create_app runs once in the master process and workers
+are forked from it. Sockets, SQLite connections, locks and threads created
+before the fork are not safe to share, so after_fork rebuilds them in each
+worker; shutdown drains in-flight backend calls and background work.
+"""
+import time
+from src import idempotency
+from src.clients import balancer, model_router, ollama_client, rails_client
+from src.services import context_store, executor, interaction_metrics, interaction_queue, liveportrait_jobs, model_manager
+
+def after_fork():
+    """Make process-wide state created before fork() safe to use in a worker."""
+    ollama_client.reset_ollama_clients()
+    
+    if model_router._model_router is not None:
+        model_router._model_router.after_fork()
+    
+    if rails_client._rails_client is not None:
+        rails_client._rails_client.after_fork()
+    
+    if model_manager._model_manager is not None:
+        model_manager._model_manager.after_fork()
+    
+    if interaction_queue._interaction_queue is not None:
+        interaction_queue._interaction_queue.after_fork()
+    
+    if context_store._context_store is not None:
+        context_store._context_store.after_fork()
+    
+    if interaction_metrics._interaction_stats is not None:
+        interaction_metrics._interaction_stats.after_fork()
+    
+    if idempotency._idempotency_store is not None:
+        idempotency._idempotency_store.after_fork()
+
+def in_flight_calls() -> int:
+    """Backend calls (Ollama, Whisper, TTS, LivePortrait) currently in flight in this process."""
+    return sum(
+        node['outstanding']
+        for nodes in balancer.balancer_states().values()
+        for node in nodes.values()
+    )
+
+def shutdown(timeout: float = 30):
+    """
+    Drain the process before exit.
+    
+    Waits up to timeout seconds for in-flight backend calls (including LLM
+    generations started by background work), lets the shared executor and
+    running LivePortrait jobs finish, cancels queued jobs and makes a last
+    write-behind flush attempt.
+    
+    Args:
+        timeout: Seconds to wait for in-flight calls
+    """
+    deadline = time.time() + timeout
+    while in_flight_calls() and time.time() < deadline:
+        time.sleep(0.1)
+    
+    if executor._executor is not None:
+        executor._executor.shutdown(wait=True)
+        executor._executor = None
+    
+    if liveportrait_jobs._job_store is not None:
+        liveportrait_jobs._job_store._executor.shutdown(wait=True, cancel_futures=True)
+        liveportrait_jobs._job_store = None
+    
+    if interaction_queue._interaction_queue is not None:
+        interaction_queue._interaction_queue.stop(drain=True)
+    
+    if model_manager._model_manager is not None:
+        model_manager._model_manager.stop_watcher()
@@ -28,11 +28,15 @@ class ChatSession(Base):
     mode = Column(Enum(ChatMode), nullable=False, default=ChatMode.TEXT)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Rolling summary of the first summarized_turns interactions
+    summary = Column(Text, nullable=True)
+    summarized_turns = Column(Integer, nullable=False, default=0)
     
     __table_args__ = (
         Index('idx_firebase_uid', 'firebase_uid'),
         Index('idx_session_uuid', 'session_uuid'),
         Index('idx_mode', 'mode'),
+        Index('idx_chat_sessions_firebase_uid_id', 'firebase_uid', 'id'),
     )
     
     interactions = relationship("Interaction", back_populates="session", cascade="all, delete-orphan")
@@ -47,7 +51,16 @@ class Interaction(Base):
     audio_response_url = Column(String(500), nullable=True)
     liveportrait_data = Column(Text, nullable=True)
     model_used = Column(String(50))
+    # Performance record: token counts and milliseconds per stage as JSON
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    timings = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index('idx_interactions_session_id_id', 'session_id', 'id'),
+        Index('idx_interactions_created_at', 'created_at'),
+    )
+    
     session = relationship("ChatSession", back_populates="interactions")
 
@@ -1,65 +1,101 @@
-from src.clients.whisper_client import WhisperClient
-from src.clients.tts_client import TTSClient
-from src.clients.liveportrait_client import LivePortraitClient
+from src.clients.whisper_client import get_whisper_client
+from src.clients.tts_client import get_tts_client
+from src.clients.liveportrait_client import get_liveportrait_client
+from src.cancellation import check_cancelled
 from src.clients.ollama_client import OllamaClient
-from src.clients.rails_client import RailsClient
-from src.services.title_service import TitleService
+from src.clients.model_router import get_model_router, model_routing_enabled, routed
+from src.clients.rails_client import get_rails_client
+from src.services.title_service import get_title_service
+from src.services.generation_budget import get_budget
+from src.services.interaction_queue import get_interaction_queue, write_behind_enabled
+from src.services.liveportrait_jobs import get_liveportrait_jobs, liveportrait_async_enabled
+from src.services.summary_service import get_summary_service, prompt_history, rolling_summary_enabled
+from src.services.memory_index import get_memory_service, long_term_memory_enabled, recall_messages
+from src.services.interaction_metrics import StageTimer, interaction_metrics
 import tempfile
 import os
+import uuid
+
+AUDIO_MODEL = 'gemma2:1b'
+AUDIO_PROMPT_FILE = 'prompts/Conversational/AutismyVR-Gemma3:1b.txt'
 
 class AudioService:
     def __init__(self):
-        self.whisper = WhisperClient()
-        self.tts = TTSClient()
-        self.liveportrait = LivePortraitClient()
-        self.ollama = OllamaClient(model='gemma2:1b')
-        self.title_service = TitleService()
-        self.rails_client = RailsClient()
+        self.whisper = get_whisper_client()
+        self.tts = get_tts_client()
+        self.liveportrait = get_liveportrait_client()
+        self.ollama = OllamaClient(model=AUDIO_MODEL)
+        self.title_service = get_title_service()
+        self.rails_client = get_rails_client()
+        self.budget = get_budget('audio')
+        self.interaction_queue = get_interaction_queue() if write_behind_enabled() else None
+        self.summary_service = get_summary_service() if rolling_summary_enabled() else None
+        self.memory_service = get_memory_service() if long_term_memory_enabled() else None
+        self.router = get_model_router() if model_routing_enabled() else None
+        self._system_prompt = None
+    
+    def system_prompt(self) -> str:
+        """Conversational system prompt for the audio model, read once from AUDIO_PROMPT_FILE."""
+        if self._system_prompt is None:
+            system_prompt = ""
+            if os.path.exists(AUDIO_PROMPT_FILE):
+                with open(AUDIO_PROMPT_FILE, 'r', encoding='utf-8') as f:
+                    system_prompt = f.read()
+            self._system_prompt = system_prompt
+        return self._system_prompt
     
-    def create_audio_session(self, audio_file, firebase_uid: str, liveportrait: bool = False):
+    def create_audio_session(self, audio_file, firebase_uid: str, liveportrait: bool = False,
+                             liveportrait_async: bool = None):
         tmp_path = None
+        timer = StageTimer()
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
                 audio_file.save(tmp.name)
                 tmp_path = tmp.name
             
             transcribed_text = self.whisper.transcribe(tmp_path)
+            timer.mark('whisper')
             
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
             
-            title = self.title_service.generate_title(transcribed_text)
+            system_prompt = self.system_prompt()
+            memories = recall_messages(self.memory_service, firebase_uid, transcribed_text)
+            llm = routed(self.ollama, 'audio', self.router)
+            
+            title, response_text = self.title_service.generate_title_with_reply(
+                transcribed_text,
+                lambda: llm.request_with_prompt(transcribed_text, system_prompt, budget=self.budget, history=memories)
+            )
+            timer.mark('llm')
             
             session = self.rails_client.create_chat_session(
                 firebase_uid=firebase_uid,
                 title=title,
                 mode="audio"
             )
+            timer.mark('session')
             
-            prompt_file = 'prompts/Conversational/AutismyVR-Gemma3:1b.txt'
-            system_prompt = ""
-            if os.path.exists(prompt_file):
-                with open(prompt_file, 'r', encoding='utf-8') as f:
-                    system_prompt = f.read()
-            
-            response_text = self.ollama.request_with_prompt(transcribed_text, system_prompt)
             content = response_text.get("content", "Error generating response") if response_text else "Error generating response"
             
             audio_response = self.tts.synthesize(content)
-            audio_url = self._save_audio(audio_response, session["session_uuid"])
+            audio_url = self.save_audio(audio_response, session["session_uuid"])
+            timer.mark('tts')
             
-            liveportrait_data = None
-            if liveportrait or self.liveportrait.enabled:
-                liveportrait_data = self.liveportrait.generate(content, audio_url=audio_url)
+            liveportrait_data, liveportrait_job = self.generate_liveportrait(
+                content, audio_url, audio_response, liveportrait, liveportrait_async, firebase_uid=firebase_uid
+            )
+            timer.mark('liveportrait')
             
-            self.rails_client.create_interaction(
+            self.create_interaction(
                 session_uuid=session["session_uuid"],
                 firebase_uid=firebase_uid,
                 prompt=transcribed_text,
                 response=content,
                 audio_response_url=audio_url,
                 liveportrait_data=str(liveportrait_data) if liveportrait_data else None,
-                model_used='gemma2:1b'
+                model_used=llm.llm_model,
+                **interaction_metrics(timer, response_text)
             )
             
             return {
@@ -67,72 +103,116 @@ class AudioService:
                 'title': title,
                 'response_audio_url': audio_url,
                 'response_text': content,
-                'liveportrait': liveportrait_data
+                'liveportrait': liveportrait_data,
+                **liveportrait_job
             }
         except Exception as e:
             if tmp_path and os.path.exists(tmp_path):
                 os.unlink(tmp_path)
             raise e
     
-    def send_audio_message(self, session_uuid: str, audio_file, firebase_uid: str, liveportrait: bool = False):
+    def send_audio_message(self, session_uuid: str, audio_file, firebase_uid: str, liveportrait: bool = False,
+                           liveportrait_async: bool = None):
         tmp_path = None
+        timer = StageTimer()
         try:
             session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
             
             if not session:
                 raise ValueError("Session not found or access denied")
+            timer.mark('session')
             
             with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
                 audio_file.save(tmp.name)
                 tmp_path = tmp.name
             
             transcribed_text = self.whisper.transcribe(tmp_path)
+            timer.mark('whisper')
             
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
             
-            prompt_file = 'prompts/Conversational/AutismyVR-Gemma3:1b.txt'
-            system_prompt = ""
-            if os.path.exists(prompt_file):
-                with open(prompt_file, 'r', encoding='utf-8') as f:
-                    system_prompt = f.read()
+            system_prompt = self.system_prompt()
             
-            history = self._build_history(session_uuid, firebase_uid)
+            history = recall_messages(self.memory_service, firebase_uid, transcribed_text, session_uuid) + \
+                self.build_history(session_uuid, firebase_uid, session)
+            timer.mark('history')
             
-            response_text = self.ollama.request_with_prompt(transcribed_text, system_prompt)
+            llm = routed(self.ollama, 'audio', self.router)
+            response_text = llm.request_with_prompt(
+                transcribed_text, system_prompt, budget=self.budget, history=history
+            )
+            timer.mark('llm')
             content = response_text.get("content", "Error generating response") if response_text else "Error generating response"
             
             audio_response = self.tts.synthesize(content)
-            audio_url = self._save_audio(audio_response, session_uuid)
+            audio_url = self.save_audio(audio_response, session_uuid)
+            timer.mark('tts')
             
-            liveportrait_data = None
-            if liveportrait or self.liveportrait.enabled:
-                liveportrait_data = self.liveportrait.generate(content, audio_url=audio_url)
+            liveportrait_data, liveportrait_job = self.generate_liveportrait(
+                content, audio_url, audio_response, liveportrait, liveportrait_async, firebase_uid=firebase_uid
+            )
+            timer.mark('liveportrait')
             
-            self.rails_client.create_interaction(
+            self.create_interaction(
                 session_uuid=session_uuid,
                 firebase_uid=firebase_uid,
                 prompt=transcribed_text,
                 response=content,
                 audio_response_url=audio_url,
                 liveportrait_data=str(liveportrait_data) if liveportrait_data else None,
-                model_used='gemma2:1b'
+                model_used=llm.llm_model,
+                **interaction_metrics(timer, response_text)
             )
             
             return {
                 'session_uuid': session_uuid,
                 'response_audio_url': audio_url,
                 'response_text': content,
-                'liveportrait': liveportrait_data
+                'liveportrait': liveportrait_data,
+                **liveportrait_job
             }
         except Exception as e:
             if tmp_path and os.path.exists(tmp_path):
                 os.unlink(tmp_path)
             raise e
     
-    def _save_audio(self, audio_data: bytes, session_uuid: str) -> str:
+    def generate_liveportrait(self, content: str, audio_url: str, audio_data: bytes, liveportrait: bool,
+                               liveportrait_async: bool = None, firebase_uid: str = None):
+        """
+        Generate the avatar animation inline, or as a background job.
+        
+        Args:
+            content: Response text
+            audio_url: Response audio URL
+            audio_data: Response audio bytes
+            liveportrait: Requested by the client
+            liveportrait_async: Use a background job (LIVEPORTRAIT_ASYNC when None)
+            firebase_uid: User the job belongs to
+            
+        Returns:
+            Tuple of (inline LivePortrait data, extra response fields with the job ID and status).
+            A job's result is only available from the job endpoints until it expires;
+            it is not written back to the interaction.
+        """
+        if not (liveportrait or self.liveportrait.enabled):
+            return None, {}
+        check_cancelled()
+        
+        if liveportrait_async is None:
+            liveportrait_async = liveportrait_async_enabled()
+        if not liveportrait_async:
+            return self.liveportrait.generate(content, audio_url=audio_url), {}
+        
+        job = get_liveportrait_jobs().submit(
+            content, audio_url=audio_url, audio_data=audio_data, firebase_uid=firebase_uid
+        )
+        return None, {'liveportrait_job_id': job['job_id'], 'liveportrait_status': job['status']}
+    
+    def save_audio(self, audio_data: bytes, session_uuid: str) -> str:
         """
-        Save audio file and return URL.
+        Save the audio of one turn and return its URL. Every call writes a new
+        file, so earlier turns of the session keep their audio.
         For now, returns a placeholder URL. In production, save to S3/storage.
         
         Args:
@@ -145,18 +225,51 @@ class AudioService:
         audio_dir = 'audio_responses'
         os.makedirs(audio_dir, exist_ok=True)
         
-        audio_path = os.path.join(audio_dir, f'{session_uuid}.wav')
+        filename = f'{session_uuid}-{uuid.uuid4().hex}.wav'
+        audio_path = os.path.join(audio_dir, filename)
         with open(audio_path, 'wb') as f:
             f.write(audio_data)
         
-        return f'/audio/{session_uuid}.wav'
+        return f'/audio/{filename}'
+    
+    def build_history(self, session_uuid: str, firebase_uid: str, session: dict = None):
+        """Earlier turns to send with a new prompt (see prompt_history)."""
+        if session is None:
+            session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
+        if self.interaction_queue:
+            with self.interaction_queue.paused():
+                interactions = (self.rails_client.get_interactions(session_uuid, firebase_uid)
+                                + self.interaction_queue.pending_for_session(session_uuid, firebase_uid))
+        else:
+            interactions = self.rails_client.get_interactions(session_uuid, firebase_uid)
+        return prompt_history(session, interactions, firebase_uid, self.summary_service)
     
-    def _build_history(self, session_uuid: str, firebase_uid: str):
-        interactions = self.rails_client.get_interactions(session_uuid, firebase_uid)
+    def create_interaction(self, **interaction):
+        """
+        Store a turn (directly in Rails, or through the write-behind queue) and
+        record its memories.
         
-        history = []
-        for interaction in interactions:
-            history.append({"role": "user", "content": interaction["prompt"]})
-            history.append({"role": "assistant", "content": interaction["response"]})
-        return history
+        Args:
+            **interaction: RailsClient.create_interaction fields
+            
+        Returns:
+            The created interaction
+        """
+        check_cancelled()
+        if self.interaction_queue:
+            created = self.interaction_queue.enqueue(**interaction)
+        else:
+            created = self.rails_client.create_interaction(**interaction)
+        if self.memory_service:
+            self.memory_service.remember(interaction["firebase_uid"], [{**interaction, "created_at": created.get("created_at")}])
+        return created
 
+_audio_service = None
+
+def get_audio_service() -> AudioService:
+    """Return the process-wide AudioService used by the controllers."""
+    global _audio_service
+    
+    if _audio_service is None:
+        _audio_service = AudioService()
+    return _audio_service
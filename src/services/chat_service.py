@@ -1,32 +1,61 @@
+from src.cancellation import cancel_scope, check_cancelled, current_scope, submit_in_scope
 from src.clients.ollama_client import OllamaClient
-from src.clients.rails_client import RailsClient
-from src.services.title_service import TitleService
+from src.clients.model_router import get_model_router, model_routing_enabled, routed
+from src.clients.rails_client import get_rails_client
+from src.services.title_service import get_title_service
+from src.services.context_store import context_reuse_enabled, get_context_store
+from src.services.summary_service import get_summary_service, prompt_history, rolling_summary_enabled
+from src.services.memory_index import get_memory_service, long_term_memory_enabled, recall_messages
+from src.services.executor import get_executor
+from src.services.generation_budget import get_budget
+from src.services.interaction_queue import get_interaction_queue, write_behind_enabled
+from src.services.interaction_metrics import StageTimer, interaction_metrics
+import hashlib
+import itertools
 import os
+import queue
 
 class ChatService:
     def __init__(self):
         self.ollama_client = OllamaClient()
-        self.title_service = TitleService()
-        self.rails_client = RailsClient()
+        self.title_service = get_title_service()
+        self.rails_client = get_rails_client()
+        self.budget = get_budget('text')
+        self.interaction_queue = get_interaction_queue() if write_behind_enabled() else None
+        self.context_store = get_context_store() if context_reuse_enabled() else None
+        self.summary_service = get_summary_service() if rolling_summary_enabled() else None
+        self.memory_service = get_memory_service() if long_term_memory_enabled() else None
+        self.router = get_model_router() if model_routing_enabled() else None
     
     def create_text_session(self, prompt: str, firebase_uid: str):
-        title = self.title_service.generate_title(prompt)
+        timer = StageTimer()
+        llm = routed(self.ollama_client, 'text', self.router)
+        memories = recall_messages(self.memory_service, firebase_uid, prompt)
+        if self.context_store:
+            ask = lambda: llm.generate(prompt, budget=self.budget, history=memories)
+        else:
+            ask = lambda: llm.request(prompt, budget=self.budget, history=memories)
+        title, llm_response = self.title_service.generate_title_with_reply(prompt, ask)
+        timer.mark('llm')
         
         session = self.rails_client.create_chat_session(
             firebase_uid=firebase_uid,
             title=title,
             mode="text"
         )
+        timer.mark('session')
+        if self.context_store and llm_response and llm_response.get("context"):
+            self.context_store.put(session["session_uuid"], llm.llm_model, 1, llm_response["context"])
         
-        llm_response = self.ollama_client.request(prompt)
         content = llm_response.get("content", "Error generating response") if llm_response else "Error generating response"
         
-        interaction = self.rails_client.create_interaction(
+        interaction = self.create_interaction(
             session_uuid=session["session_uuid"],
             firebase_uid=firebase_uid,
             prompt=prompt,
             response=content,
-            model_used=self.ollama_client.llm_model
+            model_used=llm.llm_model,
+            **interaction_metrics(timer, llm_response)
         )
         
         return {
@@ -37,22 +66,31 @@ class ChatService:
         }
     
     def send_text_message(self, session_uuid: str, prompt: str, firebase_uid: str):
+        timer = StageTimer()
         session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
         
         if not session:
             raise ValueError("Session not found or access denied")
+        timer.mark('session')
         
-        history = self._build_history(session_uuid, firebase_uid)
-        
-        llm_response = self.ollama_client.request(prompt)
+        llm = routed(self.ollama_client, 'text', self.router)
+        if self.context_store:
+            llm_response, _ = self._reply_in_context(session, prompt, firebase_uid, self._turn_count(session, firebase_uid), llm)
+        else:
+            history = recall_messages(self.memory_service, firebase_uid, prompt, session_uuid) + \
+                self.build_history(session_uuid, firebase_uid, session)
+            timer.mark('history')
+            llm_response = llm.request(prompt, budget=self.budget, history=history)
+        timer.mark('llm')
         content = llm_response.get("content", "Error generating response") if llm_response else "Error generating response"
         
-        interaction = self.rails_client.create_interaction(
+        interaction = self.create_interaction(
             session_uuid=session_uuid,
             firebase_uid=firebase_uid,
             prompt=prompt,
             response=content,
-            model_used=self.ollama_client.llm_model
+            model_used=llm.llm_model,
+            **interaction_metrics(timer, llm_response)
         )
         
         return {
@@ -61,8 +99,136 @@ class ChatService:
             "interaction_id": interaction["id"]
         }
     
+    def send_text_batch(self, messages: list, firebase_uid: str):
+        """
+        Answer an ordered list of messages for one or more existing sessions.
+        
+        Each session is resolved once; sessions run concurrently on the shared
+        executor while messages within a session keep their order. All resulting
+        interactions are stored with a single bulk Rails call at the end. If the
+        client stops reading, the remaining messages are cancelled and the
+        replies that already finished are still stored.
+        
+        Args:
+            messages: List of {"session_uuid", "prompt"} dicts
+            firebase_uid: Firebase user ID
+            
+        Yields:
+            Event dicts as each message completes ("result" or "error", with the
+            message index), then one "persisted" (or "error") event for the write
+        """
+        sessions = {}
+        for index, message in enumerate(messages):
+            sessions.setdefault(message["session_uuid"], []).append((index, message["prompt"]))
+        
+        events = queue.Queue()
+        for session_uuid, items in sessions.items():
+            submit_in_scope(get_executor(), self._run_batch_session, session_uuid, items, firebase_uid, events)
+        
+        completed = []
+        metrics = {}
+        
+        def collect(event):
+            if event["type"] == "result":
+                metrics[event["index"]] = event.pop("metrics")
+                completed.append(event)
+            return event
+        
+        try:
+            for _ in range(len(messages)):
+                yield collect(events.get())
+        except GeneratorExit:
+            # The client stopped reading: let the session workers stop too
+            scope = current_scope()
+            if scope is not None:
+                scope.cancel()
+            while not events.empty():
+                collect(events.get_nowait())
+            # Nobody reads the results any more, but the finished turns are kept;
+            # the write runs outside the cancelled scope
+            with cancel_scope(None):
+                try:
+                    self._store_batch(completed, metrics, firebase_uid)
+                except Exception as e:
+                    print(f"Failed to store abandoned batch: {e}")
+            raise
+        
+        if not completed:
+            return
+        
+        try:
+            created = self._store_batch(completed, metrics, firebase_uid)
+            yield {
+                "type": "persisted",
+                "interactions": [
+                    {"index": e["index"], "interaction_id": i.get("id")} for e, i in zip(completed, created)
+                ]
+            }
+        except Exception as e:
+            yield {"type": "error", "error": f"Failed to store interactions: {e}"}
+    
+    def _store_batch(self, completed: list, metrics: dict, firebase_uid: str) -> list:
+        """Store the finished batch replies in message order; returns the created interactions."""
+        if not completed:
+            return []
+        completed.sort(key=lambda e: e["index"])
+        interactions = [
+            {
+                "session_uuid": e["session_uuid"],
+                "prompt": e["prompt"],
+                "response": e["response"],
+                **metrics[e["index"]]
+            } for e in completed
+        ]
+        if self.interaction_queue:
+            created = [self.interaction_queue.enqueue(firebase_uid=firebase_uid, **i) for i in interactions]
+        else:
+            created = self.rails_client.create_interactions(firebase_uid, interactions)
+        if self.memory_service:
+            self.memory_service.remember(firebase_uid, [
+                {**i, "created_at": c.get("created_at")} for i, c in zip(interactions, created)
+            ])
+        return created
+    
+    def _run_batch_session(self, session_uuid: str, items: list, firebase_uid: str, events: queue.Queue):
+        try:
+            session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
+            if not session:
+                raise ValueError("Session not found or access denied")
+            turns = self._turn_count(session, firebase_uid) if self.context_store else None
+            history = None if self.context_store else self.build_history(session_uuid, firebase_uid, session)
+        except Exception as e:
+            for index, _ in items:
+                events.put({"type": "error", "index": index, "session_uuid": session_uuid, "error": str(e)})
+            return
+        
+        for index, prompt in items:
+            timer = StageTimer()
+            llm = routed(self.ollama_client, 'text', self.router)
+            try:
+                check_cancelled()
+                if self.context_store:
+                    llm_response, turns = self._reply_in_context(session, prompt, firebase_uid, turns, llm)
+                else:
+                    llm_response = llm.request(prompt, budget=self.budget, history=history)
+                content = llm_response.get("content", "Error generating response") if llm_response else "Error generating response"
+                if history is not None:
+                    # Later messages of the batch see the earlier ones
+                    history = history + [{"role": "user", "content": prompt}, {"role": "assistant", "content": content}]
+                timer.mark('llm')
+                events.put({
+                    "type": "result",
+                    "index": index,
+                    "session_uuid": session_uuid,
+                    "prompt": prompt,
+                    "response": content,
+                    "metrics": {"model_used": llm.llm_model, **interaction_metrics(timer, llm_response)}
+                })
+            except Exception as e:
+                events.put({"type": "error", "index": index, "session_uuid": session_uuid, "error": str(e)})
+    
     def get_session_history(self, session_uuid: str, firebase_uid: str):
-        interactions = self.rails_client.get_interactions(session_uuid, firebase_uid)
+        interactions = self._get_interactions(session_uuid, firebase_uid)
         
         return [
             {
@@ -73,8 +239,9 @@ class ChatService:
             } for i in interactions
         ]
     
-    def get_user_sessions(self, firebase_uid: str):
-        sessions = self.rails_client.list_chat_sessions(firebase_uid)
+    def get_user_sessions(self, firebase_uid: str, sessions: list = None):
+        if sessions is None:
+            sessions = self.rails_client.list_chat_sessions(firebase_uid)
         
         return [
             {
@@ -87,8 +254,9 @@ class ChatService:
             } for s in sessions
         ]
     
-    def get_all_interactions(self, firebase_uid: str):
-        sessions = self.rails_client.list_chat_sessions(firebase_uid)
+    def get_all_interactions(self, firebase_uid: str, sessions: list = None):
+        if sessions is None:
+            sessions = self.rails_client.list_chat_sessions(firebase_uid)
         
         interactions = []
         for session in sessions:
@@ -103,14 +271,172 @@ class ChatService:
                     "model_used": interaction.get("model_used")
                 })
         
+        if self.interaction_queue:
+            titles = {s["session_uuid"]: s["title"] for s in sessions}
+            for interaction in self.interaction_queue.pending_for_user(firebase_uid):
+                interactions.append({
+                    "session_uuid": interaction["session_uuid"],
+                    "session_title": titles.get(interaction["session_uuid"]),
+                    "prompt": interaction["prompt"],
+                    "response": interaction["response"],
+                    "created_at": interaction["created_at"],
+                    "model_used": interaction.get("model_used")
+                })
+        
         return sorted(interactions, key=lambda x: x['created_at'], reverse=True)
     
-    def _build_history(self, session_uuid: str, firebase_uid: str):
-        interactions = self.rails_client.get_interactions(session_uuid, firebase_uid)
+    def list_sessions(self, firebase_uid: str):
+        """Raw session list from Rails, for callers that derive several views from one fetch."""
+        return self.rails_client.list_chat_sessions(firebase_uid)
+    
+    def sessions_etag(self, firebase_uid: str, sessions: list, view: str) -> str:
+        """
+        Strong ETag for a view ('sessions' or 'interactions') of a user's session list.
+        
+        Every interaction bumps its session's updated_at and interaction_count,
+        so the list is unchanged exactly when these are (plus, with write-behind,
+        the interactions still queued locally).
+        """
+        parts = [view] + [
+            f'{s["session_uuid"]}:{s["updated_at"]}:{s.get("interaction_count")}' for s in sessions
+        ]
+        if self.interaction_queue and view == 'interactions':
+            parts.append(len(self.interaction_queue.pending_for_user(firebase_uid)))
+        return _etag(parts)
+    
+    def session_etag(self, session_uuid: str, firebase_uid: str) -> str:
+        """
+        Strong ETag for a session's history, from the session record alone so a
+        poll of an unchanged session skips fetching its interactions.
         
-        history = []
-        for interaction in interactions:
-            history.append({"role": "user", "content": interaction["prompt"]})
-            history.append({"role": "assistant", "content": interaction["response"]})
-        return history
+        Returns:
+            ETag, or None if the session does not exist
+        """
+        session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
+        if not session:
+            return None
+        
+        parts = ['history', session_uuid, session["updated_at"], session.get("interaction_count")]
+        if self.interaction_queue:
+            parts.append(len(self.interaction_queue.pending_for_session(session_uuid, firebase_uid)))
+        return _etag(parts)
+    
+    def export_interactions(self, firebase_uid: str, per_page: int = None):
+        """
+        Lazily yield every interaction of a user, in the shape of get_all_interactions.
+        
+        Sessions and their interactions are fetched from Rails one page at a
+        time (HISTORY_EXPORT_PAGE_SIZE, default 100), so memory stays flat
+        whatever the size of the history. Interactions are grouped by session
+        in the order Rails lists the sessions, instead of sorted globally.
+        
+        Args:
+            firebase_uid: Firebase user ID
+            per_page: Page size for the Rails calls
+        
+        Yields:
+            Interaction dicts
+        """
+        per_page = per_page or int(os.getenv('HISTORY_EXPORT_PAGE_SIZE', '100'))
+        
+        for session in self.rails_client.iter_chat_sessions(firebase_uid, per_page=per_page):
+            interactions = self.rails_client.iter_interactions(session["session_uuid"], firebase_uid, per_page=per_page)
+            if self.interaction_queue:
+                interactions = itertools.chain(
+                    interactions,
+                    self.interaction_queue.pending_for_session(session["session_uuid"], firebase_uid)
+                )
+            
+            for interaction in interactions:
+                yield {
+                    "session_uuid": session["session_uuid"],
+                    "session_title": session["title"],
+                    "prompt": interaction["prompt"],
+                    "response": interaction["response"],
+                    "created_at": interaction["created_at"],
+                    "model_used": interaction.get("model_used")
+                }
 
+    def build_history(self, session_uuid: str, firebase_uid: str, session: dict = None):
+        """Earlier turns to send with a new prompt (see prompt_history)."""
+        if session is None:
+            session = self.rails_client.get_chat_session(session_uuid, firebase_uid)
+        interactions = self._get_interactions(session_uuid, firebase_uid)
+        return prompt_history(session, interactions, firebase_uid, self.summary_service)
+    
+    def _turn_count(self, session: dict, firebase_uid: str):
+        """Turns of a session so far, stored and still queued; None when Rails does not report it."""
+        turns = session.get("interaction_count")
+        if turns is not None and self.interaction_queue:
+            turns += len(self.interaction_queue.pending_for_session(session["session_uuid"], firebase_uid))
+        return turns
+    
+    def _reply_in_context(self, session: dict, prompt: str, firebase_uid: str, turns: int, llm: OllamaClient = None):
+        """
+        Answer a follow-up turn from the session's stored Ollama context, so only
+        the new message is evaluated. A missing or stale context is rebuilt
+        from the stored history, and the new context is kept for the next turn.
+        Contexts are per model, so a turn routed to another model rebuilds one.
+        
+        Returns:
+            Tuple (llm_response, turns covered by the session's context afterwards)
+        """
+        llm = llm or self.ollama_client
+        session_uuid = session["session_uuid"]
+        model = llm.llm_model
+        stored = self.context_store.get(session_uuid, model) if turns is not None else None
+        
+        if stored and stored[0] == turns:
+            llm_response = llm.generate(prompt, budget=self.budget, context=stored[1])
+        else:
+            interactions = self._get_interactions(session_uuid, firebase_uid)
+            history = recall_messages(self.memory_service, firebase_uid, prompt, session_uuid) + \
+                prompt_history(session, interactions, firebase_uid, self.summary_service)
+            llm_response = llm.generate(prompt, budget=self.budget, history=history)
+            turns = len(interactions)
+        
+        if llm_response and llm_response.get("context"):
+            turns += 1
+            self.context_store.put(session_uuid, model, turns, llm_response["context"])
+        return llm_response, turns
+    
+    def _get_interactions(self, session_uuid: str, firebase_uid: str):
+        """Stored interactions followed by the ones still waiting in the write-behind queue."""
+        if not self.interaction_queue:
+            return self.rails_client.get_interactions(session_uuid, firebase_uid)
+        with self.interaction_queue.paused():
+            return (self.rails_client.get_interactions(session_uuid, firebase_uid)
+                    + self.interaction_queue.pending_for_session(session_uuid, firebase_uid))
+    
+    def create_interaction(self, **interaction):
+        """
+        Store a turn (directly in Rails, or through the write-behind queue) and
+        record its memories.
+        
+        Args:
+            **interaction: RailsClient.create_interaction fields
+            
+        Returns:
+            The created interaction
+        """
+        check_cancelled()
+        if self.interaction_queue:
+            created = self.interaction_queue.enqueue(**interaction)
+        else:
+            created = self.rails_client.create_interaction(**interaction)
+        if self.memory_service:
+            self.memory_service.remember(interaction["firebase_uid"], [{**interaction, "created_at": created.get("created_at")}])
+        return created
+
+def _etag(parts: list) -> str:
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+_chat_service = None
+
+def get_chat_service() -> ChatService:
+    """Return the process-wide ChatService used by the controllers."""
+    global _chat_service
+    
+    if _chat_service is None:
+        _chat_service = ChatService()
+    return _chat_service
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+_context_store = None
+_context_store_lock = threading.Lock()
+
+def context_reuse_enabled() -> bool:
+    return os.getenv('OLLAMA_CONTEXT_REUSE', 'false').lower() == 'true'
+
+class ContextStore:
+    """
+    Ollama KV context of each chat session, so a follow-up turn sends only the
+    new message instead of re-evaluating the whole conversation.
+
+    Contexts are token arrays returned by /api/generate, keyed by session and
+    model (tokens of one model mean nothing to another) and stored with the
+    number of turns they cover, so a context that missed a turn (one answered
+    through another path, or a concurrent request) is detected as stale.
+    Recently used contexts are kept in memory as array('i'), four bytes per
+    token instead of a Python int each; all of them are kept in a local
+    SQLite file so they survive restarts and are shared between workers.
+
+    Args:
+        path: SQLite file (OLLAMA_CONTEXT_PATH, default data/ollama_context.db)
+        max_cached: Contexts kept in memory (OLLAMA_CONTEXT_CACHE_SIZE, default 256)
+    """
+
+    def __init__(self, path: str = None, max_cached: int = None):
+        self.path = path or os.getenv('OLLAMA_CONTEXT_PATH', 'data/ollama_context.db')
+        self.max_cached = max_cached if max_cached is not None else int(os.getenv('OLLAMA_CONTEXT_CACHE_SIZE', '256'))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+
+    def after_fork(self):
+        """Re-open the SQLite file and drop the memory tier in a forked worker."""
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._connect()
+
+    def get(self, session_uuid: str, model: str):
+        """
+        Stored context of a session.
+
+        Returns:
+            Tuple (turns, context array), or None if there is none
+        """
+        key = (session_uuid, model)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+            row = self._conn.execute(
+                "SELECT turns, context FROM session_contexts WHERE session_uuid = ? AND model = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], array('i', row[1]))
+            self._remember(key, entry)
+            return entry
+
+    def put(self, session_uuid: str, model: str, turns: int, context):
+        """
+        Store the context returned after a session's turn.
+
+        Args:
+            session_uuid: Session UUID
+            model: Model that produced the context
+            turns: Turns of the session the context covers
+            context: Token ids, as a list or array('i')
+        """
+        key = (session_uuid, model)
+        entry = (turns, context if isinstance(context, array) else array('i', context))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_contexts (session_uuid, model, turns, context, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_uuid, model, turns, entry[1].tobytes(), time.time())
+            )
+            self._remember(key, entry)
+
+    def delete(self, session_uuid: str):
+        """Forget the contexts of a session, for every model."""
+        with self._lock:
+            self._conn.execute("DELETE FROM session_contexts WHERE session_uuid = ?", (session_uuid,))
+            for key in [k for k in self._cache if k[0] == session_uuid]:
+                del self._cache[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored, tokens = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(context)), 0) / 4 FROM session_contexts"
+            ).fetchone()
+            return {
+                "cached": len(self._cache),
+                "cached_bytes": sum(len(c) * c.itemsize for _, c in self._cache.values()),
+                "stored": stored,
+                "stored_tokens": tokens
+            }
+
+    def _remember(self, key: tuple, entry: tuple):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_contexts (
+                session_uuid TEXT NOT NULL,
+                model TEXT NOT NULL,
+                turns INTEGER NOT NULL,
+                context BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (session_uuid, model)
+            )
+        """)
+
+def get_context_store() -> ContextStore:
+    global _context_store
+
+    if _context_store is None:
+        with _context_store_lock:
+            if _context_store is None:
+                _context_store = ContextStore()
+    return _context_store
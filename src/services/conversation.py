@@ -0,0 +1,275 @@
+import base64
+import io
+import os
+import tempfile
+import wave
+from collections import deque
+from src.cancellation import closing_stream, submit_in_scope
+from src.clients.model_router import get_model_router, model_routing_enabled, routed
+from src.services.audio_service import get_audio_service
+from src.services.chat_service import get_chat_service
+from src.services.executor import get_executor
+from src.services.generation_budget import sentence_ends
+from src.services.interaction_metrics import StageTimer, interaction_metrics
+from src.services.liveportrait_jobs import get_liveportrait_jobs
+from src.services.memory_index import get_memory_service, long_term_memory_enabled, recall_messages
+
+class Conversation:
+    """
+    State of one persistent conversation, e.g. a WebSocket connection.
+
+    The session is looked up and its history fetched once when the
+    conversation opens; after that the last `history_turns` turns are kept in
+    memory and sent with every prompt. Each turn streams its events to `emit`:
+    'token' chunks while the reply is generated, then in audio mode one
+    'audio' event per synthesized sentence and 'avatar' events, and finally
+    'reply' (with per-stage timings in milliseconds) and 'done'.
+
+    Args:
+        firebase_uid: Authenticated user
+        emit: Callable receiving event dicts; may raise to abort the turn
+        mode: 'text' or 'audio' (spoken replies with TTS and LivePortrait)
+        liveportrait: Request avatar animation for audio replies
+        liveportrait_async: Run the animation as a background job (LIVEPORTRAIT_ASYNC when None)
+        history_turns: Turns kept as context (CONVERSATION_HISTORY_TURNS, default 10)
+        chat_service: ChatService to use (the process-wide one by default)
+        audio_service: AudioService to use (the process-wide one by default)
+    """
+    def __init__(self, firebase_uid: str, emit, mode: str = 'text', liveportrait: bool = False,
+                 liveportrait_async: bool = None, history_turns: int = None, chat_service=None,
+                 audio_service=None):
+        if mode not in ('text', 'audio'):
+            raise ValueError("mode must be 'text' or 'audio'")
+
+        self.firebase_uid = firebase_uid
+        self.emit = emit
+        self.mode = mode
+        self.liveportrait = liveportrait
+        self.liveportrait_async = liveportrait_async
+        if history_turns is None:
+            history_turns = int(os.getenv('CONVERSATION_HISTORY_TURNS', '10'))
+        self.history = deque(maxlen=2 * history_turns)
+        self.summary = []
+        self.session_uuid = None
+
+        self.audio_service = audio_service or get_audio_service()
+        self.service = self.audio_service if mode == 'audio' else chat_service or get_chat_service()
+        self.llm = self.audio_service.ollama if mode == 'audio' else self.service.ollama_client
+        self.system_prompt = self.audio_service.system_prompt() if mode == 'audio' else None
+        self.memory_service = get_memory_service() if long_term_memory_enabled() else None
+        self.router = get_model_router() if model_routing_enabled() else None
+
+    def open(self, session_uuid: str = None):
+        """
+        Attach to an existing session, or start without one; the session is
+        then created on the first turn.
+
+        Raises:
+            ValueError: If the session does not exist or belongs to another user
+        """
+        if not session_uuid:
+            return
+
+        session = self.service.rails_client.get_chat_session(session_uuid, self.firebase_uid)
+        if not session:
+            raise ValueError("Session not found or access denied")
+
+        self.session_uuid = session_uuid
+        history = self.service.build_history(session_uuid, self.firebase_uid, session)
+        # The rolling summary, if any, stays in front of the turns kept in memory
+        self.summary = [m for m in history if m['role'] == 'system']
+        self.history.extend(m for m in history if m['role'] != 'system')
+
+    def send_audio(self, audio_data: bytes):
+        """Transcribe a recorded utterance and answer it."""
+        timings = StageTimer()
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
+            tmp.write(audio_data)
+        try:
+            prompt = self.audio_service.whisper.transcribe(tmp.name)
+        finally:
+            os.unlink(tmp.name)
+        timings.mark('whisper')
+
+        self.emit({'type': 'transcript', 'text': prompt})
+        self.send_text(prompt, timings)
+
+    def send_text(self, prompt: str, timings: StageTimer = None):
+        """Answer one user message, streaming events to emit."""
+        timings = timings or StageTimer()
+        title_future = None
+        if self.session_uuid is None:
+            title_future = submit_in_scope(get_executor(), self.service.title_service.generate_title, prompt)
+
+        memories = recall_messages(self.memory_service, self.firebase_uid, prompt, self.session_uuid)
+        speech = _SentenceSpeaker(self.audio_service.tts, self.emit) if self.mode == 'audio' else None
+        chunks, stats = [], {}
+        history = memories + self.summary + list(self.history)
+        llm = routed(self.llm, self.mode, self.router)
+        # Closed as soon as emit fails, so a departed client stops the generation
+        with closing_stream(llm.stream(prompt, self.system_prompt, budget=self.service.budget, history=history,
+                                stats=stats)) as stream:
+            for chunk in stream:
+                if not chunks:
+                    timings.mark('first_token')
+                chunks.append(chunk)
+                self.emit({'type': 'token', 'text': chunk})
+                if speech:
+                    speech.feed(chunk)
+        content = ''.join(chunks).strip() or "Error generating response"
+        timings.mark('generation')
+
+        if title_future:
+            self._create_session(prompt, title_future)
+            timings.mark('session')
+
+        audio_url, liveportrait_data = None, None
+        if speech:
+            audio_data = speech.finish()
+            timings.mark('tts')
+            if audio_data:
+                audio_url = self.audio_service.save_audio(audio_data, self.session_uuid)
+                liveportrait_data = self._animate(content, audio_url, audio_data)
+                timings.mark('avatar')
+
+        interaction = self.service.create_interaction(
+            session_uuid=self.session_uuid,
+            firebase_uid=self.firebase_uid,
+            prompt=prompt,
+            response=content,
+            audio_response_url=audio_url,
+            liveportrait_data=str(liveportrait_data) if liveportrait_data else None,
+            model_used=llm.llm_model,
+            **interaction_metrics(timings, stats)
+        )
+        timings.mark('persist')
+        self.history.extend([
+            {'role': 'user', 'content': prompt},
+            {'role': 'assistant', 'content': content}
+        ])
+
+        self.emit({
+            'type': 'reply',
+            'session_uuid': self.session_uuid,
+            'text': content,
+            'audio_url': audio_url,
+            'interaction_id': interaction.get('id'),
+            'timings': timings.to_dict()
+        })
+        self.emit({'type': 'done'})
+
+    def _create_session(self, prompt: str, title_future):
+        try:
+            title = title_future.result()
+        except Exception as e:
+            print(f"Title generation failed, using fallback: {e!r}")
+            title = self.service.title_service.fallback_title(prompt)
+
+        session = self.service.rails_client.create_chat_session(
+            firebase_uid=self.firebase_uid,
+            title=title,
+            mode=self.mode
+        )
+        self.session_uuid = session['session_uuid']
+        self.emit({'type': 'session', 'session_uuid': self.session_uuid, 'title': title})
+
+    def _animate(self, content: str, audio_url: str, audio_data: bytes):
+        liveportrait_data, job = self.audio_service.generate_liveportrait(
+            content, audio_url, audio_data, self.liveportrait, self.liveportrait_async, firebase_uid=self.firebase_uid
+        )
+        if liveportrait_data:
+            self.emit({'type': 'avatar', 'status': 'done', 'result': liveportrait_data})
+        elif job:
+            self.emit({'type': 'avatar', 'job_id': job['liveportrait_job_id'], 'status': job['liveportrait_status']})
+            get_executor().submit(self._follow_job, job['liveportrait_job_id'], job['liveportrait_status'])
+        return liveportrait_data
+
+    def _follow_job(self, job_id: str, status: str):
+        jobs = get_liveportrait_jobs()
+        try:
+            while status not in ('done', 'failed'):
+                job = jobs.wait(job_id, last_status=status, firebase_uid=self.firebase_uid)
+                if job is None:
+                    return
+                if job['status'] != status:
+                    status = job['status']
+                    self.emit({'type': 'avatar', **job})
+        except Exception as e:
+            print(f"Avatar job events stopped: {e!r}")
+
+class _SentenceSpeaker:
+    """
+    Synthesizes a streamed reply sentence by sentence on the shared executor,
+    emitting each sentence's audio in order as soon as it is ready, so speech
+    starts before the reply is complete.
+    """
+    def __init__(self, tts, emit):
+        self.tts = tts
+        self.emit = emit
+        self.pending_text = ''
+        self.futures = deque()
+        self.parts = []
+
+    def feed(self, chunk: str):
+        self.pending_text += chunk
+        # A sentence is complete once whitespace follows its end
+        start = 0
+        for end in sentence_ends(self.pending_text):
+            if end < len(self.pending_text):
+                self._speak(self.pending_text[start:end])
+                start = end
+        self.pending_text = self.pending_text[start:]
+        self._flush(wait=False)
+
+    def finish(self):
+        """Speak the remaining text, wait for all audio and return it as one clip (None if it cannot be joined)."""
+        self._speak(self.pending_text)
+        self.pending_text = ''
+        self._flush(wait=True)
+        return _join_wav(self.parts)
+
+    def _speak(self, sentence: str):
+        if sentence.strip():
+            self.futures.append((sentence.strip(), submit_in_scope(get_executor(), self.tts.synthesize, sentence.strip())))
+
+    def _flush(self, wait: bool):
+        while self.futures and (wait or self.futures[0][1].done()):
+            sentence, future = self.futures.popleft()
+            audio_data = future.result()
+            self.emit({
+                'type': 'audio',
+                'seq': len(self.parts),
+                'text': sentence,
+                'data': base64.b64encode(audio_data).decode('ascii')
+            })
+            self.parts.append(audio_data)
+
+def _join_wav(parts: list):
+    """
+    Concatenate WAV clips into one WAV file.
+    
+    Returns:
+        The joined WAV, or None when the clips are not all WAV with the same
+        format (their bytes cannot simply be appended: every clip carries its
+        own header)
+    """
+    if len(parts) < 2:
+        return parts[0] if parts else b''
+    try:
+        output = io.BytesIO()
+        with wave.open(io.BytesIO(parts[0])) as first:
+            params = first.getparams()
+        with wave.open(output, 'wb') as joined:
+            joined.setparams(params)
+            for part in parts:
+                with wave.open(io.BytesIO(part)) as clip:
+                    if _wav_format(clip.getparams()) != _wav_format(params):
+                        raise wave.Error(f"clip format {_wav_format(clip.getparams())} differs from {_wav_format(params)}")
+                    joined.writeframes(clip.readframes(clip.getnframes()))
+        return output.getvalue()
+    except (wave.Error, EOFError) as e:
+        print(f"Cannot join {len(parts)} audio clips, the turn keeps only the per-sentence audio: {e}")
+        return None
+
+def _wav_format(params) -> tuple:
+    return params.nchannels, params.sampwidth, params.framerate, params.comptype
@@ -0,0 +1,24 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool shared by the services for work that runs
+    alongside a request (e.g. title generation).
+    
+    Sized with SERVICE_EXECUTOR_WORKERS (default 16).
+    """
+    global _executor
+    
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('SERVICE_EXECUTOR_WORKERS', '16')),
+                    thread_name_prefix='service'
+                )
+    return _executor
@@ -0,0 +1,117 @@
+import os
+import re
+
+# Sentence-ending punctuation, with closing quotes or brackets, before whitespace
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s|$)')
+_CODE_BLOCK = re.compile(r'```.*?(?:```|$)', re.DOTALL)
+# Words whose trailing period does not end a sentence
+_ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'e.g', 'i.e'}
+
+# Defaults per channel. Audio replies are spoken by TTS and animated by
+# LivePortrait, so their cost grows with every extra sentence.
+DEFAULT_BUDGETS = {
+    'text': {'max_tokens': 512, 'stop': [], 'target_sentences': None},
+    'audio': {'max_tokens': 120, 'stop': ['\n\n'], 'target_sentences': 3},
+    'title': {'max_tokens': 24, 'stop': ['\n'], 'target_sentences': 1},
+    'summary': {'max_tokens': 256, 'stop': [], 'target_sentences': None}
+}
+
+class GenerationBudget:
+    """
+    Output-length budget for one channel: a hard token cap, stop sequences and
+    a target sentence count used both as a prompt instruction and to trim the reply.
+    """
+
+    def __init__(self, max_tokens: int = None, stop: list = None, target_sentences: int = None):
+        self.max_tokens = max_tokens
+        self.stop = stop or []
+        self.target_sentences = target_sentences
+
+    def options(self) -> dict:
+        options = {}
+        if self.max_tokens:
+            options['num_predict'] = self.max_tokens
+        if self.stop:
+            options['stop'] = self.stop
+        return options
+
+    def instruction(self) -> str:
+        if not self.target_sentences:
+            return ''
+        unit = 'sentence' if self.target_sentences == 1 else 'sentences'
+        return f"Answer in at most {self.target_sentences} {unit}."
+
+    def apply(self, text: str, truncated: bool = False) -> str:
+        """
+        Trim a reply to the budget. The text is only cut, never reflowed, so
+        Markdown lists and code blocks survive; without a sentence target or
+        truncation it is returned as generated.
+        
+        Args:
+            text: Generated text
+            truncated: True when generation stopped at max_tokens, in which case
+                a trailing partial sentence is dropped
+            
+        Returns:
+            Trimmed text
+        """
+        text = text.strip()
+        if not self.target_sentences and not truncated:
+            return text
+        
+        ends = sentence_ends(text)
+        if truncated and ends and ends[-1] < len(text):
+            text = text[:ends[-1]]
+        if self.target_sentences and len(ends) > self.target_sentences:
+            text = text[:ends[self.target_sentences - 1]]
+        return text
+
+    def to_dict(self) -> dict:
+        return {
+            'max_tokens': self.max_tokens,
+            'stop': self.stop,
+            'target_sentences': self.target_sentences
+        }
+
+def sentence_ends(text: str) -> list:
+    """
+    Offsets just past each sentence end in text. Periods of common
+    abbreviations and list numbers ("1.") are not sentence ends,
+    nor is anything inside a fenced code block.
+    """
+    code_blocks = [m.span() for m in _CODE_BLOCK.finditer(text)]
+    ends = []
+    for match in _SENTENCE_END.finditer(text):
+        start = match.start()
+        if any(block_start <= start < block_end for block_start, block_end in code_blocks):
+            continue
+        if text[start] == '.':
+            line = text[text.rfind('\n', 0, start) + 1:start].strip()
+            word = line.split()[-1] if line else ''
+            if word.lower() in _ABBREVIATIONS or line.isdigit():
+                continue
+        ends.append(match.end())
+    return ends
+
+def get_budget(mode: str) -> GenerationBudget:
+    """
+    Build the budget for a channel ('text', 'audio', 'title' or 'summary').
+    
+    Each field can be overridden per endpoint with GEN_BUDGET_<MODE>_MAX_TOKENS,
+    GEN_BUDGET_<MODE>_STOP ('|'-separated, escapes like \\n allowed) and
+    GEN_BUDGET_<MODE>_SENTENCES. A value of 0 disables that limit.
+    """
+    defaults = DEFAULT_BUDGETS.get(mode, DEFAULT_BUDGETS['text'])
+    prefix = f'GEN_BUDGET_{mode.upper()}_'
+    
+    max_tokens = int(os.getenv(prefix + 'MAX_TOKENS', defaults['max_tokens'] or 0))
+    sentences = int(os.getenv(prefix + 'SENTENCES', defaults['target_sentences'] or 0))
+    stop = defaults['stop']
+    if os.getenv(prefix + 'STOP') is not None:
+        stop = [s.encode().decode('unicode_escape') for s in os.getenv(prefix + 'STOP').split('|') if s]
+    
+    return GenerationBudget(
+        max_tokens=max_tokens or None,
+        stop=stop,
+        target_sentences=sentences or None
+    )
@@ -0,0 +1,167 @@
+"""
+Per-interaction performance record: stage timings and token counts.
+
+Each stored interaction carries prompt_tokens, completion_tokens and a
+timings dict (milliseconds per stage) to Rails, which keeps them in the
+interactions table. GET /metrics/interactions reads that table back and
+aggregates it into p50/p95 per day, model and mode, so the numbers cover
+every host that served a turn.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from src import json_codec
+from src.cancellation import check_cancelled
+
+_interaction_stats = None
+_interaction_stats_lock = threading.Lock()
+
+# Ollama reports durations in nanoseconds
+_OLLAMA_STAGES = {
+    'total_duration': 'llm_total_ms',
+    'load_duration': 'load_ms',
+    'prompt_eval_duration': 'prompt_eval_ms',
+    'eval_duration': 'eval_ms'
+}
+
+class StageTimer:
+    """
+    Milliseconds spent in each stage of a turn. first_token is measured from
+    the start of the turn; the other stages from the end of the previous one.
+    """
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[f'{stage}_ms'] = round((now - (self.started if stage == 'first_token' else self.last)) * 1000, 1)
+        if stage != 'first_token':
+            self.last = now
+
+    def to_dict(self) -> dict:
+        return {**self.stages, 'total_ms': round((time.perf_counter() - self.started) * 1000, 1)}
+
+def interaction_metrics(timer: StageTimer, llm_response: dict = None) -> dict:
+    """
+    Interaction fields for a finished turn.
+
+    Args:
+        timer: Stage timings of the turn
+        llm_response: Ollama result (request()/generate() dict or stream stats), if any
+
+    Returns:
+        Dict with prompt_tokens, completion_tokens and timings
+    """
+    llm_response = llm_response or {}
+    timings = timer.to_dict()
+    for key, stage in _OLLAMA_STAGES.items():
+        if llm_response.get(key):
+            timings[stage] = round(llm_response[key] / 1e6, 1)
+    return {
+        "prompt_tokens": llm_response.get("prompt_eval_count"),
+        "completion_tokens": llm_response.get("eval_count"),
+        "timings": timings
+    }
+
+class InteractionStats:
+    """
+    Latency and token percentiles over the interactions table, read through
+    the direct database path (READ_DATABASE_URL, default DATABASE_URL).
+
+    Args:
+        engine: SQLAlchemy engine; by default a pooled read engine
+    """
+
+    def __init__(self, engine=None):
+        from src.clients.db_read_client import create_read_engine
+        from src.models.chat_models import ChatSession, Interaction
+
+        self.engine = engine or create_read_engine()
+        self.sessions = ChatSession.__table__
+        self.interactions = Interaction.__table__
+
+    def after_fork(self):
+        # Pooled connections belong to the parent process
+        self.engine.dispose(close=False)
+
+    def aggregate(self, days: int = 7, model: str = None, mode: str = None) -> list:
+        """
+        Latency and token percentiles per day (UTC), model and mode. Only
+        interactions that carry timings are counted; the mode is the one of
+        the interaction's session.
+
+        Args:
+            days: Days to cover, today included
+            model: Only this model
+            mode: Only this mode
+
+        Returns:
+            List of {day, model, mode, count, stages: {stage: {p50, p95}},
+            prompt_tokens: {p50, p95, total}, completion_tokens: {p50, p95, total},
+            tokens_per_second: {p50, p95}}, newest day first
+        """
+        from sqlalchemy import String, cast, select
+        from src.models.chat_models import ChatMode
+
+        i, s = self.interactions.c, self.sessions.c
+        since = datetime.combine(datetime.now(timezone.utc).date() - timedelta(days=days - 1), datetime.min.time())
+        query = (
+            select(i.created_at, i.model_used, cast(s.mode, String).label('mode'),
+                   i.prompt_tokens, i.completion_tokens, i.timings)
+            .join_from(self.interactions, self.sessions, i.session_id == s.id)
+            .where(i.created_at >= since, i.timings.is_not(None))
+        )
+        if model:
+            query = query.where(i.model_used == model)
+        if mode:
+            query = query.where(s.mode == ChatMode(mode))
+        check_cancelled()
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).all()
+
+        groups = {}
+        for row in rows:
+            key = (row.created_at.date().isoformat(), row.model_used or 'unknown', (row.mode or 'text').lower())
+            group = groups.setdefault(key, {'count': 0, 'stages': {}, 'prompt': [], 'completion': [], 'rate': []})
+            group['count'] += 1
+            timings = json_codec.loads(row.timings)
+            for stage, ms in timings.items():
+                group['stages'].setdefault(stage, []).append(ms)
+            if row.prompt_tokens is not None:
+                group['prompt'].append(row.prompt_tokens)
+            if row.completion_tokens is not None:
+                group['completion'].append(row.completion_tokens)
+                if timings.get('eval_ms'):
+                    group['rate'].append(row.completion_tokens / (timings['eval_ms'] / 1000))
+
+        return [
+            {
+                "day": day,
+                "model": row_model,
+                "mode": row_mode,
+                "count": group['count'],
+                "stages": {stage: _percentiles(values) for stage, values in sorted(group['stages'].items())},
+                "prompt_tokens": {**_percentiles(group['prompt']), "total": sum(group['prompt'])},
+                "completion_tokens": {**_percentiles(group['completion']), "total": sum(group['completion'])},
+                "tokens_per_second": _percentiles(group['rate'])
+            } for (day, row_model, row_mode), group in sorted(groups.items(), reverse=True)
+        ]
+
+def _percentiles(values: list) -> dict:
+    """Nearest-rank p50 and p95 (None for no values)."""
+    if not values:
+        return {"p50": None, "p95": None}
+    ordered = sorted(values)
+    pick = lambda pct: round(ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1], 1)
+    return {"p50": pick(50), "p95": pick(95)}
+
+def get_interaction_stats() -> InteractionStats:
+    global _interaction_stats
+
+    if _interaction_stats is None:
+        with _interaction_stats_lock:
+            if _interaction_stats is None:
+                _interaction_stats = InteractionStats()
+    return _interaction_stats
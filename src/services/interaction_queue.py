@@ -0,0 +1,294 @@
+import atexit
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from src.clients.rails_client import RailsClient, get_rails_client
+from src import json_codec
+
+_interaction_queue = None
+_interaction_queue_lock = threading.Lock()
+
+def write_behind_enabled() -> bool:
+    return os.getenv('INTERACTION_WRITE_BEHIND', 'false').lower() == 'true'
+
+class InteractionQueue:
+    """
+    Durable write-behind queue for interaction persistence.
+    
+    Interactions are appended to a local SQLite journal and the request returns
+    immediately; a background worker flushes them to Rails in bulk batches with
+    retries and exponential backoff. Entries of a session are always sent in
+    journal order: when one fails, later entries of that session wait for it.
+    Only server and network errors are retried; when Rails rejects a batch
+    (4xx), its entries are sent one at a time and those Rails rejects are
+    marked dead right away, so one bad entry does not hold back the rest.
+    Entries that keep failing are marked dead after max_attempts.
+    """
+
+    def __init__(self, path: str = None, rails_client: RailsClient = None):
+        self.path = path or os.getenv('INTERACTION_QUEUE_PATH', 'data/interaction_queue.db')
+        self.rails_client = rails_client or get_rails_client()
+        self.batch_size = int(os.getenv('INTERACTION_QUEUE_BATCH_SIZE', '50'))
+        self.flush_interval = float(os.getenv('INTERACTION_QUEUE_FLUSH_INTERVAL', '1'))
+        self.max_attempts = int(os.getenv('INTERACTION_QUEUE_MAX_ATTEMPTS', '10'))
+        self.max_backoff = float(os.getenv('INTERACTION_QUEUE_MAX_BACKOFF', '300'))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+
+    def after_fork(self):
+        """
+        Re-open the journal in a forked worker. The worker thread keeps running
+        in the parent process, which flushes what the workers enqueue.
+        """
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._connect()
+
+    def enqueue(self, session_uuid: str, firebase_uid: str, prompt: str, response: str, **fields) -> dict:
+        """
+        Journal an interaction for asynchronous persistence.
+        
+        Args:
+            session_uuid: Session UUID
+            firebase_uid: Firebase user ID
+            prompt: User prompt
+            response: Assistant response
+            **fields: Remaining create_interaction fields (audio_response_url, ...)
+            
+        Returns:
+            The queued interaction, with id None and its local queue_id
+        """
+        created_at = datetime.now(timezone.utc).isoformat()
+        payload = {"prompt": prompt, "response": response, **fields}
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO pending_interactions (firebase_uid, session_uuid, payload, created_at) VALUES (?, ?, ?, ?)",
+                (firebase_uid, session_uuid, json_codec.dumps(payload), created_at)
+            )
+        self._wake.set()
+        return {"id": None, "queue_id": cursor.lastrowid, "session_uuid": session_uuid, "created_at": created_at, **payload}
+
+    def pending_for_session(self, session_uuid: str, firebase_uid: str) -> list:
+        """Interactions of a session that are journaled but not yet in Rails, oldest first."""
+        return self._pending("session_uuid = ? AND firebase_uid = ?", (session_uuid, firebase_uid))
+
+    def pending_for_user(self, firebase_uid: str) -> list:
+        return self._pending("firebase_uid = ?", (firebase_uid,))
+
+    def flush(self) -> int:
+        """
+        Send one round of due entries to Rails.
+        
+        Returns:
+            Number of interactions stored
+        """
+        with self.paused():
+            return self._flush()
+
+    @contextmanager
+    def paused(self):
+        """
+        Hold off flushes, in every process sharing the journal, for the block.
+
+        Readers that combine Rails and the journal read both inside it: an
+        entry flushed between the two reads would otherwise be missing from
+        both, or show up in both.
+        """
+        # The file lock keeps processes sharing the journal from sending the same rows
+        with self._flush_lock, open(f'{self.path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM pending_interactions GROUP BY status").fetchall()
+        return {"pending": 0, "dead": 0, **dict(rows)}
+
+    def start(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='interaction-queue', daemon=True)
+            self._worker.start()
+
+    def stop(self, drain: bool = True):
+        """Stop the worker, optionally making a last flush attempt first."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker:
+            self._worker.join(timeout=self.flush_interval + 5)
+            self._worker = None
+        if drain:
+            self.flush()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_interactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                firebase_uid TEXT NOT NULL,
+                session_uuid TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                last_error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_session ON pending_interactions(session_uuid, id)")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Interaction queue worker error: {e}")
+
+    def _flush(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, firebase_uid, session_uuid, payload, attempts, next_attempt_at FROM pending_interactions "
+                "WHERE status = 'pending' ORDER BY id"
+            ).fetchall()
+        
+        now = time.time()
+        blocked = set()
+        batches = {}
+        for row_id, firebase_uid, session_uuid, payload, attempts, next_attempt_at in rows:
+            # Keep per-session ordering: nothing after a waiting entry may overtake it
+            if session_uuid in blocked or next_attempt_at > now:
+                blocked.add(session_uuid)
+                continue
+            batch = batches.setdefault(firebase_uid, [])
+            if len(batch) < self.batch_size:
+                batch.append((row_id, session_uuid, payload, attempts))
+            else:
+                blocked.add(session_uuid)
+        
+        stored = 0
+        for firebase_uid, batch in batches.items():
+            try:
+                self._send(firebase_uid, batch)
+            except Exception as e:
+                stored_before = self._delete_stored(batch, e)
+                stored += stored_before
+                batch = batch[stored_before:]
+                if not _rejected(e):
+                    print(f"Interaction queue flush error ({len(batch)} pending): {e}")
+                    self._mark_failed(batch, str(e))
+                elif len(batch) == 1:
+                    self._mark_dead(batch, str(e))
+                else:
+                    stored += self._send_singly(firebase_uid, batch)
+                continue
+            self._delete(batch)
+            stored += len(batch)
+        return stored
+
+    def _send_singly(self, firebase_uid: str, batch: list) -> int:
+        """Send a rejected batch entry by entry, marking dead only the entries Rails rejects."""
+        stored = 0
+        for n, entry in enumerate(batch):
+            try:
+                self._send(firebase_uid, [entry])
+            except Exception as e:
+                if _rejected(e):
+                    self._mark_dead([entry], str(e))
+                    continue
+                print(f"Interaction queue flush error ({len(batch) - n} pending): {e}")
+                self._mark_failed(batch[n:], str(e))
+                break
+            self._delete([entry])
+            stored += 1
+        return stored
+
+    def _delete_stored(self, batch: list, error: Exception) -> int:
+        """
+        Delete the leading entries Rails stored before a write failed part way
+        (see PartialWriteError), so they are not sent again; returns their count.
+        """
+        stored = len(getattr(error, 'created', None) or [])
+        if stored:
+            self._delete(batch[:stored])
+        return stored
+
+    def _send(self, firebase_uid: str, batch: list):
+        self.rails_client.create_interactions(firebase_uid, [
+            {"session_uuid": session_uuid, **json_codec.loads(payload)} for _, session_uuid, payload, _ in batch
+        ])
+
+    def _delete(self, batch: list):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending_interactions WHERE id = ?", [(row[0],) for row in batch])
+
+    def _pending(self, where: str, params: tuple) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, session_uuid, payload, created_at FROM pending_interactions "
+                f"WHERE status = 'pending' AND {where} ORDER BY id",
+                params
+            ).fetchall()
+        return [
+            {"id": None, "queue_id": row_id, "session_uuid": session_uuid, "created_at": created_at, **json_codec.loads(payload)}
+            for row_id, session_uuid, payload, created_at in rows
+        ]
+
+    def _mark_failed(self, batch: list, error: str):
+        now = time.time()
+        with self._lock:
+            for row_id, session_uuid, _, attempts in batch:
+                attempts += 1
+                status = 'dead' if attempts >= self.max_attempts else 'pending'
+                backoff = min(self.max_backoff, self.flush_interval * 2 ** attempts)
+                self._conn.execute(
+                    "UPDATE pending_interactions SET attempts = ?, next_attempt_at = ?, status = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + backoff, status, error, row_id)
+                )
+                if status == 'dead':
+                    print(f"Interaction queue entry {row_id} of session {session_uuid} is dead after {attempts} attempts: {error}")
+
+    def _mark_dead(self, batch: list, error: str):
+        with self._lock:
+            for row_id, session_uuid, _, attempts in batch:
+                self._conn.execute(
+                    "UPDATE pending_interactions SET attempts = ?, status = 'dead', last_error = ? WHERE id = ?",
+                    (attempts + 1, error, row_id)
+                )
+                print(f"Interaction queue entry {row_id} of session {session_uuid} rejected by Rails, marked dead: {error}")
+
+def _rejected(error: Exception) -> bool:
+    """True if Rails refused the request itself (4xx other than timeouts and rate limits), so a retry cannot succeed."""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+def get_interaction_queue() -> InteractionQueue:
+    global _interaction_queue
+    
+    if _interaction_queue is None:
+        with _interaction_queue_lock:
+            if _interaction_queue is None:
+                _interaction_queue = InteractionQueue()
+                _interaction_queue.start()
+                atexit.register(_interaction_queue.stop)
+    return _interaction_queue
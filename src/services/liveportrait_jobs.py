@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from src.clients.liveportrait_client import LivePortraitClient, get_liveportrait_client
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def liveportrait_async_enabled() -> bool:
+    return os.getenv('LIVEPORTRAIT_ASYNC', 'false').lower() == 'true'
+
+class LivePortraitJobStore:
+    """
+    Runs LivePortrait generation as background jobs on a bounded worker pool.
+    
+    Each job belongs to the user who submitted it: only that user can read
+    it, and jobs with identical (user, text, audio) inputs are deduplicated to
+    the same job ID. Finished jobs are kept for ttl seconds so clients can poll or
+    subscribe to them. When max_queued jobs are already waiting, new jobs are
+    rejected instead of piling up.
+    """
+
+    def __init__(self, client: LivePortraitClient = None, workers: int = None, ttl: float = None, max_queued: int = None):
+        self.client = client or get_liveportrait_client()
+        self.ttl = ttl if ttl is not None else float(os.getenv('LIVEPORTRAIT_JOB_TTL', '600'))
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv('LIVEPORTRAIT_JOB_MAX_QUEUED', '32'))
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv('LIVEPORTRAIT_JOB_WORKERS', '2')),
+            thread_name_prefix='liveportrait'
+        )
+        self._jobs = {}
+        self._by_key = {}
+        self._changed = threading.Condition()
+
+    def submit(self, text: str, audio_url: str = None, audio_data: bytes = None, firebase_uid: str = None) -> dict:
+        """
+        Queue a generation job, or return the existing job for the same inputs.
+        
+        Args:
+            text: Text to animate
+            audio_url: Audio URL for lip-sync
+            audio_data: Audio bytes, used instead of the URL to detect identical inputs
+            firebase_uid: Owner of the job
+            
+        Returns:
+            Job snapshot; status is 'rejected' when the queue is full
+        """
+        key = self._key(firebase_uid, text, audio_url, audio_data)
+        with self._changed:
+            self._expire()
+            job_id = self._by_key.get(key)
+            if job_id in self._jobs and self._jobs[job_id]['status'] != 'failed':
+                return self._snapshot(self._jobs[job_id])
+            
+            if sum(1 for job in self._jobs.values() if job['status'] == 'queued') >= self.max_queued:
+                return {'job_id': None, 'status': 'rejected', 'result': None, 'error': 'LivePortrait queue is full'}
+            
+            job = {
+                'job_id': str(uuid.uuid4()),
+                'key': key,
+                'firebase_uid': firebase_uid,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'finished_at': None
+            }
+            self._jobs[job['job_id']] = job
+            self._by_key[key] = job['job_id']
+        
+        self._executor.submit(self._run, job['job_id'], text, audio_url)
+        return self._snapshot(job)
+
+    def get(self, job_id: str, firebase_uid: str = None):
+        """Return the job snapshot, or None if it is unknown, expired or owned by another user."""
+        with self._changed:
+            self._expire()
+            job = self._owned(job_id, firebase_uid)
+            return self._snapshot(job) if job else None
+
+    def wait(self, job_id: str, last_status: str = None, timeout: float = 15, firebase_uid: str = None):
+        """
+        Block until the job's status differs from last_status or timeout passes.
+        
+        Returns:
+            The job snapshot (possibly unchanged), or None if it is unknown,
+            expired or owned by another user
+        """
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                job = self._owned(job_id, firebase_uid)
+                if not job or job['status'] != last_status:
+                    return self._snapshot(job) if job else None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return self._snapshot(job)
+                self._changed.wait(remaining)
+
+    def stats(self) -> dict:
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return counts
+
+    def _run(self, job_id: str, text: str, audio_url: str):
+        self._set(job_id, status='running')
+        try:
+            result = self.client.generate(text, audio_url=audio_url)
+        except Exception as e:
+            result = None
+            print(f"LivePortrait job {job_id} error: {e}")
+        if result is None:
+            self._set(job_id, status='failed', error='LivePortrait generation failed', finished_at=time.time())
+        else:
+            self._set(job_id, status='done', result=result, finished_at=time.time())
+
+    def _set(self, job_id: str, **fields):
+        with self._changed:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+            self._changed.notify_all()
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and now - job['finished_at'] > self.ttl
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job['key']) == job_id:
+                del self._by_key[job['key']]
+
+    def _owned(self, job_id: str, firebase_uid: str):
+        job = self._jobs.get(job_id)
+        return job if job and job['firebase_uid'] == firebase_uid else None
+
+    def _key(self, firebase_uid: str, text: str, audio_url: str, audio_data: bytes) -> str:
+        digest = hashlib.sha256((firebase_uid or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(hashlib.sha256(audio_data).digest() if audio_data is not None else (audio_url or '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def _snapshot(self, job: dict) -> dict:
+        return {key: job[key] for key in ('job_id', 'status', 'result', 'error')}
+
+def get_liveportrait_jobs() -> LivePortraitJobStore:
+    global _job_store
+    
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = LivePortraitJobStore()
+    return _job_store
@@ -0,0 +1,298 @@
+"""
+Long-term memory across sessions: a per-user vector index of past exchanges.
+
+Every stored prompt/response pair is embedded in the background and appended
+to its user's index; at turn time the exchanges closest to the new prompt are
+recalled and sent to the model ahead of the session history.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from src.clients.ollama_client import OllamaClient
+from src.services.executor import get_executor
+from src import json_codec
+
+_memory_service = None
+_memory_service_lock = threading.Lock()
+
+def long_term_memory_enabled() -> bool:
+    return os.getenv('LONG_TERM_MEMORY', 'false').lower() == 'true'
+
+def embed_model() -> str:
+    return os.getenv('OLLAMA_EMBED_MODEL', 'all-minilm')
+
+class MemoryIndex:
+    """
+    Append-only vector index of one user's exchanges, in one directory.
+
+    Vectors are L2-normalized float32 rows appended to vectors.f32 and searched
+    through a read-only memory map, so the matrix lives in the page cache
+    rather than the Python heap; a query is a single matrix-vector product.
+    The exchanges themselves are JSON lines in entries.jsonl, of which only the
+    byte offsets are kept in memory and the hits are read on demand.
+    index.json records the embedding model and dimension: vectors of another
+    model are not comparable, so the index is reset when the model changes.
+
+    Several processes may share the files: writes hold a file lock, and rows
+    appended by other processes are picked up before each search.
+
+    Args:
+        directory: Directory holding the index files
+        model: Embedding model the vectors come from
+    """
+
+    def __init__(self, directory: str, model: str):
+        self.directory = directory
+        self.model = model
+        self.dim = None
+        self._offsets = array('q')
+        self._end = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def add(self, vectors, entries: list):
+        """
+        Append exchanges and their embeddings.
+
+        Args:
+            vectors: One embedding per entry (sequence of equal-length vectors)
+            entries: JSON-serializable dicts returned by search()
+        """
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(entries), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._path('index.json'), 'wb') as f:
+                    f.write(json_codec.dumps_bytes({"model": self.model, "dim": self.dim}))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            self._truncate()
+
+            # Entries first: a row only counts once both files have it
+            with open(self._path('entries.jsonl'), 'ab') as f:
+                lines = [json_codec.dumps_bytes(entry) + b'\n' for entry in entries]
+                f.write(b''.join(lines))
+            with open(self._path('vectors.f32'), 'ab') as f:
+                f.write(vectors.tobytes())
+            for line in lines:
+                self._offsets.append(self._end)
+                self._end += len(line)
+
+    def search(self, query, k: int = 5):
+        """
+        Entries most similar to a query embedding.
+
+        Returns:
+            List of (cosine similarity, entry), best first
+        """
+        import numpy as np
+
+        with self._lock:
+            self._refresh()
+            vectors = self._matrix()
+        if vectors is None or k <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), self._entry(int(i))) for i in top]
+
+    def _matrix(self):
+        import numpy as np
+
+        rows = len(self._offsets)
+        if not rows:
+            return None
+        if self._vectors is None or len(self._vectors) != rows:
+            self._vectors = np.memmap(self._path('vectors.f32'), dtype=np.float32, mode='r', shape=(rows, self.dim))
+        return self._vectors
+
+    def _entry(self, row: int) -> dict:
+        with open(self._path('entries.jsonl'), 'rb') as f:
+            f.seek(self._offsets[row])
+            return json_codec.loads(f.readline())
+
+    def _refresh(self):
+        """Index the rows present in both files beyond the ones already known."""
+        if self.dim is None:
+            if not os.path.exists(self._path('index.json')):
+                return
+            with open(self._path('index.json'), 'rb') as f:
+                self.dim = json_codec.loads(f.read())["dim"]
+
+        rows = os.path.getsize(self._path('vectors.f32')) // (4 * self.dim)
+        if rows <= len(self._offsets):
+            return
+        with open(self._path('entries.jsonl'), 'rb') as f:
+            f.seek(self._end)
+            for line in f:
+                if len(self._offsets) >= rows or not line.endswith(b'\n'):
+                    break
+                self._offsets.append(self._end)
+                self._end += len(line)
+
+    def _load(self):
+        if os.path.exists(self._path('index.json')):
+            with open(self._path('index.json'), 'rb') as f:
+                model = json_codec.loads(f.read()).get("model")
+            if model != self.model:
+                print(f"Memory index {self.directory} was built with {model}, rebuilding for {self.model}")
+                self._reset()
+        else:
+            self._reset()
+        self._refresh()
+        if self.dim is not None:
+            self._truncate()
+
+    def _truncate(self):
+        """Drop what a crashed writer left half-written, so appends line up."""
+        with open(self._path('entries.jsonl'), 'r+b') as f:
+            f.truncate(self._end)
+        with open(self._path('vectors.f32'), 'r+b') as f:
+            f.truncate(len(self._offsets) * 4 * self.dim)
+
+    def _reset(self):
+        if os.path.exists(self._path('index.json')):
+            os.unlink(self._path('index.json'))
+        open(self._path('entries.jsonl'), 'wb').close()
+        open(self._path('vectors.f32'), 'wb').close()
+        self.dim = None
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._path('.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+class MemoryService:
+    """
+    Per-user memory indexes, updated in the background as interactions are
+    stored and queried when a new prompt arrives.
+
+    Embeddings come from OLLAMA_EMBED_MODEL (default all-minilm, 384
+    dimensions). Indexes live under MEMORY_INDEX_PATH (default data/memory),
+    one directory per user; at most MEMORY_OPEN_INDEXES (default 64) are kept
+    open. MEMORY_TOP_K (default 3) exchanges scoring at least MEMORY_MIN_SCORE
+    (default 0.5) are recalled.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv('MEMORY_INDEX_PATH', 'data/memory')
+        self.embedder = OllamaClient(model=embed_model())
+        self.top_k = int(os.getenv('MEMORY_TOP_K', '3'))
+        self.min_score = float(os.getenv('MEMORY_MIN_SCORE', '0.5'))
+        self.max_open = int(os.getenv('MEMORY_OPEN_INDEXES', '64'))
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index(self, firebase_uid: str) -> MemoryIndex:
+        """The user's index, opened on first use."""
+        with self._lock:
+            if firebase_uid in self._indexes:
+                self._indexes.move_to_end(firebase_uid)
+                return self._indexes[firebase_uid]
+
+            user_dir = hashlib.sha256(firebase_uid.encode('utf-8')).hexdigest()[:32]
+            memory_index = MemoryIndex(os.path.join(self.path, user_dir), self.embedder.llm_model)
+            self._indexes[firebase_uid] = memory_index
+            while len(self._indexes) > self.max_open:
+                self._indexes.popitem(last=False)
+            return memory_index
+
+    def remember(self, firebase_uid: str, interactions: list):
+        """Embed and index stored interactions on the shared executor."""
+        interactions = [i for i in interactions if i.get("prompt") and i.get("response")]
+        if interactions:
+            return get_executor().submit(self._remember, firebase_uid, interactions)
+        return None
+
+    def recall(self, firebase_uid: str, prompt: str, exclude_session: str = None) -> list:
+        """
+        Past exchanges of the user relevant to a prompt, from other sessions.
+
+        Returns:
+            Up to top_k entry dicts (session_uuid, prompt, response, created_at), best first
+        """
+        memory_index = self.index(firebase_uid)
+        if not len(memory_index):
+            return []
+
+        vectors = self.embedder.embed([prompt])
+        if not vectors:
+            return []
+        # Over-fetch so that hits from the current session can be skipped
+        hits = memory_index.search(vectors[0], self.top_k * 4)
+        return [
+            entry for score, entry in hits
+            if score >= self.min_score and entry.get("session_uuid") != exclude_session
+        ][:self.top_k]
+
+    def _remember(self, firebase_uid: str, interactions: list):
+        try:
+            vectors = self.embedder.embed([f"User: {i['prompt']}\nAssistant: {i['response']}" for i in interactions])
+            if not vectors:
+                return
+            self.index(firebase_uid).add(vectors, [
+                {
+                    "session_uuid": i.get("session_uuid"),
+                    "prompt": i["prompt"],
+                    "response": i["response"],
+                    "created_at": i.get("created_at")
+                } for i in interactions
+            ])
+        except Exception as e:
+            print(f"Memory index update failed: {e}")
+
+def recall_messages(memory_service, firebase_uid: str, prompt: str, session_uuid: str = None) -> list:
+    """
+    Recalled exchanges as a system message to put ahead of the history, or an
+    empty list when memory is disabled or nothing relevant was found.
+    """
+    if not memory_service:
+        return []
+    try:
+        memories = memory_service.recall(firebase_uid, prompt, exclude_session=session_uuid)
+    except Exception as e:
+        print(f"Memory recall failed: {e}")
+        return []
+    if not memories:
+        return []
+
+    lines = [f"- User: {m['prompt']}\n  Assistant: {m['response']}" for m in memories]
+    return [{
+        "role": "system",
+        "content": "Relevant moments from earlier conversations with this user:\n" + "\n".join(lines)
+    }]
+
+def get_memory_service() -> MemoryService:
+    """Return the process-wide MemoryService, shared by the chat and audio services."""
+    global _memory_service
+
+    if _memory_service is None:
+        with _memory_service_lock:
+            if _memory_service is None:
+                _memory_service = MemoryService()
+    return _memory_service
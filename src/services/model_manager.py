@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from src.clients.ollama_client import get_keep_alive, get_ollama_client, normalize_model_name, ollama_hosts
+from src.services.audio_service import AUDIO_MODEL
+from src.services.memory_index import embed_model, long_term_memory_enabled
+from src.services.title_service import TITLE_MODEL
+
+_model_manager = None
+
+def configured_models():
+    """Return the models used by the services, in priority order, without duplicates."""
+    models = [os.getenv('OLLAMA_MODEL', 'llama3.2'), AUDIO_MODEL, TITLE_MODEL]
+    if long_term_memory_enabled():
+        models.append(embed_model())
+    return list(dict.fromkeys(models))
+
+class ModelManager:
+    """
+    Keeps the configured Ollama models resident.
+
+    Models are pre-loaded at startup with their keep_alive, and a watcher
+    thread polls Ollama's running models to reload any that were evicted.
+    The embedding model is loaded with an empty embed request, since
+    embedding models cannot generate.
+    """
+
+    def __init__(self, models=None):
+        self.models = models or configured_models()
+        self.mode = os.getenv('OLLAMA_WARMUP', 'sync').lower()
+        self.watch_interval = float(os.getenv('OLLAMA_WATCH_INTERVAL', '30'))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._states = {
+            model: {
+                'state': 'pending',
+                'keep_alive': get_keep_alive(model),
+                'load_seconds': None,
+                'loaded_at': None,
+                'reloads': 0,
+                'error': None
+            } for model in self.models
+        }
+
+    def start(self):
+        """
+        Warm up the models and start the eviction watcher.
+
+        OLLAMA_WARMUP selects the behaviour: 'sync' blocks until every model is
+        loaded, 'background' loads them without blocking and 'off' does nothing.
+        """
+        if self.mode == 'off':
+            return
+        
+        if self.mode == 'background':
+            threading.Thread(target=self.warm_up, name='ollama-warmup', daemon=True).start()
+        else:
+            self.warm_up()
+        
+        self.start_watcher()
+
+    def warm_up(self):
+        """Load all models concurrently so startup pays the slowest load, not the sum."""
+        threads = [
+            threading.Thread(target=self.load, args=(model,), name=f'ollama-load-{model}', daemon=True)
+            for model in self.models
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def load(self, model: str, hosts: list = None) -> bool:
+        """
+        Load a model into Ollama memory with an empty prompt.
+        
+        Args:
+            model: Model name
+            hosts: Ollama nodes to load it on (all configured nodes by default)
+            
+        Returns:
+            True if the model is loaded on every node
+        """
+        self._update(model, state='loading', error=None)
+        start_time = time.time()
+        try:
+            for host in hosts or ollama_hosts():
+                client = get_ollama_client(host)
+                if long_term_memory_enabled() and model == embed_model():
+                    client.embed(model=model, input='', keep_alive=get_keep_alive(model))
+                else:
+                    client.generate(model=model, prompt='', keep_alive=get_keep_alive(model))
+            self._update(
+                model,
+                state='loaded',
+                load_seconds=round(time.time() - start_time, 3),
+                loaded_at=time.time()
+            )
+            return True
+        except Exception as e:
+            print(f"Ollama warm-up error for {model}: {e}")
+            self._update(model, state='error', error=str(e))
+            return False
+
+    def check_evictions(self):
+        """
+        Compare the configured models against the running models of each Ollama
+        node and reload the ones that are no longer resident.
+        
+        Returns:
+            List of models that were reloaded
+        """
+        running = self._running()
+        reloaded = []
+        for model in self.models:
+            missing = [host for host, models in running.items() if normalize_model_name(model) not in models]
+            if not missing:
+                continue
+            with self._lock:
+                state = self._states[model]
+                if state['state'] == 'loading':
+                    continue
+                if state['state'] == 'loaded':
+                    state['state'] = 'evicted'
+                state['reloads'] += 1
+            if self.load(model, hosts=missing):
+                reloaded.append(model)
+        return reloaded
+
+    def start_watcher(self):
+        if self.watch_interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name='ollama-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=self.watch_interval)
+            self._watcher = None
+
+    def after_fork(self):
+        """Re-create the lock and watcher thread, which do not survive fork()."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        if self.mode != 'off':
+            self.start_watcher()
+
+    def status(self):
+        """
+        Load state per model. With OLLAMA_WARMUP=off nothing is pre-loaded and
+        models load on first use, so the service is always ready and each
+        model is reported as Ollama has it: 'loaded' when resident on every
+        reachable node, 'unloaded' otherwise.
+        """
+        if self.mode == 'off':
+            running = self._running()
+            return {
+                'ready': True,
+                'warmup': self.mode,
+                'models': {
+                    model: {
+                        'state': 'loaded' if running and all(normalize_model_name(model) in models for models in running.values()) else 'unloaded',
+                        'keep_alive': get_keep_alive(model)
+                    } for model in self.models
+                }
+            }
+        
+        with self._lock:
+            models = {model: dict(state) for model, state in self._states.items()}
+        return {
+            'ready': all(state['state'] == 'loaded' for state in models.values()),
+            'warmup': self.mode,
+            'models': models
+        }
+
+    def _running(self) -> dict:
+        """Running models per reachable Ollama node, as normalized names."""
+        running = {}
+        for host in ollama_hosts():
+            try:
+                running[host] = {normalize_model_name(m.model) for m in get_ollama_client(host).ps().models}
+            except Exception as e:
+                print(f"Ollama running models check error on {host}: {e}")
+        return running
+
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            self.check_evictions()
+
+    def _update(self, model: str, **fields):
+        with self._lock:
+            self._states[model].update(fields)
+
+def get_model_manager():
+    global _model_manager
+    
+    if _model_manager is None:
+        _model_manager = ModelManager()
+    return _model_manager
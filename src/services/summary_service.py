@@ -0,0 +1,159 @@
+from src.clients.ollama_client import OllamaClient
+from src.clients.rails_client import get_rails_client
+from src.services.executor import get_executor
+from src.services.generation_budget import get_budget
+from src.services.title_service import TITLE_MODEL
+import os
+import threading
+
+SUMMARY_OPTIONS = {'temperature': 0.2}
+
+_summary_service = None
+
+def rolling_summary_enabled() -> bool:
+    return os.getenv('ROLLING_SUMMARY', 'false').lower() == 'true'
+
+def history_messages(interactions: list) -> list:
+    """Interactions as alternating user/assistant chat messages."""
+    history = []
+    for interaction in interactions:
+        history.append({"role": "user", "content": interaction["prompt"]})
+        history.append({"role": "assistant", "content": interaction["response"]})
+    return history
+
+def prompt_history(session: dict, interactions: list, firebase_uid: str, summary_service=None) -> list:
+    """
+    Earlier turns to send with a new prompt.
+
+    With the rolling summary, the session's summary followed by the turns not
+    yet folded into it (and a fold is scheduled when those grow too long);
+    otherwise the last CONVERSATION_HISTORY_TURNS turns (default 10).
+
+    Args:
+        session: Session record from Rails
+        interactions: All interactions of the session, oldest first
+        firebase_uid: Firebase user ID
+        summary_service: SummaryService, or None when summaries are disabled
+
+    Returns:
+        Chat messages
+    """
+    if summary_service:
+        summary_service.maybe_fold(session, interactions, firebase_uid)
+        return summary_service.history(session, interactions)
+
+    turns = int(os.getenv('CONVERSATION_HISTORY_TURNS', '10'))
+    return history_messages(interactions[-turns:] if turns else [])
+
+class SummaryService:
+    """
+    Rolling summary of long sessions, so prompts stay the same size however
+    many turns a session has.
+
+    Once the turns after the summary pass SUMMARY_TRIGGER_TURNS (default 20)
+    or about SUMMARY_TRIGGER_TOKENS tokens (default 2000), all but the last
+    SUMMARY_KEEP_TURNS (default 6) are folded into the summary by the small
+    title model, in the background on the shared executor. The summary and the
+    number of turns it covers are stored on the session in Rails.
+    """
+    def __init__(self):
+        self.ollama = OllamaClient(model=TITLE_MODEL, options=SUMMARY_OPTIONS)
+        self.rails_client = get_rails_client()
+        self.budget = get_budget('summary')
+        self.keep_turns = int(os.getenv('SUMMARY_KEEP_TURNS', '6'))
+        self.trigger_turns = int(os.getenv('SUMMARY_TRIGGER_TURNS', '20'))
+        self.trigger_tokens = int(os.getenv('SUMMARY_TRIGGER_TOKENS', '2000'))
+        self._folding = set()
+        self._lock = threading.Lock()
+
+    def history(self, session: dict, interactions: list) -> list:
+        """The summary as a system message, followed by the turns it does not cover."""
+        summary, summarized_turns = _summary_of(session)
+        history = []
+        if summary:
+            history.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+        return history + history_messages(interactions[summarized_turns:])
+
+    def needs_folding(self, session: dict, interactions: list) -> bool:
+        _, summarized_turns = _summary_of(session)
+        recent = interactions[summarized_turns:]
+        if len(recent) <= self.keep_turns:
+            return False
+        return len(recent) >= self.trigger_turns or _estimate_tokens(recent) >= self.trigger_tokens
+
+    def maybe_fold(self, session: dict, interactions: list, firebase_uid: str):
+        """
+        Schedule a fold of the session's older turns if they grew past the thresholds.
+
+        Returns:
+            Future of fold(), or None when nothing was scheduled
+        """
+        if not self.needs_folding(session, interactions):
+            return None
+
+        with self._lock:
+            if session["session_uuid"] in self._folding:
+                return None
+            self._folding.add(session["session_uuid"])
+        return get_executor().submit(self._fold_in_background, session, list(interactions), firebase_uid)
+
+    def fold(self, session: dict, interactions: list, firebase_uid: str) -> str:
+        """
+        Fold all but the last keep_turns turns into the session's summary and store it.
+
+        Returns:
+            New summary, or None if the model gave none
+        """
+        summary, summarized_turns = _summary_of(session)
+        fold_until = len(interactions) - self.keep_turns
+        if fold_until <= summarized_turns:
+            return summary
+
+        transcript = '\n'.join(
+            f"User: {i['prompt']}\nAssistant: {i['response']}" for i in interactions[summarized_turns:fold_until]
+        )
+        prompt = (
+            f"Summary so far: {summary or '(none)'}\n\nNew conversation turns:\n{transcript}\n\n"
+            "Rewrite the summary so it also covers the new turns. Keep names, preferences, feelings "
+            "and open questions the assistant must remember. Answer with the summary only."
+        )
+
+        response = self.ollama.request(prompt, budget=self.budget)
+        if not response or not response.get('content', '').strip():
+            print(f"Summary generation failed for session {session['session_uuid']}")
+            return None
+
+        summary = response['content'].strip()
+        self.rails_client.update_chat_session(
+            session["session_uuid"],
+            firebase_uid,
+            summary=summary,
+            summarized_turns=fold_until
+        )
+        return summary
+
+    def _fold_in_background(self, session: dict, interactions: list, firebase_uid: str):
+        try:
+            return self.fold(session, interactions, firebase_uid)
+        except Exception as e:
+            print(f"Summary update failed for session {session['session_uuid']}: {e}")
+        finally:
+            with self._lock:
+                self._folding.discard(session["session_uuid"])
+
+def _summary_of(session: dict):
+    """(summary, turns it covers) of a session; turns is 0 without a summary."""
+    summary = session.get("summary")
+    return (summary, session.get("summarized_turns") or 0) if summary else (None, 0)
+
+def _estimate_tokens(interactions: list) -> int:
+    # About four characters per token for English text
+    return sum(len(i["prompt"]) + len(i["response"]) for i in interactions) // 4
+
+def get_summary_service() -> SummaryService:
+    """Return the process-wide SummaryService, shared by the chat and audio services."""
+    global _summary_service
+
+    if _summary_service is None:
+        _summary_service = SummaryService()
+    return _summary_service
@@ -1,8 +1,18 @@
+from src.cancellation import submit_in_scope
 from src.clients.ollama_client import OllamaClient
+from src.services.executor import get_executor
+from src.services.generation_budget import get_budget
+import os
+
+TITLE_MODEL = 'gemma2:270m'
+TITLE_OPTIONS = {'temperature': 0.3}
 
 class TitleService:
     def __init__(self):
-        self.ollama = OllamaClient(model='gemma2:270m')
+        self.ollama = OllamaClient(model=TITLE_MODEL, options=TITLE_OPTIONS)
+        self.budget = get_budget('title')
+        self.speculative = os.getenv('SPECULATIVE_TITLE', 'false').lower() == 'true'
+        self.join_timeout = float(os.getenv('SPECULATIVE_TITLE_JOIN_TIMEOUT', '0'))
     
     def generate_title(self, first_message: str) -> str:
         """
@@ -16,7 +26,7 @@ class TitleService:
         """
         prompt = f"Generate a short, descriptive title (max 50 characters) for a conversation that starts with: '{first_message[:200]}'"
         
-        response = self.ollama.request(prompt)
+        response = self.ollama.request(prompt, budget=self.budget)
         if response and response.get('content'):
             title = response['content'].strip()
             title = title.replace('"', '').replace("'", '')
@@ -24,5 +34,48 @@ class TitleService:
                 title = title[:252] + '...'
             return title[:255]
         
+        return self.fallback_title(first_message)
+    
+    def fallback_title(self, first_message: str) -> str:
         return first_message[:50] + '...' if len(first_message) > 50 else first_message
+    
+    def generate_title_with_reply(self, first_message: str, generate_reply):
+        """
+        Generate the session title and the first reply.
+        
+        With SPECULATIVE_TITLE=true both run in parallel: the title on the shared
+        executor and the reply on the calling thread. Once the reply is ready the
+        title gets at most SPECULATIVE_TITLE_JOIN_TIMEOUT more seconds; a slow or
+        failed title falls back to the truncated message so it never delays the reply.
+        
+        Args:
+            first_message: The first message in the conversation
+            generate_reply: Callable producing the reply
+            
+        Returns:
+            Tuple of (title, reply)
+        """
+        if not self.speculative:
+            return self.generate_title(first_message), generate_reply()
+        
+        title_future = submit_in_scope(get_executor(), self.generate_title, first_message)
+        reply = generate_reply()
+        
+        try:
+            title = title_future.result(timeout=self.join_timeout)
+        except Exception as e:
+            print(f"Speculative title not ready, using fallback: {e!r}")
+            title_future.cancel()
+            title = self.fallback_title(first_message)
+        
+        return title, reply
 
+_title_service = None
+
+def get_title_service() -> TitleService:
+    """Return the process-wide TitleService, shared by the chat and audio services."""
+    global _title_service
+    
+    if _title_service is None:
+        _title_service = TitleService()
+    return _title_service
@@ -4,6 +4,8 @@ import pytest
 
 # Set environment before imports
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["OLLAMA_WARMUP"] = "off"
+os.environ["BALANCER_HEALTH_INTERVAL"] = "0"
 
 # Ensure src is in path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
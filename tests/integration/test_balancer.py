@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from src.clients.balancer import LoadBalancer
+from src.clients.ollama_client import OllamaClient, ollama_probe
+from src.clients.resilience import ResilientBackend
+from src.clients.tts_client import TTSClient
+
+class FakeBackend:
+    """Local HTTP server standing in for a Whisper, TTS or Ollama node."""
+
+    def __init__(self, delay=0.0, models=(), healthy=True):
+        self.delay = delay
+        self.models = list(models)
+        self.healthy = healthy
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json'):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if not fake.healthy:
+                    return self._send(503, {})
+                if self.path == '/api/ps':
+                    return self._send(200, {"models": [{"name": m, "model": m} for m in fake.models]})
+                self._send(200, {})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                fake.requests.append(self.path)
+                time.sleep(fake.delay)
+                if self.path == '/synthesize':
+                    return self._send(200, fake.url.encode(), 'audio/wav')
+                if self.path == '/api/chat':
+                    return self._send(200, {
+                        "model": "llama3.2", "done": True,
+                        "message": {"role": "assistant", "content": fake.url}
+                    })
+                self._send(404, {})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def backends():
+    created = []
+    
+    def make(**kwargs):
+        backend = FakeBackend(**kwargs)
+        created.append(backend)
+        return backend
+    
+    yield make
+    for backend in created:
+        backend.close()
+
+def test_least_outstanding_spreads_concurrent_requests(backends):
+    nodes = [backends(delay=0.2), backends(delay=0.2)]
+    client = TTSClient()
+    client.backend = ResilientBackend('tts-test', [n.url for n in nodes], max_timeout=5)
+    
+    threads = [threading.Thread(target=client.synthesize, args=("Hi",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert [len(n.requests) for n in nodes] == [2, 2]
+
+def test_concurrent_leases_see_each_others_load():
+    balancer = LoadBalancer('test', [f'http://n{i}' for i in range(4)], health_interval=0)
+    ranked = balancer._ranked
+
+    def slow_ranked(model=None):
+        # Widen the window between picking a node and counting the request
+        time.sleep(0.01)
+        return ranked(model)
+
+    balancer._ranked = slow_ranked
+    held = threading.Barrier(8)
+
+    def lease():
+        with balancer.lease():
+            held.wait()
+
+    threads = [threading.Thread(target=lease) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [node.served for node in balancer.nodes] == [2, 2, 2, 2]
+
+def test_health_check_removes_and_restores_node(backends):
+    up, down = backends(), backends(healthy=False)
+    balancer = LoadBalancer('test', [down.url, up.url], health_interval=0)
+    
+    balancer.check_health()
+    assert balancer.ordered() == [up.url]
+    
+    down.healthy = True
+    balancer.check_health()
+    assert set(balancer.ordered()) == {up.url, down.url}
+
+def test_failed_requests_mark_node_unhealthy():
+    balancer = LoadBalancer('test', ['http://a', 'http://b'], health_interval=0, max_failures=2)
+    for _ in range(2):
+        balancer.begin('http://a')
+        balancer.end('http://a', success=False)
+    assert balancer.ordered() == ['http://b']
+
+def test_closed_streams_are_not_node_failures():
+    balancer = LoadBalancer('test', ['http://a'], health_interval=0, max_failures=2)
+    client = MagicMock()
+    client.chat.side_effect = lambda **kwargs: iter([{'message': {'content': 'Hi'}}] * 5)
+    
+    with patch('src.clients.ollama_client.get_ollama_balancer', return_value=balancer), \
+            patch('src.clients.ollama_client.get_ollama_client', return_value=client):
+        for _ in range(3):
+            chunks = OllamaClient().stream("Hello")
+            assert next(chunks) == 'Hi'
+            chunks.close()
+    
+    node = balancer.nodes[0]
+    assert node.healthy and node.failures == 0 and node.outstanding == 0
+
+def test_ollama_routes_to_node_with_model_loaded(backends):
+    cold, warm = backends(models=['gemma2:1b']), backends(models=['llama3.2:latest'])
+    balancer = LoadBalancer('ollama-test', [cold.url, warm.url], probe=ollama_probe, health_interval=0)
+    balancer.check_health()
+    
+    with patch('src.clients.ollama_client.get_ollama_balancer', return_value=balancer):
+        result = OllamaClient(model='llama3.2').request("Hello")
+    
+    assert result['content'] == warm.url
+    assert warm.requests == ['/api/chat'] and cold.requests == []
+
+def test_model_affinity_spills_over_when_busy():
+    balancer = LoadBalancer('test', ['http://cold', 'http://warm'], health_interval=0, model_slack=1)
+    balancer.nodes[1].models = {'llama3.2:latest'}
+    for _ in range(3):
+        balancer.begin('http://warm')
+    
+    assert balancer.ordered(model='llama3.2:latest')[0] == 'http://cold'
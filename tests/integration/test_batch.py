@@ -0,0 +1,79 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from api.app import create_app
+from src.services.chat_service import ChatService
+
+SESSION_A = "123e4567-e89b-12d3-a456-426614174000"
+SESSION_B = "223e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _service():
+    service = ChatService()
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.side_effect = lambda uuid, uid: {"session_uuid": uuid} if uuid == SESSION_A else None
+    service.rails_client.create_interactions.side_effect = lambda uid, items: [{"id": n} for n, _ in enumerate(items, 1)]
+    service.ollama_client.request = lambda prompt, **kwargs: {"content": f"Re: {prompt}"}
+    return service
+
+def test_batch_keeps_session_order_and_writes_once():
+    service = _service()
+    messages = [
+        {"session_uuid": SESSION_A, "prompt": "one"},
+        {"session_uuid": SESSION_B, "prompt": "lost"},
+        {"session_uuid": SESSION_A, "prompt": "two"}
+    ]
+    
+    events = list(service.send_text_batch(messages, "test-user"))
+    
+    results = [e for e in events if e["type"] == "result"]
+    errors = [e for e in events if e["type"] == "error"]
+    assert [e["prompt"] for e in results] == ["one", "two"]
+    assert errors == [{"type": "error", "index": 1, "session_uuid": SESSION_B, "error": "Session not found or access denied"}]
+    assert events[-1] == {"type": "persisted", "interactions": [{"index": 0, "interaction_id": 1}, {"index": 2, "interaction_id": 2}]}
+    
+    assert service.rails_client.get_chat_session.call_count == 2
+    service.rails_client.create_interactions.assert_called_once()
+    written = service.rails_client.create_interactions.call_args.args[1]
+    assert [w["prompt"] for w in written] == ["one", "two"]
+
+def test_batch_endpoint_streams_ndjson(test_client):
+    mock_service = MagicMock()
+    mock_service.send_text_batch.return_value = iter([
+        {"type": "result", "index": 0, "session_uuid": SESSION_A, "prompt": "Hi", "response": "Hello"},
+        {"type": "persisted", "interactions": [{"index": 0, "interaction_id": 1}]}
+    ])
+    with patch('src.controllers.chat_controller.chat_service', mock_service):
+        response = test_client.post('/chat/batch', json={"messages": [{"session_uuid": SESSION_A, "prompt": "Hi"}]})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert lines[0]["response"] == "Hello"
+        assert lines[1]["type"] == "persisted"
+
+def test_batch_endpoint_validation(test_client):
+    assert test_client.post('/chat/batch', json={}).status_code == 400
+    assert test_client.post('/chat/batch', json={"messages": [{"session_uuid": "nope", "prompt": "Hi"}]}).status_code == 400
+    assert test_client.post('/chat/batch', json={"messages": [{"session_uuid": SESSION_A}]}).status_code == 400
+
+def test_bulk_write_falls_back_without_rails_route():
+    from src.clients.rails_client import RailsClient
+    client = RailsClient()
+    created = iter([{"id": 1}, {"id": 2}])
+    
+    with patch('requests.post', return_value=MagicMock(status_code=404)) as post, \
+            patch.object(RailsClient, 'create_interaction', side_effect=lambda **kwargs: next(created)) as create:
+        result = client.create_interactions("u1", [
+            {"session_uuid": SESSION_A, "prompt": "one", "response": "a"},
+            {"session_uuid": SESSION_B, "prompt": "two", "response": "b"}
+        ])
+    
+    assert result == [{"id": 1}, {"id": 2}]
+    assert post.call_count == 1
+    assert [c.kwargs["session_uuid"] for c in create.call_args_list] == [SESSION_A, SESSION_B]
@@ -0,0 +1,196 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+import pytest
+import requests
+from api.app import create_app
+from src.cancellation import (
+    CancelScope, ClientDisconnected, DeadlineExceeded, backend_timeout, cancel_scope, check_cancelled, parse_deadline
+)
+from src.clients.ollama_client import OllamaClient
+from src.clients.resilience import ResilientBackend
+from src.services.chat_service import ChatService
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+class FakeStream:
+    """Ollama chat stream stand-in that records whether it was closed."""
+    def __init__(self, parts):
+        self.parts = iter(parts)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.read += 1
+        return {'message': {'content': next(self.parts)}, 'eval_count': self.read}
+
+    def close(self):
+        self.closed = True
+
+def test_parse_deadline_formats():
+    assert parse_deadline("1700000000.5") == 1700000000.5
+    assert parse_deadline("2023-11-14T22:13:20Z") == 1700000000
+    assert parse_deadline("2023-11-14T23:13:20+01:00") == 1700000000
+    with pytest.raises(ValueError):
+        parse_deadline("2023-11-14T22:13:20")
+    with pytest.raises(ValueError):
+        parse_deadline("soon")
+
+def test_deadline_header_is_validated(test_client):
+    service = MagicMock()
+    service.send_text_message.return_value = {"session_uuid": SESSION, "response": "Ok", "interaction_id": 1}
+
+    with patch('src.controllers.chat_controller.chat_service', service):
+        malformed = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'X-Request-Deadline': 'soon'})
+        past = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'X-Request-Deadline': str(time.time() - 1)})
+        ok = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'X-Request-Deadline': str(time.time() + 30)})
+
+    assert malformed.status_code == 400 and past.status_code == 504
+    assert ok.status_code == 200
+    assert service.send_text_message.call_count == 1
+
+def test_cancelled_turn_maps_to_status(test_client):
+    service = MagicMock()
+    with patch('src.controllers.chat_controller.chat_service', service):
+        service.send_text_message.side_effect = DeadlineExceeded("Request deadline exceeded")
+        timed_out = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"})
+        service.send_text_message.side_effect = ClientDisconnected("Client disconnected")
+        gone = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"})
+
+    assert timed_out.status_code == 504 and gone.status_code == 499
+
+def test_idempotent_requests_survive_disconnects(test_client):
+    def send(session_uuid, prompt, firebase_uid):
+        check_cancelled()
+        return {"session_uuid": session_uuid, "response": "Ok", "interaction_id": 1}
+
+    service = MagicMock()
+    service.send_text_message.side_effect = send
+    with patch('src.controllers.chat_controller.chat_service', service), \
+            patch('src.cancellation.socket_probe', return_value=lambda: True), \
+            patch('src.idempotency.get_idempotency_store') as store:
+        store.return_value.run.side_effect = lambda key, fingerprint, compute: (compute(), False)
+        gone = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"})
+        kept = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'Idempotency-Key': 'turn-1'})
+
+    assert gone.status_code == 499
+    assert kept.status_code == 200
+
+def test_scope_caps_timeouts_and_polls_probe():
+    assert backend_timeout(30) == 30
+
+    with cancel_scope(CancelScope(deadline=time.time() + 5)):
+        assert 4 < backend_timeout(30) <= 5
+        assert backend_timeout(2) == 2
+
+    gone = []
+    scope = CancelScope(probe=lambda: bool(gone), probe_interval=0)
+    scope.check()
+    gone.append(True)
+    with pytest.raises(ClientDisconnected):
+        scope.check()
+
+    with cancel_scope(CancelScope(deadline=time.time() - 1)), pytest.raises(DeadlineExceeded):
+        backend_timeout(30)
+
+def test_backend_call_cut_by_deadline_leaves_breaker_closed():
+    backend = ResilientBackend('test', ['http://a'], max_timeout=30, failure_threshold=1)
+    timeouts = []
+
+    def slow(url, timeout):
+        timeouts.append(timeout)
+        raise requests.Timeout("read timed out")
+
+    with cancel_scope(CancelScope(deadline=time.time() + 0.5)), pytest.raises(DeadlineExceeded):
+        backend.call(slow)
+
+    assert timeouts[0] <= 0.5
+    assert backend.breaker.state == 'closed' and backend.breaker.allow()
+
+def test_cancelled_request_closes_ollama_stream():
+    stream = FakeStream(['one ', 'two ', 'three'])
+    mock_client = MagicMock()
+    mock_client.chat.return_value = stream
+    scope = CancelScope()
+
+    def cancel_after_two():
+        if stream.read == 2:
+            scope.cancel()
+        return False
+
+    scope.probe, scope.probe_interval = cancel_after_two, 0
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client), cancel_scope(scope):
+        with pytest.raises(ClientDisconnected):
+            OllamaClient().request("Hello")
+
+    assert mock_client.chat.call_args.kwargs['stream'] is True
+    assert stream.closed and stream.read == 2
+
+def test_deadline_cuts_ollama_reply_stalled_before_first_chunk():
+    release = threading.Event()
+
+    class StalledStream(FakeStream):
+        def __next__(self):
+            release.wait(5)
+            return super().__next__()
+
+    stream = StalledStream(['late', 'reply'])
+    mock_client = MagicMock()
+    mock_client.chat.return_value = stream
+
+    started = time.time()
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client), \
+            cancel_scope(CancelScope(deadline=time.time() + 0.3)), pytest.raises(DeadlineExceeded):
+        OllamaClient().request("Hello")
+
+    assert time.time() - started < 1
+    release.set()
+    time.sleep(0.1)
+    # The reader stops at the next chunk and closes the stream
+    assert stream.closed and stream.read == 1
+
+def test_request_in_scope_reassembles_streamed_reply():
+    mock_client = MagicMock()
+    mock_client.chat.return_value = FakeStream(['Hel', 'lo'])
+
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client), cancel_scope(CancelScope()):
+        result = OllamaClient().request("Hello")
+
+    assert result["content"] == "Hello" and result["eval_count"] == 2
+
+def test_abandoned_batch_stops_remaining_messages():
+    service = ChatService()
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.rails_client.get_interactions.return_value = []
+    prompts = []
+
+    def reply(prompt, **kwargs):
+        prompts.append(prompt)
+        time.sleep(0.1)
+        return {"content": f"Re: {prompt}"}
+
+    service.ollama_client.request = reply
+    messages = [{"session_uuid": SESSION, "prompt": p} for p in ("one", "two", "three")]
+
+    with cancel_scope(CancelScope()) as scope:
+        events = service.send_text_batch(messages, "test-user")
+        assert next(events)["prompt"] == "one"
+        events.close()
+    time.sleep(0.3)
+
+    assert scope.cancelled
+    assert prompts in (["one"], ["one", "two"])
+    # The reply that finished before the client left is still stored
+    stored = service.rails_client.create_interactions.call_args.args[1]
+    assert [i["prompt"] for i in stored] == ["one"]
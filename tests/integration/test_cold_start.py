@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+from api.app import create_app, swagger_enabled
+from benchmarks.bench_import_time import parse_importtime
+from src.lazy import LazyProxy
+
+HEAVY_MODULES = ['firebase_admin', 'flasgger', 'ollama', 'httpx', 'requests', 'sqlalchemy']
+
+def test_importing_the_app_skips_heavy_dependencies():
+    code = f"import json, sys, api.app; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+def test_lazy_proxy_builds_once_on_first_use():
+    factory = MagicMock(return_value=MagicMock(value=1))
+    proxy = LazyProxy(factory)
+    assert not factory.called
+
+    assert proxy.value == 1
+    proxy.value = 2
+    assert proxy.value == 2
+    factory.assert_called_once()
+
+def test_services_share_client_singletons():
+    from src.services.audio_service import AudioService
+    from src.services.chat_service import ChatService
+    chat, audio = ChatService(), AudioService()
+
+    assert chat.rails_client is audio.rails_client
+    assert chat.title_service is audio.title_service
+    assert chat.ollama_client is not audio.ollama
+
+def test_swagger_is_optional():
+    with patch.dict(os.environ, {'ENV_LEVEL': 'prod'}):
+        os.environ.pop('SWAGGER_ENABLED', None)
+        assert not swagger_enabled()
+    with patch.dict(os.environ, {'ENV_LEVEL': 'prod', 'SWAGGER_ENABLED': 'true'}):
+        assert swagger_enabled()
+
+    with patch.dict(os.environ, {'SWAGGER_ENABLED': 'false'}):
+        app = create_app()
+    assert app.test_client().get('/apidocs/').status_code == 404
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   json.decoder\n"
+        "import time:       200 |        300 | json\n"
+    )
+    assert parse_importtime(stderr) == [('json.decoder', 0.1, 0.1, 1), ('json', 0.2, 0.3, 0)]
@@ -0,0 +1,104 @@
+import gzip
+from unittest.mock import MagicMock, patch
+import pytest
+from api.app import create_app
+from src.services.chat_service import ChatService
+
+SESSION_UUID = "123e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _service(interactions: int = 2, response: str = "Reply"):
+    service = ChatService()
+    service.interaction_queue = None
+    service.rails_client = MagicMock()
+    session = {
+        "session_uuid": SESSION_UUID, "title": "Chat", "mode": "text", "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-02T00:00:00Z", "interaction_count": interactions
+    }
+    service.rails_client.get_chat_session.return_value = session
+    service.rails_client.list_chat_sessions.return_value = [session]
+    service.rails_client.get_interactions.return_value = [
+        {"prompt": f"Q{i}", "response": response, "created_at": "2024-01-01T00:00:00Z"} for i in range(interactions)
+    ]
+    return service
+
+def test_unchanged_session_history_is_not_refetched(test_client):
+    service = _service()
+    with patch('src.controllers.chat_controller.chat_service', service):
+        first = test_client.get(f'/history/{SESSION_UUID}')
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+
+        service.rails_client.get_interactions.reset_mock()
+        second = test_client.get(f'/history/{SESSION_UUID}', headers={'If-None-Match': etag})
+        assert second.status_code == 304 and second.data == b''
+        assert second.headers['ETag'] == etag
+        service.rails_client.get_interactions.assert_not_called()
+
+        # A new interaction bumps the count, so the old ETag no longer matches
+        service.rails_client.get_chat_session.return_value = {
+            **service.rails_client.get_chat_session.return_value, "interaction_count": 3
+        }
+        third = test_client.get(f'/history/{SESSION_UUID}', headers={'If-None-Match': etag})
+        assert third.status_code == 200 and third.headers['ETag'] != etag
+
+def test_missing_session_is_404(test_client):
+    service = _service()
+    service.rails_client.get_chat_session.return_value = None
+    with patch('src.controllers.chat_controller.chat_service', service):
+        assert test_client.get(f'/history/{SESSION_UUID}').status_code == 404
+
+def test_session_list_uses_one_fetch_for_etag_and_body(test_client, monkeypatch):
+    monkeypatch.setenv('ENV_LEVEL', 'prod')
+    service = _service()
+    with patch('src.controllers.chat_controller.chat_service', service), \
+         patch('src.auth.verify_firebase_token', return_value={'uid': 'user-1'}):
+        headers = {'Authorization': 'Bearer token'}
+        first = test_client.get('/history', headers=headers)
+        assert first.get_json()[0]["interaction_count"] == 2
+        assert service.rails_client.list_chat_sessions.call_count == 1
+
+        second = test_client.get('/history', headers={**headers, 'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 304
+
+        # The interactions view of the same sessions is a different representation
+        third = test_client.get('/history?all=true', headers={**headers, 'If-None-Match': first.headers['ETag']})
+        assert third.status_code == 200
+
+def test_large_json_is_compressed_with_per_encoding_etag(test_client):
+    service = _service(interactions=20, response="A long reply. " * 20)
+    with patch('src.controllers.chat_controller.chat_service', service):
+        response = test_client.get(f'/history/{SESSION_UUID}', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(gzip.decompress(response.data)) > len(response.data)
+
+        etag = response.headers['ETag']
+        assert etag.endswith('-gzip"')
+        revalidated = test_client.get(
+            f'/history/{SESSION_UUID}', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+        )
+        assert revalidated.status_code == 304 and revalidated.headers['ETag'] == etag
+
+def test_brotli_is_preferred_when_installed(test_client):
+    brotli = pytest.importorskip('brotli')
+    service = _service(interactions=20, response="A long reply. " * 20)
+    with patch('src.controllers.chat_controller.chat_service', service):
+        response = test_client.get(f'/history/{SESSION_UUID}', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'A long reply.' in brotli.decompress(response.data)
+
+def test_small_json_is_not_compressed(test_client):
+    service = _service(interactions=1)
+    with patch('src.controllers.chat_controller.chat_service', service):
+        response = test_client.get(f'/history/{SESSION_UUID}', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()[0]["prompt"] == "Q0"
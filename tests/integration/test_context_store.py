@@ -0,0 +1,102 @@
+from array import array
+from unittest.mock import MagicMock, patch
+import pytest
+from src.clients.ollama_client import OllamaClient
+from src.services.chat_service import ChatService
+from src.services.context_store import ContextStore
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def store(tmp_path):
+    return ContextStore(path=str(tmp_path / "context.db"), max_cached=2)
+
+def test_store_keeps_compact_contexts_across_tiers(store):
+    store.put("s1", "llama3.2", 1, [1, 2, 3])
+    store.put("s2", "llama3.2", 4, array('i', range(1000)))
+    store.put("s3", "llama3.2", 2, [7])
+
+    assert store.stats() == {"cached": 2, "cached_bytes": 4004, "stored": 3, "stored_tokens": 1004}
+    # Evicted from memory, still in SQLite
+    turns, context = store.get("s1", "llama3.2")
+    assert turns == 1 and context == array('i', [1, 2, 3])
+    assert store.get("s1", "gemma2:1b") is None
+
+    reopened = ContextStore(path=store.path)
+    assert reopened.get("s2", "llama3.2")[1] == array('i', range(1000))
+    reopened.delete("s2")
+    assert reopened.get("s2", "llama3.2") is None
+
+def test_generate_sends_only_new_prompt_with_context():
+    mock_client = MagicMock()
+    mock_client.generate.return_value = {'response': 'Sure.', 'context': [5, 6, 7], 'prompt_eval_count': 4, 'eval_count': 2}
+
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client):
+        result = OllamaClient(model='llama3.2').generate("And now?", system_prompt="Be kind.", context=array('i', [1, 2]))
+
+    assert result["context"] == array('i', [5, 6, 7])
+    assert result["prompt_eval_count"] == 4
+    kwargs = mock_client.generate.call_args.kwargs
+    assert kwargs['prompt'] == "And now?"
+    assert kwargs['context'] == [1, 2]
+    assert kwargs['system'] is None
+
+def _service(store, interaction_count):
+    service = ChatService()
+    service.context_store = store
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION, "interaction_count": interaction_count}
+    service.rails_client.get_interactions.return_value = [
+        {"prompt": "Hi", "response": "Hello!", "created_at": "2024-01-01T00:00:00"}
+    ]
+    service.rails_client.create_interaction.return_value = {"id": 1}
+    service.rails_client.create_interactions.side_effect = lambda uid, items: [{"id": n} for n, _ in enumerate(items, 1)]
+    service.ollama_client.generate = MagicMock(side_effect=lambda prompt, **kwargs: {
+        "content": f"Re: {prompt}",
+        "context": array('i', list(kwargs.get('context') or [0]) + [len(prompt)])
+    })
+    return service
+
+def test_follow_up_reuses_stored_context(store):
+    store.put(SESSION, "llama3.2", 1, [0, 2])
+    service = _service(store, interaction_count=1)
+
+    result = service.send_text_message(SESSION, "More?", "test-user")
+
+    assert result["response"] == "Re: More?"
+    kwargs = service.ollama_client.generate.call_args.kwargs
+    assert kwargs['context'] == array('i', [0, 2]) and 'history' not in kwargs
+    service.rails_client.get_interactions.assert_not_called()
+    assert store.get(SESSION, "llama3.2") == (2, array('i', [0, 2, 5]))
+
+def test_stale_context_is_rebuilt_from_history(store):
+    store.put(SESSION, "llama3.2", 3, [9])
+    service = _service(store, interaction_count=1)
+
+    service.send_text_message(SESSION, "More?", "test-user")
+
+    kwargs = service.ollama_client.generate.call_args.kwargs
+    assert kwargs['history'] == [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}]
+    assert store.get(SESSION, "llama3.2") == (2, array('i', [0, 5]))
+
+def test_batch_chains_contexts_within_a_session(store):
+    service = _service(store, interaction_count=1)
+    messages = [{"session_uuid": SESSION, "prompt": "one"}, {"session_uuid": SESSION, "prompt": "three"}]
+
+    events = list(service.send_text_batch(messages, "test-user"))
+
+    assert events[-1]["type"] == "persisted"
+    calls = service.ollama_client.generate.call_args_list
+    assert 'history' in calls[0].kwargs
+    assert calls[1].kwargs['context'] == array('i', [0, 3])
+    assert store.get(SESSION, "llama3.2") == (3, array('i', [0, 3, 5]))
+
+def test_new_session_stores_first_context(store):
+    service = _service(store, interaction_count=0)
+    service.title_service = MagicMock()
+    service.title_service.generate_title_with_reply.side_effect = lambda prompt, ask: ("Greetings", ask())
+    service.rails_client.create_chat_session.return_value = {"session_uuid": SESSION}
+
+    service.create_text_session("Hi", "test-user")
+
+    assert store.get(SESSION, "llama3.2") == (1, array('i', [0, 2]))
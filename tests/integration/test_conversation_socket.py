@@ -0,0 +1,149 @@
+import io
+import json
+import threading
+import time
+import wave
+from unittest.mock import MagicMock, patch
+import pytest
+from werkzeug.serving import make_server
+from websockets.sync.client import connect
+from api.app import create_app
+from src.controllers.conversation_controller import SlowClientError, SocketSender
+from src.services.conversation import Conversation, _join_wav
+
+def _wav(frames: int, framerate: int = 16000) -> bytes:
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(framerate)
+        clip.writeframes(b'\x00\x00' * frames)
+    return output.getvalue()
+
+def _service(chunks):
+    service = MagicMock()
+    service.ollama_client.stream.side_effect = lambda *args, **kwargs: iter(chunks)
+    service.ollama_client.llm_model = 'llama3.2'
+    service.ollama.stream.side_effect = lambda *args, **kwargs: iter(chunks)
+    service.ollama.llm_model = 'gemma2:1b'
+    service.title_service.generate_title.return_value = "Greetings"
+    service.rails_client.create_chat_session.return_value = {"session_uuid": "uuid-1"}
+    service.rails_client.get_chat_session.return_value = {"session_uuid": "uuid-1"}
+    service.build_history.return_value = [
+        {"role": "user", "content": f"q{i}"} if i % 2 == 0 else {"role": "assistant", "content": f"a{i}"}
+        for i in range(10)
+    ]
+    service.create_interaction.return_value = {"id": 7}
+    service.system_prompt.return_value = "Be kind."
+    return service
+
+@pytest.fixture
+def ws_url():
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'ws://127.0.0.1:{server.server_port}/ws/conversation'
+    server.shutdown()
+
+def _events(ws):
+    events = []
+    while not events or events[-1]['type'] not in ('done', 'error'):
+        events.append(json.loads(ws.recv(timeout=5)))
+    return events
+
+def test_websocket_text_turns_keep_history(ws_url):
+    service = _service(["Hello", " there."])
+    with patch('src.services.conversation.get_chat_service', return_value=service), \
+         patch('src.services.conversation.get_audio_service', return_value=service):
+        with connect(ws_url) as ws:
+            ready = json.loads(ws.recv(timeout=5))
+            assert ready == {'type': 'ready', 'session_uuid': None, 'mode': 'text', 'history_turns': 0}
+
+            ws.send(json.dumps({'type': 'text', 'prompt': 'Hi'}))
+            events = _events(ws)
+            assert [e['type'] for e in events] == ['token', 'token', 'session', 'reply', 'done']
+            assert events[2] == {'type': 'session', 'session_uuid': 'uuid-1', 'title': 'Greetings'}
+            assert events[3]['text'] == 'Hello there.' and events[3]['interaction_id'] == 7
+
+            ws.send(json.dumps({'type': 'text', 'prompt': 'And now?'}))
+            assert _events(ws)[-1]['type'] == 'done'
+            ws.send(json.dumps({'type': 'unknown'}))
+            assert _events(ws)[-1]['type'] == 'error'
+
+    # The session is created once and the first turn is context for the second
+    assert service.rails_client.create_chat_session.call_count == 1
+    assert service.ollama_client.stream.call_args.kwargs['history'] == [
+        {'role': 'user', 'content': 'Hi'},
+        {'role': 'assistant', 'content': 'Hello there.'}
+    ]
+
+def test_websocket_authenticates_with_first_frame_not_url(ws_url):
+    service = _service(["Hi."])
+    verify = MagicMock(side_effect=lambda token: {'uid': 'user-1'} if token == 'good' else None)
+    with patch('src.services.conversation.get_chat_service', return_value=service), \
+         patch('src.services.conversation.get_audio_service', return_value=service), \
+         patch('src.controllers.conversation_controller.get_env_level', return_value='prod'), \
+         patch('src.controllers.conversation_controller.verify_firebase_token', verify):
+        with connect(f'{ws_url}?token=good') as ws:
+            ws.send(json.dumps({'type': 'text', 'prompt': 'Hi'}))
+            assert json.loads(ws.recv(timeout=5))['type'] == 'error'
+
+        with connect(ws_url) as ws:
+            ws.send(json.dumps({'type': 'auth', 'token': 'good'}))
+            assert json.loads(ws.recv(timeout=5))['type'] == 'ready'
+
+    verify.assert_called_once_with('good')
+
+def test_open_loads_trimmed_history_once():
+    service = _service([])
+    with patch('src.services.conversation.get_chat_service', return_value=service), \
+         patch('src.services.conversation.get_audio_service', return_value=service):
+        conversation = Conversation('dev-user', MagicMock(), history_turns=2)
+        conversation.open('uuid-1')
+
+    assert conversation.session_uuid == 'uuid-1'
+    assert [m['content'] for m in conversation.history] == ['q6', 'a7', 'q8', 'a9']
+    service.rails_client.get_chat_session.assert_called_once()
+
+def test_audio_turn_streams_sentences_in_order():
+    service = _service(["One. Two", " words. Three."])
+    service.tts.synthesize.side_effect = lambda text: time.sleep(0.05 if text == 'One.' else 0) or _wav(len(text))
+    service.whisper.transcribe.return_value = "Hi"
+    service.generate_liveportrait.return_value = ({"frames": 1}, {})
+    events = []
+    with patch('src.services.conversation.get_chat_service', return_value=service), \
+         patch('src.services.conversation.get_audio_service', return_value=service):
+        conversation = Conversation('dev-user', events.append, mode='audio', liveportrait=True)
+        conversation.open('uuid-1')
+        conversation.send_audio(b'RIFF')
+
+    audio = [e for e in events if e['type'] == 'audio']
+    assert [(e['seq'], e['text']) for e in audio] == [(0, 'One.'), (1, 'Two words.'), (2, 'Three.')]
+    assert events[0] == {'type': 'transcript', 'text': 'Hi'}
+    assert {'type': 'avatar', 'status': 'done', 'result': {'frames': 1}} in events
+
+    saved = service.save_audio.call_args.args[0]
+    with wave.open(io.BytesIO(saved)) as clip:
+        assert clip.getnframes() == len('One.') + len('Two words.') + len('Three.')
+    assert service.ollama.stream.call_args.args[1] == "Be kind."
+
+def test_clips_that_cannot_be_joined_are_not_concatenated():
+    assert _join_wav([_wav(3), _wav(4)]) is not None
+    assert _join_wav([_wav(3), _wav(4, framerate=22050)]) is None
+    assert _join_wav([_wav(3), b'not a wav']) is None
+    assert _join_wav([_wav(3)]) == _wav(3)
+
+def test_slow_client_is_disconnected():
+    release = threading.Event()
+    ws = MagicMock()
+    ws.send.side_effect = lambda message: release.wait(5)
+    sender = SocketSender(ws, max_queued=2, send_timeout=0.2)
+
+    with pytest.raises(SlowClientError):
+        for i in range(10):
+            sender.send({'type': 'token', 'text': str(i)})
+
+    assert sender.closed.is_set()
+    assert sender.queue.qsize() <= 2
+    release.set()
+    sender.close()
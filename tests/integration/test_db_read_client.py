@@ -0,0 +1,107 @@
+from datetime import datetime
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine, event
+from src.cancellation import CancelScope, ClientDisconnected, cancel_scope
+from src.clients.db_read_client import DatabaseReadClient
+from src.clients.rails_client import RailsClient, get_rails_client
+from src.db import Base
+from src.models.chat_models import ChatMode, ChatSession, Interaction
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+OTHER = "223e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(ChatSession.__table__.insert(), [
+            {"id": 1, "session_uuid": SESSION, "firebase_uid": "user-1", "title": "Trains", "mode": ChatMode.TEXT,
+             "created_at": datetime(2024, 1, 1, 10), "updated_at": datetime(2024, 1, 1, 10, 5, 0, 250000),
+             "summary": "Talked about trains", "summarized_turns": 2},
+            {"id": 2, "session_uuid": OTHER, "firebase_uid": "user-1", "title": "Voice", "mode": ChatMode.AUDIO,
+             "created_at": datetime(2024, 1, 2), "updated_at": datetime(2024, 1, 2), "summary": None, "summarized_turns": 0},
+            {"id": 3, "session_uuid": "323e4567-e89b-12d3-a456-426614174000", "firebase_uid": "user-2",
+             "title": "Not yours", "mode": ChatMode.TEXT, "created_at": datetime(2024, 1, 3),
+             "updated_at": datetime(2024, 1, 3), "summary": None, "summarized_turns": 0},
+        ])
+        connection.execute(Interaction.__table__.insert(), [
+            {"id": n, "session_id": 1, "prompt": f"q{n}", "response": f"a{n}", "model_used": "llama3.2",
+             "liveportrait_data": "x" * 1000, "created_at": datetime(2024, 1, 1, 10, n)}
+            for n in range(1, 6)
+        ])
+    return engine
+
+def _statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    return statements
+
+def test_reads_have_rails_shape(engine):
+    client = DatabaseReadClient(engine=engine)
+
+    session = client.get_chat_session(SESSION, "user-1")
+    assert session == {
+        "session_uuid": SESSION, "title": "Trains", "mode": "text",
+        "created_at": "2024-01-01T10:00:00.000Z", "updated_at": "2024-01-01T10:05:00.250Z",
+        "summary": "Talked about trains", "summarized_turns": 2, "interaction_count": 5
+    }
+    assert [s["session_uuid"] for s in client.list_chat_sessions("user-1")] == [OTHER, SESSION]
+    assert client.list_chat_sessions("user-1")[0]["mode"] == "audio"
+
+    interactions = client.get_interactions(SESSION, "user-1")
+    assert [i["prompt"] for i in interactions] == ["q1", "q2", "q3", "q4", "q5"]
+    assert interactions[0] == {
+        "id": 1, "prompt": "q1", "response": "a1", "audio_response_url": None,
+        "model_used": "llama3.2", "created_at": "2024-01-01T10:01:00.000Z"
+    }
+
+def test_other_users_and_unknown_sessions_read_as_missing(engine):
+    client = DatabaseReadClient(engine=engine)
+
+    assert client.get_chat_session(SESSION, "user-2") is None
+    assert client.get_chat_session("not-a-uuid", "user-1") is None
+    assert client.get_interactions(SESSION, "user-2") == []
+    assert list(client.iter_interactions("not-a-uuid", "user-1")) == []
+    assert [s["title"] for s in client.list_chat_sessions("user-2")] == ["Not yours"]
+
+def test_iteration_uses_keyset_pages_and_projects_columns(engine):
+    client = DatabaseReadClient(engine=engine)
+    statements = _statements(engine)
+
+    assert [i["prompt"] for i in client.iter_interactions(SESSION, "user-1", per_page=2)] == ["q1", "q2", "q3", "q4", "q5"]
+    assert [s["title"] for s in client.iter_chat_sessions("user-1", per_page=1)] == ["Voice", "Trains"]
+    assert [i["prompt"] for i in client.get_interactions_page(SESSION, "user-1", page=2, per_page=2)] == ["q3", "q4"]
+
+    pages = [sql for sql in statements if sql.startswith("SELECT interactions.id, interactions.prompt")]
+    assert len(pages) == 4
+    # Pages after the first start after the last id seen instead of skipping rows
+    assert "interactions.id >" not in pages[0]
+    assert all("interactions.id >" in sql for sql in pages[1:3])
+    assert all("liveportrait_data" not in sql and "timings" not in sql for sql in statements)
+
+def test_writes_still_go_to_rails(engine):
+    client = DatabaseReadClient(engine=engine)
+
+    with patch.object(RailsClient, 'create_interaction', return_value={"id": 6}) as create:
+        assert client.create_interaction(SESSION, "user-1", "q6", "a6") == {"id": 6}
+
+    create.assert_called_once()
+    assert client.get_chat_session(SESSION, "user-1")["interaction_count"] == 5
+
+def test_reads_stop_for_cancelled_requests(engine):
+    client = DatabaseReadClient(engine=engine)
+
+    with cancel_scope(CancelScope(probe=lambda: True, probe_interval=0)), pytest.raises(ClientDisconnected):
+        client.list_chat_sessions("user-1")
+
+def test_backend_is_chosen_by_environment(engine):
+    with patch('src.clients.rails_client._rails_client', None), \
+            patch.dict('os.environ', {'DIRECT_DB_READS': 'true', 'READ_DATABASE_URL': str(engine.url)}):
+        client = get_rails_client()
+        assert isinstance(client, DatabaseReadClient)
+        assert client.get_chat_session(SESSION, "user-1")["title"] == "Trains"
+
+    with patch('src.clients.rails_client._rails_client', None):
+        assert type(get_rails_client()) is RailsClient
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock, patch
+from src.clients.ollama_client import OllamaClient
+from src.services.generation_budget import GenerationBudget, get_budget
+
+def test_default_audio_budget():
+    budget = get_budget('audio')
+    assert budget.options() == {'num_predict': 120, 'stop': ['\n\n']}
+    assert budget.instruction() == "Answer in at most 3 sentences."
+
+def test_budget_env_overrides(monkeypatch):
+    monkeypatch.setenv('GEN_BUDGET_AUDIO_MAX_TOKENS', '60')
+    monkeypatch.setenv('GEN_BUDGET_AUDIO_STOP', 'User:|\\n')
+    monkeypatch.setenv('GEN_BUDGET_AUDIO_SENTENCES', '0')
+    budget = get_budget('audio')
+    assert budget.options() == {'num_predict': 60, 'stop': ['User:', '\n']}
+    assert budget.target_sentences is None
+
+def test_apply_trims_to_target_sentences():
+    budget = GenerationBudget(target_sentences=2)
+    assert budget.apply("One. Two! Three? Four.") == "One. Two!"
+
+def test_apply_drops_partial_sentence_when_truncated():
+    budget = GenerationBudget(max_tokens=10)
+    assert budget.apply("First sentence. Second one is cut", truncated=True) == "First sentence."
+    assert budget.apply("Only a partial", truncated=True) == "Only a partial"
+
+def test_apply_keeps_formatting_and_abbreviations():
+    reply = "1. Do this.\n2. Do that.\n```py\nx = 1.\nprint(x)\n```"
+    assert GenerationBudget().apply(reply) == reply
+    assert GenerationBudget(target_sentences=2).apply(reply) == reply
+    assert GenerationBudget(target_sentences=1).apply("Mr. Smith goes to Washington. Then home.") == "Mr. Smith goes to Washington."
+    assert GenerationBudget(target_sentences=1).apply('She said "Stop!" Then she left.') == 'She said "Stop!"'
+
+def test_budget_is_wired_through_ollama_client():
+    mock_client = MagicMock()
+    mock_client.chat.return_value = {
+        'message': {'content': "A. B. C. D."},
+        'done_reason': 'stop',
+        'eval_count': 8
+    }
+    budget = GenerationBudget(max_tokens=50, stop=['\n\n'], target_sentences=2)
+    
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client):
+        result = OllamaClient().request("Hi", system_prompt="Be kind.", budget=budget)
+    
+    kwargs = mock_client.chat.call_args.kwargs
+    assert kwargs['options'] == {'num_predict': 50, 'stop': ['\n\n']}
+    assert kwargs['messages'][0]['content'] == "Be kind.\n\nAnswer in at most 2 sentences."
+    assert result['content'] == "A. B."
+    assert result['eval_count'] == 8
@@ -0,0 +1,111 @@
+import gzip
+import json
+import secrets
+import tracemalloc
+import zlib
+from unittest.mock import MagicMock, patch
+import pytest
+from api.app import create_app
+from src.clients.rails_client import RailsClient
+from src.services.chat_service import ChatService
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _rails(sessions: int, interactions_per_session: int, response_size: int = 10):
+    """Fake RailsClient that builds each page on demand."""
+    rails = MagicMock()
+    rails.iter_chat_sessions.side_effect = lambda uid, per_page: (
+        {"session_uuid": f"s{i}", "title": f"Session {i}"} for i in range(sessions)
+    )
+    rails.iter_interactions.side_effect = lambda session_uuid, uid, per_page: (
+        {"prompt": f"{session_uuid}-q{i}", "response": secrets.token_hex(response_size // 2), "created_at": "2024-01-01T00:00:00Z"}
+        for i in range(interactions_per_session)
+    )
+    return rails
+
+def test_rails_client_paginates():
+    pages = [[{"id": 1}, {"id": 2}], [{"id": 3}, {"id": 4}], [{"id": 5}]]
+    responses = [MagicMock(content=json.dumps(page).encode()) for page in pages]
+    with patch('requests.get', side_effect=responses) as mock_get:
+        items = list(RailsClient().iter_interactions("uuid-1", "user-1", per_page=2))
+
+    assert [i["id"] for i in items] == [1, 2, 3, 4, 5]
+    assert [c.kwargs["params"]["page"] for c in mock_get.call_args_list] == [1, 2, 3]
+
+def test_rails_client_stops_when_pagination_is_ignored():
+    full = [{"id": n} for n in range(1, 6)]
+    with patch('requests.get', side_effect=lambda *a, **k: MagicMock(content=json.dumps(full).encode())) as mock_get:
+        items = list(RailsClient().iter_interactions("uuid-1", "user-1", per_page=2))
+    assert [i["id"] for i in items] == [1, 2, 3, 4, 5]
+    assert mock_get.call_count == 1
+
+    same_page = [{"id": 1}, {"id": 2}]
+    with patch('requests.get', side_effect=lambda *a, **k: MagicMock(content=json.dumps(same_page).encode())) as mock_get:
+        items = list(RailsClient().iter_interactions("uuid-1", "user-1", per_page=2))
+    assert [i["id"] for i in items] == [1, 2]
+    assert mock_get.call_count == 2
+
+def test_ndjson_export_is_gzipped(test_client):
+    service = ChatService()
+    service.rails_client = _rails(sessions=2, interactions_per_session=3)
+    service.interaction_queue = None
+    with patch('src.controllers.chat_controller.chat_service', service):
+        response = test_client.get('/history?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+    assert [(l["session_uuid"], l["prompt"]) for l in lines][:4] == [
+        ("s0", "s0-q0"), ("s0", "s0-q1"), ("s0", "s0-q2"), ("s1", "s1-q0")
+    ]
+    assert len(lines) == 6 and lines[0]["session_title"] == "Session 0"
+
+def test_ndjson_export_reports_errors_in_band(test_client):
+    def export(firebase_uid):
+        yield {"prompt": "first"}
+        raise ConnectionError("Rails unavailable")
+
+    with patch('src.controllers.chat_controller.chat_service') as mock_service:
+        mock_service.export_interactions.side_effect = export
+        response = test_client.get('/history?format=ndjson')
+
+    assert 'Content-Encoding' not in response.headers
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0] == {"prompt": "first"}
+    assert "Rails unavailable" in lines[1]["error"]
+
+def test_all_flag_returns_interactions_outside_dev(test_client, monkeypatch):
+    monkeypatch.setenv('ENV_LEVEL', 'prod')
+    with patch('src.controllers.chat_controller.chat_service') as mock_service, \
+         patch('src.auth.verify_firebase_token', return_value={'uid': 'user-1'}):
+        mock_service.get_all_interactions.return_value = [{"prompt": "Hi"}]
+        response = test_client.get('/history?all=true', headers={'Authorization': 'Bearer token'})
+
+    assert response.get_json() == [{"prompt": "Hi"}]
+    mock_service.get_user_sessions.assert_not_called()
+
+def test_export_memory_stays_flat(test_client):
+    service = ChatService()
+    service.rails_client = _rails(sessions=20, interactions_per_session=500, response_size=1000)
+    service.interaction_queue = None
+
+    with patch('src.controllers.chat_controller.chat_service', service):
+        response = test_client.get('/history?format=ndjson', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        tracemalloc.start()
+        try:
+            exported = sum(len(decompressor.decompress(chunk)) for chunk in response.response)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            response.close()
+
+    # ~10 MB of NDJSON streamed with a peak well under a single megabyte
+    assert exported > 10_000_000
+    assert peak < 1_000_000
@@ -0,0 +1,125 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import pytest
+from api.app import create_app
+from src.idempotency import IdempotencyStore
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(path=str(tmp_path / "idempotency.db"), ttl=60)
+
+@pytest.fixture
+def test_client(store):
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with patch('src.idempotency.get_idempotency_store', return_value=store), app.test_client() as client:
+        yield client
+
+def _chat_service(delay: float = 0):
+    service = MagicMock()
+    calls = []
+
+    def send(session_uuid, prompt, firebase_uid):
+        calls.append(prompt)
+        time.sleep(delay)
+        return {"session_uuid": session_uuid, "response": f"Re: {prompt}", "interaction_id": len(calls)}
+
+    service.send_text_message.side_effect = send
+    return service, calls
+
+def test_completed_key_replays_response(test_client):
+    service, calls = _chat_service()
+    headers = {'Idempotency-Key': 'turn-1'}
+
+    with patch('src.controllers.chat_controller.chat_service', service):
+        first = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers=headers)
+        retry = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers=headers)
+        other = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'Idempotency-Key': 'turn-2'})
+        plain = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"})
+
+    assert calls == ["Hi", "Hi", "Hi"]
+    assert first.status_code == retry.status_code == 200
+    assert retry.get_json() == first.get_json() == {"session_uuid": SESSION, "response": "Re: Hi", "interaction_id": 1}
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert other.get_json()["interaction_id"] == 2 and plain.get_json()["interaction_id"] == 3
+
+def test_in_flight_key_attaches_to_running_request(test_client):
+    service, calls = _chat_service(delay=0.3)
+    app = test_client.application
+
+    def post():
+        with app.test_client() as client:
+            return client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'Idempotency-Key': 'turn-1'})
+
+    with patch('src.controllers.chat_controller.chat_service', service), ThreadPoolExecutor(max_workers=3) as pool:
+        responses = list(pool.map(lambda _: post(), range(3)))
+
+    assert calls == ["Hi"]
+    assert [r.get_json()["interaction_id"] for r in responses] == [1, 1, 1]
+    assert sorted(r.headers.get('Idempotent-Replayed', '') for r in responses) == ['', 'true', 'true']
+
+def test_key_reused_for_other_request_is_rejected(test_client):
+    service, calls = _chat_service()
+    headers = {'Idempotency-Key': 'turn-1'}
+
+    with patch('src.controllers.chat_controller.chat_service', service):
+        test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers=headers)
+        reused = test_client.post(f'/chat/{SESSION}', json={"prompt": "Bye"}, headers=headers)
+        too_long = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers={'Idempotency-Key': 'k' * 256})
+
+    assert reused.status_code == 422 and too_long.status_code == 400
+    assert calls == ["Hi"]
+
+def test_server_errors_are_not_stored(test_client):
+    service = MagicMock()
+    service.send_text_message.side_effect = [RuntimeError("Ollama down"), {"session_uuid": SESSION, "response": "Ok", "interaction_id": 7}]
+    headers = {'Idempotency-Key': 'turn-1'}
+
+    with patch('src.controllers.chat_controller.chat_service', service):
+        failed = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers=headers)
+        retried = test_client.post(f'/chat/{SESSION}', json={"prompt": "Hi"}, headers=headers)
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200 and retried.get_json()["interaction_id"] == 7
+
+def test_audio_retry_does_not_rerun_pipeline(test_client):
+    service = MagicMock()
+    service.send_audio_message.return_value = {"session_uuid": SESSION, "response_text": "Hello", "response_audio_url": "/audio/x.wav"}
+
+    def post(audio: bytes):
+        return test_client.post(
+            f'/audio2audio/{SESSION}',
+            data={'audio': (io.BytesIO(audio), 'turn.wav')},
+            headers={'Idempotency-Key': 'audio-1'},
+            content_type='multipart/form-data'
+        )
+
+    with patch('src.controllers.audio_controller.audio_service', service):
+        first, retry, changed = post(b'RIFF1234'), post(b'RIFF1234'), post(b'RIFF5678')
+
+    assert service.send_audio_message.call_count == 1
+    assert retry.get_json() == first.get_json() and retry.headers.get('Idempotent-Replayed') == 'true'
+    assert changed.status_code == 422
+
+def test_store_expires_keys_and_takes_over_abandoned_claims(store):
+    compute = MagicMock(return_value=(200, b'{"n": 1}', 'application/json'))
+
+    assert store.run("k", "f", compute) == ((200, b'{"n": 1}', 'application/json'), False)
+    assert store.run("k", "f", compute)[1] is True
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.run("k", "f", compute)[1] is False
+    assert compute.call_count == 2
+
+    # A claim left running by another (dead) process
+    other = IdempotencyStore(path=store.path, lock_timeout=0.2)
+    other._conn.execute("INSERT INTO idempotency_keys (key, fingerprint, status, created_at) VALUES ('x', 'f', 'running', ?)", (time.time(),))
+    started = time.time()
+    assert other.run("x", "f", compute)[1] is False
+    assert 0.2 <= time.time() - started < 2
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import create_engine
+from api.app import create_app
+from src.clients.rails_client import RailsClient
+from src.db import Base
+from src.models.chat_models import ChatMode, ChatSession, Interaction
+from src.services.chat_service import ChatService
+from src.services.conversation import Conversation
+from src.services.interaction_metrics import InteractionStats, StageTimer, interaction_metrics
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(ChatSession.__table__.insert(), [
+            {"id": 1, "session_uuid": SESSION, "firebase_uid": "user-1", "mode": ChatMode.TEXT},
+            {"id": 2, "session_uuid": "223e4567-e89b-12d3-a456-426614174000", "firebase_uid": "user-1", "mode": ChatMode.AUDIO},
+        ])
+    return engine
+
+@pytest.fixture
+def stats(engine):
+    return InteractionStats(engine=engine)
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.test_client() as client:
+        yield client
+
+def _record(engine, session_id, model, llm_ms, completion_tokens=10, eval_ms=500, created_at=None):
+    timings = {"llm_ms": llm_ms, "eval_ms": eval_ms, "total_ms": llm_ms + 5}
+    with engine.begin() as connection:
+        connection.execute(Interaction.__table__.insert(), {
+            "session_id": session_id, "prompt": "q", "response": "a", "model_used": model,
+            "prompt_tokens": 40, "completion_tokens": completion_tokens, "timings": json.dumps(timings),
+            "created_at": created_at or datetime.utcnow()
+        })
+
+def test_interaction_metrics_maps_ollama_durations():
+    timer = StageTimer()
+    timer.mark('llm')
+
+    metrics = interaction_metrics(timer, {
+        "content": "Hi", "prompt_eval_count": 12, "eval_count": 3,
+        "total_duration": 1_500_000_000, "load_duration": 0, "eval_duration": 250_000_000
+    })
+
+    assert metrics["prompt_tokens"] == 12 and metrics["completion_tokens"] == 3
+    assert metrics["timings"]["llm_total_ms"] == 1500.0 and metrics["timings"]["eval_ms"] == 250.0
+    assert "load_ms" not in metrics["timings"]
+    assert set(metrics["timings"]) >= {"llm_ms", "total_ms"}
+    assert interaction_metrics(StageTimer())["prompt_tokens"] is None
+
+def test_aggregate_percentiles_per_model_and_mode(engine, stats):
+    for llm_ms in range(1, 101):
+        _record(engine, 1, "llama3.2", llm_ms)
+    _record(engine, 2, "gemma2:1b", 300, completion_tokens=None)
+    _record(engine, 1, "llama3.2", 999, created_at=datetime.utcnow() - timedelta(days=10))
+    with engine.begin() as connection:
+        connection.execute(Interaction.__table__.insert(), {"session_id": 1, "prompt": "q", "response": "a", "model_used": "llama3.2"})
+
+    groups = stats.aggregate()
+
+    assert [(g["model"], g["mode"]) for g in groups] == [("llama3.2", "text"), ("gemma2:1b", "audio")]
+    text = groups[0]
+    assert text["count"] == 100
+    assert text["stages"]["llm_ms"] == {"p50": 50, "p95": 95}
+    assert text["prompt_tokens"] == {"p50": 40, "p95": 40, "total": 4000}
+    assert text["tokens_per_second"] == {"p50": 20.0, "p95": 20.0}
+    assert groups[1]["completion_tokens"] == {"p50": None, "p95": None, "total": 0}
+    assert [g["model"] for g in stats.aggregate(mode="audio")] == ["gemma2:1b"]
+    assert stats.aggregate(model="missing") == []
+    assert sum(g["count"] for g in stats.aggregate(days=30)) == 102
+
+def test_rails_payload_carries_metrics():
+    response = MagicMock(content=b'{"id": 1}')
+    with patch('requests.post', return_value=response) as mock_post:
+        RailsClient().create_interaction(SESSION, "user-1", "Hi", "Hello", model_used="llama3.2",
+                                         prompt_tokens=5, completion_tokens=2, timings={"llm_ms": 12.5})
+        RailsClient().create_interaction(SESSION, "user-1", "Hi", "Hello")
+
+    sent, bare = (json.loads(call.kwargs["data"]) for call in mock_post.call_args_list)
+    assert sent["prompt_tokens"] == 5 and sent["completion_tokens"] == 2 and sent["timings"] == {"llm_ms": 12.5}
+    assert "timings" not in bare and "prompt_tokens" not in bare
+
+def test_chat_service_records_timings_and_tokens():
+    service = ChatService()
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.rails_client.get_interactions.return_value = []
+    service.rails_client.create_interaction.return_value = {"id": 1}
+    service.ollama_client.request = MagicMock(return_value={
+        "content": "Choo choo!", "prompt_eval_count": 30, "eval_count": 4, "eval_duration": 200_000_000
+    })
+
+    service.send_text_message(SESSION, "Trains?", "test-user")
+
+    kwargs = service.rails_client.create_interaction.call_args.kwargs
+    assert kwargs["prompt_tokens"] == 30 and kwargs["completion_tokens"] == 4
+    assert set(kwargs["timings"]) >= {"session_ms", "history_ms", "llm_ms", "eval_ms", "total_ms"}
+
+def test_conversation_passes_stream_stats():
+    service = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.build_history.return_value = []
+
+    def stream(*args, stats=None, **kwargs):
+        yield "Ok."
+        stats.update(prompt_eval_count=8, eval_count=1)
+
+    service.ollama_client.stream.side_effect = stream
+    service.create_interaction.return_value = {"id": 1}
+
+    with patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        conversation = Conversation("test-user", lambda event: None, chat_service=service)
+    conversation.open(SESSION)
+    conversation.send_text("Hi")
+
+    kwargs = service.create_interaction.call_args.kwargs
+    assert kwargs["prompt_tokens"] == 8 and kwargs["completion_tokens"] == 1
+    assert "first_token_ms" in kwargs["timings"] and "generation_ms" in kwargs["timings"]
+
+def test_interaction_metrics_endpoint(test_client, engine, stats):
+    _record(engine, 1, "llama3.2", 120)
+    _record(engine, 2, "llama3.2", 300)
+
+    with patch('src.controllers.health_controller.get_interaction_stats', return_value=stats):
+        response = test_client.get('/metrics/interactions?days=3&mode=text')
+        invalid = [test_client.get(f'/metrics/interactions?{query}') for query in ('days=0', 'days=abc', 'mode=video')]
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["days"] == 3 and len(data["groups"]) == 1
+    assert data["groups"][0]["stages"]["llm_ms"] == {"p50": 120, "p95": 120}
+    assert [r.status_code for r in invalid] == [400, 400, 400]
@@ -0,0 +1,154 @@
+import json
+import threading
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from src.clients.rails_client import RailsClient
+from src.services.chat_service import ChatService
+from src.services.interaction_queue import InteractionQueue
+
+@pytest.fixture
+def interaction_queue(tmp_path):
+    rails_client = MagicMock()
+    rails_client.create_interactions.side_effect = lambda uid, items: [{"id": n} for n, _ in enumerate(items, 1)]
+    queue = InteractionQueue(path=str(tmp_path / "queue.db"), rails_client=rails_client)
+    queue.flush_interval = 60
+    yield queue
+    queue.stop(drain=False)
+
+def test_enqueue_is_visible_before_flush(interaction_queue):
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello", model_used="llama3.2")
+    
+    pending = interaction_queue.pending_for_session("s1", "u1")
+    assert [(p["prompt"], p["response"], p["model_used"]) for p in pending] == [("Hi", "Hello", "llama3.2")]
+    assert interaction_queue.pending_for_session("s1", "other-user") == []
+
+def test_flush_sends_batches_in_order(interaction_queue):
+    for n in range(3):
+        interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt=f"p{n}", response=f"r{n}")
+    
+    assert interaction_queue.flush() == 3
+    sent = interaction_queue.rails_client.create_interactions.call_args.args[1]
+    assert [s["prompt"] for s in sent] == ["p0", "p1", "p2"]
+    assert interaction_queue.pending_for_session("s1", "u1") == []
+
+def test_failed_flush_retries_with_backoff(interaction_queue):
+    interaction_queue.rails_client.create_interactions.side_effect = Exception("Rails down")
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello")
+    
+    assert interaction_queue.flush() == 0
+    assert interaction_queue.stats()["pending"] == 1
+    # Backing off: the next round does not retry immediately
+    assert interaction_queue.flush() == 0
+    assert interaction_queue.rails_client.create_interactions.call_count == 1
+
+def test_entries_become_dead_after_max_attempts(interaction_queue):
+    interaction_queue.max_attempts = 1
+    interaction_queue.rails_client.create_interactions.side_effect = Exception("Session deleted")
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello")
+    
+    interaction_queue.flush()
+    assert interaction_queue.stats() == {"pending": 0, "dead": 1}
+
+def _http_error(status: int):
+    return requests.HTTPError(f"{status} error", response=MagicMock(status_code=status))
+
+def test_rejected_batch_kills_only_offending_entries(interaction_queue):
+    def create(uid, items):
+        if any(item["prompt"] == "bad" for item in items):
+            raise _http_error(422)
+        return [{"id": n} for n, _ in enumerate(items, 1)]
+    
+    interaction_queue.rails_client.create_interactions.side_effect = create
+    for prompt in ("p0", "bad", "p2"):
+        interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt=prompt, response="r")
+    
+    assert interaction_queue.flush() == 2
+    assert interaction_queue.stats() == {"pending": 0, "dead": 1}
+    sent = [call.args[1][0]["prompt"] for call in interaction_queue.rails_client.create_interactions.call_args_list[1:]]
+    assert sent == ["p0", "bad", "p2"]
+
+def test_rate_limited_batch_backs_off_without_killing(interaction_queue):
+    interaction_queue.rails_client.create_interactions.side_effect = _http_error(429)
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello")
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Again", response="Hello")
+    
+    assert interaction_queue.flush() == 0
+    assert interaction_queue.stats() == {"pending": 2, "dead": 0}
+    assert interaction_queue.rails_client.create_interactions.call_count == 1
+
+def test_partial_fallback_write_is_not_repeated(interaction_queue):
+    received, failures = [], {"p1": 1}
+
+    def post(url, data=None, headers=None, timeout=None):
+        if url.endswith("/interactions/bulk"):
+            return MagicMock(status_code=404)
+        prompt = json.loads(data)["prompt"]
+        response = MagicMock(status_code=201, content=b'{"id": 1}')
+        if failures.get(prompt):
+            failures[prompt] -= 1
+            response.status_code = 503
+            response.raise_for_status.side_effect = requests.HTTPError("503", response=response)
+        else:
+            received.append(prompt)
+        return response
+
+    interaction_queue.rails_client = RailsClient()
+    for prompt in ("p0", "p1", "p2"):
+        interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt=prompt, response="r")
+
+    with patch('requests.post', side_effect=post):
+        assert interaction_queue.flush() == 1
+        assert interaction_queue.stats() == {"pending": 2, "dead": 0}
+        with interaction_queue._lock:
+            interaction_queue._conn.execute("UPDATE pending_interactions SET next_attempt_at = 0")
+        assert interaction_queue.flush() == 2
+
+    assert received == ["p0", "p1", "p2"]
+
+def test_history_read_is_not_split_by_a_flush(interaction_queue):
+    stored = []
+    interaction_queue.rails_client.create_interactions.side_effect = lambda uid, items: stored.extend(items) or items
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello")
+    flusher = threading.Thread(target=interaction_queue.flush)
+
+    def get_interactions(session_uuid, firebase_uid):
+        # The worker flushes right after Rails has answered
+        snapshot = list(stored)
+        flusher.start()
+        flusher.join(0.3)
+        return snapshot
+
+    service = ChatService()
+    service.interaction_queue = interaction_queue
+    service.rails_client = MagicMock()
+    service.rails_client.get_interactions.side_effect = get_interactions
+
+    history = service._get_interactions("s1", "u1")
+    flusher.join(5)
+
+    assert [h["prompt"] for h in history] == ["Hi"]
+    assert [s["prompt"] for s in stored] == ["Hi"]
+
+def test_journal_survives_restart(interaction_queue, tmp_path):
+    interaction_queue.enqueue(session_uuid="s1", firebase_uid="u1", prompt="Hi", response="Hello")
+    
+    reopened = InteractionQueue(path=interaction_queue.path, rails_client=interaction_queue.rails_client)
+    assert len(reopened.pending_for_session("s1", "u1")) == 1
+
+def test_chat_service_writes_behind_and_reads_queued(interaction_queue):
+    service = ChatService()
+    service.interaction_queue = interaction_queue
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": "s1"}
+    service.rails_client.get_interactions.return_value = [
+        {"prompt": "Old", "response": "Stored", "created_at": "2024-01-01T00:00:00", "model_used": "llama3.2"}
+    ]
+    service.ollama_client.request = MagicMock(return_value={"content": "Queued reply"})
+    
+    result = service.send_text_message("s1", "New", "u1")
+    
+    assert result["interaction_id"] is None
+    service.rails_client.create_interaction.assert_not_called()
+    history = service.get_session_history("s1", "u1")
+    assert [h["prompt"] for h in history] == ["Old", "New"]
@@ -0,0 +1,82 @@
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+import pytest
+from api.app import create_app
+from benchmarks.bench_json_codec import build_payload
+from src import json_codec
+from src.clients.rails_client import RailsClient
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+        yield request.param
+    else:
+        with patch.object(json_codec, 'orjson', None):
+            yield request.param
+
+def test_codec_round_trips_history(backend):
+    payload = build_payload(20, 200) + [{"emoji": "🙂", "nested": {"b": 1, "a": None}}]
+
+    encoded = json_codec.dumps(payload)
+    assert json_codec.loads(encoded) == payload
+    assert json_codec.loads(json_codec.dumps_bytes(payload)) == payload
+    assert json.loads(encoded) == payload
+    assert json_codec.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a":2,"b":1}'
+
+@dataclass
+class Turn:
+    prompt: str
+    at: datetime
+
+def test_backends_produce_identical_bytes():
+    pytest.importorskip('orjson')
+    app = create_app()
+    payload = {
+        "text": "Olá 🙂 \"quoted\"\n", "numbers": [1, -2, 0.5, 12345678.9], "flags": [True, False, None],
+        "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc), "day": date(2024, 1, 2),
+        "session_uuid": uuid.UUID("123e4567-e89b-12d3-a456-426614174000"),
+        "turn": Turn("Hi", datetime(2024, 1, 2, 3, 4, 5)), "nested": {"b": [], "a": {}}
+    }
+
+    def encode():
+        return [
+            json_codec.dumps_bytes(payload, sort_keys=True, default=app.json.default),
+            json_codec.dumps(payload, default=app.json.default).encode('utf-8'),
+            app.json.dumps(payload).encode('utf-8')
+        ]
+
+    fast = encode()
+    with patch.object(json_codec, 'orjson', None):
+        slow = encode()
+
+    assert fast == slow
+    assert b'"created_at":"Tue, 02 Jan 2024 03:04:05 GMT"' in fast[0]
+    assert '"Olá 🙂'.encode('utf-8') in fast[0]
+
+def test_jsonify_uses_codec(backend):
+    app = create_app()
+    with app.test_request_context():
+        assert isinstance(app.json, json_codec.CodecJSONProvider)
+        with patch.object(json_codec, 'dumps', wraps=json_codec.dumps) as codec_dumps:
+            response = app.json.response({"b": "ção", "a": [1, 2]})
+        assert codec_dumps.call_count == 1
+        assert response.get_data() == '{"a":[1,2],"b":"ção"}\n'.encode('utf-8')
+
+    with app.test_client() as client:
+        rejected = client.post('/chat', data=json_codec.dumps_bytes({}), content_type='application/json')
+        assert rejected.status_code == 400
+
+def test_rails_client_sends_codec_bytes(backend):
+    response = MagicMock(content=b'{"session_uuid": "uuid-1"}')
+    with patch('requests.post', return_value=response) as mock_post:
+        session = RailsClient().create_chat_session("user-1", title="Olá", mode="text")
+
+    assert session == {"session_uuid": "uuid-1"}
+    sent = mock_post.call_args.kwargs
+    assert isinstance(sent['data'], bytes) and 'json' not in sent
+    assert json.loads(sent['data']) == {"title": "Olá", "mode": "text"}
+    assert sent['headers']['Content-Type'] == 'application/json'
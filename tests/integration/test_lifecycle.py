@@ -0,0 +1,23 @@
+from unittest.mock import patch
+from src import lifecycle
+from src.clients import ollama_client
+from src.clients.ollama_client import get_ollama_client
+from src.services.interaction_queue import InteractionQueue
+
+def test_after_fork_replaces_pooled_clients(tmp_path):
+    before = get_ollama_client()
+    queue = InteractionQueue(path=str(tmp_path / "queue.db"))
+    connection = queue._conn
+    
+    with patch('src.services.interaction_queue._interaction_queue', queue):
+        lifecycle.after_fork()
+    
+    assert get_ollama_client() is not before
+    assert queue._conn is not connection
+    assert ollama_client.get_ollama_client() is get_ollama_client()
+
+def test_shutdown_waits_for_in_flight_calls():
+    calls = iter([2, 1, 0])
+    with patch('src.lifecycle.in_flight_calls', side_effect=lambda: next(calls)) as in_flight:
+        lifecycle.shutdown(timeout=5)
+    assert in_flight.call_count == 3
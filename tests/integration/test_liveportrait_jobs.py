@@ -0,0 +1,113 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from api.app import create_app
+from src.services.liveportrait_jobs import LivePortraitJobStore
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _store(result=None, delay=0.0, **kwargs):
+    client = MagicMock()
+    client.generate.side_effect = lambda text, audio_url=None: time.sleep(delay) or result
+    return LivePortraitJobStore(client=client, **kwargs)
+
+def _wait_done(store, job_id, firebase_uid=None):
+    job = store.get(job_id, firebase_uid=firebase_uid)
+    while job['status'] not in ('done', 'failed'):
+        job = store.wait(job_id, last_status=job['status'], timeout=1, firebase_uid=firebase_uid)
+    return job
+
+def test_job_runs_in_background():
+    store = _store(result={"frames": 3}, delay=0.05)
+    job = store.submit("Hello", audio_data=b"audio")
+    
+    assert job['status'] in ('queued', 'running')
+    assert _wait_done(store, job['job_id']) == {"job_id": job['job_id'], "status": "done", "result": {"frames": 3}, "error": None}
+
+def test_identical_inputs_are_deduplicated():
+    store = _store(result={"frames": 1}, delay=0.05)
+    first = store.submit("Hello", audio_url="/audio/a.wav", audio_data=b"same")
+    second = store.submit("Hello", audio_url="/audio/b.wav", audio_data=b"same")
+    third = store.submit("Hello", audio_data=b"different")
+    other_user = store.submit("Hello", audio_data=b"same", firebase_uid="user-2")
+    
+    assert first['job_id'] == second['job_id']
+    assert third['job_id'] != first['job_id']
+    assert other_user['job_id'] != first['job_id']
+    _wait_done(store, third['job_id'])
+    _wait_done(store, other_user['job_id'], firebase_uid="user-2")
+    assert _wait_done(store, first['job_id'])['status'] == 'done'
+    assert store.client.generate.call_count == 3
+
+def test_finished_jobs_expire():
+    store = _store(result={"frames": 1}, ttl=0)
+    job = store.submit("Hello")
+    _wait_done(store, job['job_id'])
+    time.sleep(0.01)
+    assert store.get(job['job_id']) is None
+
+def test_full_queue_rejects():
+    release = threading.Event()
+    client = MagicMock()
+    client.generate.side_effect = lambda *args, **kwargs: release.wait() and {"frames": 1}
+    store = LivePortraitJobStore(client=client, workers=1, max_queued=1)
+    
+    store.submit("running")
+    time.sleep(0.05)
+    store.submit("queued")
+    assert store.submit("overflow")['status'] == 'rejected'
+    release.set()
+
+def test_job_status_and_events_endpoints(test_client):
+    store = _store(result={"frames": 2})
+    job = store.submit("Hello", firebase_uid="dev-user")
+    other = store.submit("Hello", firebase_uid="user-2")
+    _wait_done(store, job['job_id'], firebase_uid="dev-user")
+    assert store.get(job['job_id']) is None
+    assert store.get(job['job_id'], firebase_uid="dev-user")['status'] == 'done'
+    
+    with patch('src.controllers.liveportrait_controller.get_liveportrait_jobs', return_value=store):
+        response = test_client.get(f"/liveportrait/jobs/{job['job_id']}")
+        assert response.status_code == 200
+        assert response.get_json()['result'] == {"frames": 2}
+        
+        events = test_client.get(f"/liveportrait/jobs/{job['job_id']}/events")
+        assert events.mimetype == 'text/event-stream'
+        assert events.get_data(as_text=True).startswith('event: done\n')
+        
+        missing = test_client.get("/liveportrait/jobs/00000000-0000-0000-0000-000000000000")
+        assert missing.status_code == 404
+        assert test_client.get(f"/liveportrait/jobs/{other['job_id']}").status_code == 404
+        assert test_client.get(f"/liveportrait/jobs/{other['job_id']}/events").status_code == 404
+
+def test_audio_service_returns_job_id():
+    from src.services.audio_service import AudioService
+    service = AudioService()
+    store = _store(result={"frames": 1})
+    with patch('src.services.audio_service.get_liveportrait_jobs', return_value=store):
+        data, extra = service.generate_liveportrait(
+            "Hi", "/audio/x.wav", b"wav", liveportrait=True, liveportrait_async=True, firebase_uid="user-1"
+        )
+    
+    assert data is None
+    assert extra['liveportrait_job_id']
+    assert extra['liveportrait_status'] in ('queued', 'running', 'done')
+    assert store.get(extra['liveportrait_job_id'], firebase_uid="user-1")
+    assert store.get(extra['liveportrait_job_id'], firebase_uid="user-2") is None
+
+def test_each_turn_saves_its_own_audio(tmp_path, monkeypatch):
+    from src.services.audio_service import AudioService
+    monkeypatch.chdir(tmp_path)
+    service = AudioService()
+    
+    first = service.save_audio(b"one", "session-1")
+    second = service.save_audio(b"two", "session-1")
+    
+    assert first != second and first.startswith('/audio/session-1-')
+    assert (tmp_path / 'audio_responses' / first.rsplit('/', 1)[1]).read_bytes() == b"one"
@@ -0,0 +1,92 @@
+import os
+from unittest.mock import MagicMock
+import numpy as np
+from src.services.chat_service import ChatService
+from src.services.memory_index import MemoryIndex, MemoryService, recall_messages
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+def _entry(n: int, session_uuid: str = "old-session") -> dict:
+    return {"session_uuid": session_uuid, "prompt": f"p{n}", "response": f"r{n}", "created_at": None}
+
+def test_index_ranks_and_persists(tmp_path):
+    memory_index = MemoryIndex(str(tmp_path), "all-minilm")
+    memory_index.add(np.eye(4) * 3, [_entry(n) for n in range(4)])
+    memory_index.add([[1, 1, 0, 0]], [_entry(4)])
+
+    hits = memory_index.search([1, 0.9, 0, 0], k=2)
+    assert [entry["prompt"] for _, entry in hits] == ["p4", "p0"]
+    assert hits[0][0] > 0.99
+
+    # Another process sharing the files sees the same rows, and new ones as they are added
+    other = MemoryIndex(str(tmp_path), "all-minilm")
+    assert len(other) == 5
+    memory_index.add([[0, 0, 0, 1]], [_entry(5)])
+    assert {entry["prompt"] for _, entry in other.search([0, 0, 0, 1], k=2)} == {"p3", "p5"}
+    assert len(other) == 6
+
+def test_index_recovers_from_partial_write(tmp_path):
+    memory_index = MemoryIndex(str(tmp_path), "all-minilm")
+    memory_index.add(np.eye(2), [_entry(0), _entry(1)])
+    with open(tmp_path / "entries.jsonl", "ab") as f:
+        f.write(b'{"prompt": "p2"}\n{"prom')
+
+    reopened = MemoryIndex(str(tmp_path), "all-minilm")
+    assert len(reopened) == 2
+    reopened.add([[0, 1]], [_entry(3)])
+    assert {entry["prompt"] for _, entry in reopened.search([0, 1], k=2)} == {"p1", "p3"}
+    assert len(MemoryIndex(str(tmp_path), "all-minilm")) == 3
+
+    # Vectors of another embedding model are not comparable
+    assert len(MemoryIndex(str(tmp_path), "nomic-embed-text")) == 0
+
+def _memory_service(tmp_path):
+    service = MemoryService(path=str(tmp_path))
+    service.min_score = 0.5
+    vocabulary = ["train", "school", "music"]
+    service.embedder.embed = MagicMock(side_effect=lambda texts: [
+        [float(word in text.lower()) for word in vocabulary] for text in texts
+    ])
+    return service
+
+def test_recall_skips_current_session_and_weak_matches(tmp_path):
+    memory_service = _memory_service(tmp_path)
+    memory_service.remember("user-1", [
+        {"session_uuid": "s1", "prompt": "I love trains", "response": "Trains are great!"},
+        {"session_uuid": "s2", "prompt": "School was loud", "response": "That sounds hard."},
+        {"session_uuid": SESSION, "prompt": "Tell me about trains", "response": "Choo choo."}
+    ]).result(timeout=5)
+
+    memories = memory_service.recall("user-1", "What about trains?", exclude_session=SESSION)
+    assert [m["session_uuid"] for m in memories] == ["s1"]
+    assert memory_service.recall("user-2", "trains") == []
+    assert os.listdir(tmp_path) and len(memory_service.index("user-1")) == 3
+
+    messages = recall_messages(memory_service, "user-1", "trains", SESSION)
+    assert messages[0]["role"] == "system" and "I love trains" in messages[0]["content"]
+    assert recall_messages(None, "user-1", "trains") == []
+
+def test_chat_service_recalls_and_remembers(tmp_path):
+    service = ChatService()
+    service.memory_service = _memory_service(tmp_path)
+    service.memory_service.remember("user-1", [
+        {"session_uuid": "s1", "prompt": "My dog likes music", "response": "Lovely!"}
+    ]).result(timeout=5)
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.rails_client.get_interactions.return_value = []
+    service.rails_client.create_interaction.return_value = {"id": 1, "created_at": "2024-01-01T00:00:00"}
+    service.ollama_client.request = MagicMock(return_value={"content": "Let's play music."})
+
+    remember = service.memory_service.remember
+    futures = []
+    service.memory_service.remember = lambda *args: futures.append(remember(*args))
+
+    service.send_text_message(SESSION, "Can we listen to music?", "user-1")
+
+    history = service.ollama_client.request.call_args.kwargs["history"]
+    assert "My dog likes music" in history[0]["content"]
+    futures[0].result(timeout=5)
+    hits = service.memory_service.index("user-1").search([0, 0, 1], k=5)
+    assert sorted(e["prompt"] for _, e in hits) == ["Can we listen to music?", "My dog likes music"]
+    assert {e["created_at"] for _, e in hits} == {None, "2024-01-01T00:00:00"}
@@ -0,0 +1,103 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from api.app import create_app
+from src.clients.ollama_client import get_keep_alive
+from src.services.model_manager import ModelManager, configured_models
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _manager(models, mode='sync'):
+    # conftest turns warm-up off for the app; most tests exercise it
+    manager = ModelManager(models=models)
+    manager.mode = mode
+    return manager
+
+def _ps(*names):
+    return SimpleNamespace(models=[SimpleNamespace(model=name) for name in names])
+
+def test_configured_models_cover_all_services(monkeypatch):
+    assert configured_models() == ['llama3.2', 'gemma2:1b', 'gemma2:270m']
+    monkeypatch.setenv('LONG_TERM_MEMORY', 'true')
+    assert configured_models() == ['llama3.2', 'gemma2:1b', 'gemma2:270m', 'all-minilm']
+
+def test_embed_model_is_loaded_with_embed(monkeypatch):
+    monkeypatch.setenv('LONG_TERM_MEMORY', 'true')
+    manager = _manager(['llama3.2', 'all-minilm'])
+    mock_client = MagicMock()
+    with patch('src.services.model_manager.get_ollama_client', return_value=mock_client):
+        manager.warm_up()
+    
+    assert mock_client.embed.call_args.kwargs['model'] == 'all-minilm'
+    assert [call.kwargs['model'] for call in mock_client.generate.call_args_list] == ['llama3.2']
+
+def test_keep_alive_overrides(monkeypatch):
+    monkeypatch.setenv('OLLAMA_KEEP_ALIVE', '10m')
+    monkeypatch.setenv('OLLAMA_KEEP_ALIVE_MODELS', 'llama3.2=1h,gemma2:270m=-1')
+    assert get_keep_alive('llama3.2') == '1h'
+    assert get_keep_alive('gemma2:270m') == -1
+    assert get_keep_alive('gemma2:1b') == '10m'
+
+def test_warm_up_loads_every_model():
+    manager = _manager(['llama3.2', 'gemma2:270m'])
+    mock_client = MagicMock()
+    with patch('src.services.model_manager.get_ollama_client', return_value=mock_client):
+        manager.warm_up()
+    
+    loaded = {call.kwargs['model'] for call in mock_client.generate.call_args_list}
+    assert loaded == {'llama3.2', 'gemma2:270m'}
+    assert manager.status()['ready'] is True
+
+def test_evicted_model_is_reloaded():
+    manager = _manager(['llama3.2', 'gemma2:270m'])
+    mock_client = MagicMock()
+    mock_client.ps.return_value = _ps('llama3.2:latest')
+    with patch('src.services.model_manager.get_ollama_client', return_value=mock_client):
+        manager.warm_up()
+        reloaded = manager.check_evictions()
+    
+    assert reloaded == ['gemma2:270m']
+    assert manager.status()['models']['gemma2:270m']['reloads'] == 1
+
+def test_failed_load_reports_error():
+    manager = _manager(['llama3.2'])
+    mock_client = MagicMock()
+    mock_client.generate.side_effect = Exception("connection refused")
+    with patch('src.services.model_manager.get_ollama_client', return_value=mock_client):
+        manager.warm_up()
+    
+    status = manager.status()
+    assert status['ready'] is False
+    assert status['models']['llama3.2']['state'] == 'error'
+
+def test_healthz_models_endpoint(test_client):
+    manager = _manager(['llama3.2'])
+    with patch('src.controllers.health_controller.get_model_manager', return_value=manager):
+        response = test_client.get('/healthz/models')
+        assert response.status_code == 503
+        assert response.get_json()['models']['llama3.2']['state'] == 'pending'
+        
+        with patch('src.services.model_manager.get_ollama_client'):
+            manager.warm_up()
+        response = test_client.get('/healthz/models')
+        assert response.status_code == 200
+
+def test_healthz_models_without_warmup_reports_running_models(test_client):
+    manager = _manager(['llama3.2', 'gemma2:270m'], mode='off')
+    mock_client = MagicMock()
+    mock_client.ps.return_value = _ps('llama3.2:latest')
+    with patch('src.controllers.health_controller.get_model_manager', return_value=manager), \
+         patch('src.services.model_manager.get_ollama_client', return_value=mock_client):
+        response = test_client.get('/healthz/models')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['warmup'] == 'off'
+    assert {model: state['state'] for model, state in data['models'].items()} == {
+        'llama3.2': 'loaded', 'gemma2:270m': 'unloaded'
+    }
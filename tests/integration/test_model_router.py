@@ -0,0 +1,146 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from src.clients.model_router import ModelRouter, routed
+from src.clients.ollama_client import OllamaClient
+from src.services.chat_service import ChatService
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+# Tokens per second each fake backend model generates at
+SPEEDS = {'llama3.2': 10, 'gemma2:1b': 80, 'gemma2:270m': 200}
+
+class FakeOllama:
+    """Ollama stand-in answering 100-token replies at the speed of the requested model."""
+    def __init__(self, speeds: dict):
+        self.speeds = speeds
+        self.models = []
+
+    def chat(self, model, messages, options=None, keep_alive=None, stream=False):
+        self.models.append(model)
+        return {
+            'message': {'content': f'Reply from {model}.'},
+            'eval_count': 100,
+            'prompt_eval_count': 20,
+            'eval_duration': int(100 / self.speeds[model] * 1e9),
+            'prompt_eval_duration': 50_000_000,
+            'load_duration': 0
+        }
+
+def _observe(router, model, tokens_per_second, tokens=100):
+    with router.track(model) as observed:
+        observed.update(eval_count=tokens, eval_duration=int(tokens / tokens_per_second * 1e9))
+
+def test_slow_model_moves_to_next_allowed():
+    router = ModelRouter(parallel=1)
+    assert router.choose('text', 'llama3.2') == 'llama3.2'
+
+    _observe(router, 'llama3.2', 10)
+    assert router.estimate_ms('llama3.2') == pytest.approx(10_000)
+    # gemma2:1b has no measurements yet, so it counts as fast
+    assert router.choose('text', 'llama3.2') == 'gemma2:1b'
+
+    _observe(router, 'gemma2:1b', 5)
+    _observe(router, 'gemma2:270m', 8)
+    # Nothing meets the SLO: the fastest estimate wins
+    assert router.choose('text', 'llama3.2') == 'llama3.2'
+
+def test_queue_depth_pushes_requests_to_smaller_model():
+    router = ModelRouter(parallel=2)
+    _observe(router, 'llama3.2', 40)
+    _observe(router, 'gemma2:1b', 80)
+
+    busy = [router.track('llama3.2') for _ in range(4)]
+    for tracked in busy:
+        tracked.__enter__()
+    # Two rounds of waiting behind four requests, plus its own: 7.5 s
+    assert router.estimate_ms('llama3.2') == pytest.approx(7_500)
+    with patch.dict('os.environ', {'MODEL_ROUTER_TEXT_SLO_MS': '5000'}):
+        assert router.choose('text', 'llama3.2') == 'gemma2:1b'
+        for tracked in busy:
+            tracked.__exit__(None, None, None)
+        assert router.choose('text', 'llama3.2') == 'llama3.2'
+
+    assert router.snapshot()['gemma2:1b']['routed'] == 1
+
+def test_allow_list_and_expired_stats():
+    router = ModelRouter(stats_ttl=60)
+    _observe(router, 'llama3.2', 1)
+
+    with patch.dict('os.environ', {'MODEL_ROUTER_TEXT_MODELS': 'llama3.2'}):
+        model = router.choose('text', 'llama3.2')
+        assert model == 'llama3.2'
+        with router.track(model):
+            pass
+    assert router.allowed('audio', 'gemma2:1b') == ['gemma2:1b', 'gemma2:270m']
+
+    router.stats_ttl = 0
+    assert router.estimate_ms('llama3.2') is None
+    assert router.choose('text', 'llama3.2') == 'llama3.2'
+
+def test_busy_model_with_stale_stats_is_not_treated_as_fast():
+    router = ModelRouter(parallel=1, stats_ttl=60)
+    _observe(router, 'llama3.2', 40)
+    busy = [router.track('llama3.2') for _ in range(20)]
+    for tracked in busy:
+        tracked.__enter__()
+
+    assert router.choose('text', 'llama3.2') == 'gemma2:1b'
+    router.stats_ttl = 0
+    assert router.estimate_ms('llama3.2') == pytest.approx(21 * 2_500)
+    assert router.choose('text', 'llama3.2') == 'gemma2:1b'
+
+    for tracked in busy:
+        tracked.__exit__(None, None, None)
+    router.stats_ttl = 60
+    # The two calls routed to gemma2:1b run
+    with router.track('gemma2:1b'), router.track('gemma2:1b'):
+        pass
+    router.stats_ttl = 0
+    # Idle with stale stats: back to the preferred model
+    assert router.choose('text', 'llama3.2') == 'llama3.2'
+
+def test_burst_spreads_over_models():
+    router = ModelRouter(parallel=1)
+    _observe(router, 'llama3.2', 40)
+    _observe(router, 'gemma2:1b', 80)
+
+    with patch.dict('os.environ', {'MODEL_ROUTER_TEXT_SLO_MS': '4000'}):
+        picks = [router.choose('text', 'llama3.2') for _ in range(4)]
+
+    # Each pick counts as in flight until its call starts and ends
+    assert picks == ['llama3.2', 'gemma2:1b', 'gemma2:1b', 'gemma2:1b']
+    with router.track('llama3.2'):
+        assert router.snapshot()['llama3.2']['in_flight'] == 1
+        assert router.estimate_ms('llama3.2') == pytest.approx(5_000)
+
+def test_routed_keeps_client_without_router():
+    client = OllamaClient(model='llama3.2', options={'temperature': 0.5})
+    assert routed(client, 'text') is client
+
+    router = MagicMock()
+    router.choose.return_value = 'gemma2:1b'
+    other = routed(client, 'text', router)
+    assert other.llm_model == 'gemma2:1b' and other.options == {'temperature': 0.5}
+
+def test_chat_service_routes_by_backend_speed_and_records_model():
+    router = ModelRouter()
+    backend = FakeOllama(SPEEDS)
+
+    service = ChatService()
+    service.router = router
+    service.ollama_client = OllamaClient(model='llama3.2')
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.rails_client.get_interactions.return_value = []
+    service.rails_client.create_interaction.return_value = {"id": 1}
+
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=backend), \
+            patch('src.clients.ollama_client.get_model_router', return_value=router):
+        first = service.send_text_message(SESSION, "Hi", "test-user")
+        second = service.send_text_message(SESSION, "Hi again", "test-user")
+
+    assert backend.models == ['llama3.2', 'gemma2:1b']
+    assert first["response"] == "Reply from llama3.2." and second["response"] == "Reply from gemma2:1b."
+    used = [call.kwargs["model_used"] for call in service.rails_client.create_interaction.call_args_list]
+    assert used == ['llama3.2', 'gemma2:1b']
+    assert router.snapshot()['llama3.2']['tokens_per_second'] == 10
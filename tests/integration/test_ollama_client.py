@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock, patch
+from src.clients.ollama_client import OllamaClient, get_ollama_client
+
+def test_shared_client_is_created_once():
+    assert get_ollama_client() is get_ollama_client()
+
+def test_request_merges_call_site_options():
+    mock_client = MagicMock()
+    mock_client.chat.return_value = {'message': {'content': 'Hi'}, 'total_duration': 5}
+    client = OllamaClient(model='gemma2:1b', options={'num_predict': 100, 'temperature': 0.7})
+    
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client):
+        result = client.request("Hello", options={'num_predict': 20})
+    
+    assert result == {
+        "content": "Hi", "total_duration": 5, "eval_count": 0, "prompt_eval_count": 0,
+        "load_duration": 0, "prompt_eval_duration": 0, "eval_duration": 0
+    }
+    kwargs = mock_client.chat.call_args.kwargs
+    assert kwargs['model'] == 'gemma2:1b'
+    assert kwargs['options'] == {'num_predict': 20, 'temperature': 0.7}
+
+def test_request_returns_none_on_error():
+    mock_client = MagicMock()
+    mock_client.chat.side_effect = Exception("timeout")
+    with patch('src.clients.ollama_client.get_ollama_client', return_value=mock_client):
+        assert OllamaClient().request("Hello") is None
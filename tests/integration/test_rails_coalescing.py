@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import pytest
+from src.cancellation import CancelScope, ClientDisconnected, RequestCancelled, cancel_scope
+from src.clients.rails_client import RailsClient
+from src.clients.single_flight import SingleFlight
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+def _slow_get(delay: float = 0.2):
+    calls = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        calls.append((url, params, headers["X-Firebase-UID"]))
+        time.sleep(delay)
+        return MagicMock(content=json.dumps([{"url": url, "page": (params or {}).get("page")}]).encode())
+    return get, calls
+
+def test_concurrent_identical_reads_share_one_request():
+    client = RailsClient()
+    get, calls = _slow_get()
+
+    with patch('requests.get', side_effect=get), ThreadPoolExecutor(max_workers=8) as pool:
+        listed = [pool.submit(client.list_chat_sessions, "user-1") for _ in range(4)]
+        history = [pool.submit(client.get_interactions, SESSION, "user-1") for _ in range(3)]
+        other_user = pool.submit(client.list_chat_sessions, "user-2")
+        results = [f.result() for f in listed]
+        [f.result() for f in history]
+        other_user.result()
+
+    assert len(calls) == 3
+    assert all(result is results[0] for result in results)
+    assert client.coalescing_stats() == {
+        'list_chat_sessions': {'calls': 2, 'coalesced': 3},
+        'get_interactions': {'calls': 1, 'coalesced': 2}
+    }
+
+def test_pages_and_sequential_reads_are_not_shared():
+    client = RailsClient()
+    get, calls = _slow_get(delay=0.1)
+
+    with patch('requests.get', side_effect=get), ThreadPoolExecutor(max_workers=2) as pool:
+        pages = list(pool.map(lambda page: client.get_interactions_page(SESSION, "user-1", page, 10), [1, 2]))
+        client.get_interactions_page(SESSION, "user-1", 1, 10)
+
+    assert [p[0]["page"] for p in pages] == [1, 2]
+    assert len(calls) == 3
+
+def test_error_is_shared_by_waiting_callers():
+    flight = SingleFlight()
+    started = threading.Event()
+    runs = []
+
+    def failing():
+        runs.append(1)
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("Rails down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(flight.do, 'read', 'k', failing)
+        started.wait()
+        second = pool.submit(flight.do, 'read', 'k', failing)
+        for future in (first, second):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert runs == [1]
+    assert flight.stats() == {'read': {'calls': 1, 'coalesced': 1}}
+
+def test_cancelled_leader_does_not_fail_waiters():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def cancelled():
+        started.set()
+        time.sleep(0.1)
+        raise RequestCancelled("Client disconnected")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'read', 'k', cancelled)
+        started.wait()
+        waiter = pool.submit(flight.do, 'read', 'k', lambda: "fresh")
+        assert waiter.result() == "fresh"
+        with pytest.raises(RequestCancelled):
+            leader.result()
+
+    # A waiter whose own request goes away stops waiting
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(flight.do, 'read', 'slow', release.wait)
+        time.sleep(0.05)
+        gone = CancelScope(probe=lambda: True, probe_interval=0.01)
+        with cancel_scope(gone), pytest.raises(ClientDisconnected):
+            flight.do('read', 'slow', lambda: None)
+        release.set()
+
+def test_coalescing_can_be_disabled():
+    with patch.dict('os.environ', {'RAILS_COALESCE_READS': 'false'}):
+        client = RailsClient()
+    get, calls = _slow_get(delay=0.05)
+
+    with patch('requests.get', side_effect=get), ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda _: client.get_chat_session(SESSION, "user-1"), range(3)))
+
+    assert len(calls) == 3 and client.coalescing_stats() == {}
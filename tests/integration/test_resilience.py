@@ -0,0 +1,88 @@
+import time
+import pytest
+import requests
+from unittest.mock import patch
+from api.app import create_app
+from src.clients.liveportrait_client import LivePortraitClient
+from src.clients.resilience import CircuitOpenError, ResilientBackend
+
+@pytest.fixture
+def test_client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _failing(url, timeout):
+    raise requests.ConnectionError("down")
+
+def test_breaker_opens_and_half_opens():
+    backend = ResilientBackend('test', ['http://a'], max_timeout=1, failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            backend.call(_failing)
+    
+    with pytest.raises(CircuitOpenError):
+        backend.call(lambda url, timeout: "ok")
+    
+    time.sleep(0.06)
+    assert backend.call(lambda url, timeout: "ok") == "ok"
+    assert backend.breaker.state == 'closed'
+
+def test_client_errors_do_not_open_breaker():
+    backend = ResilientBackend('test', ['http://a'], max_timeout=1, failure_threshold=1)
+    
+    def bad_request(url, timeout):
+        response = requests.Response()
+        response.status_code = 400
+        raise requests.HTTPError(response=response)
+    
+    with pytest.raises(requests.HTTPError):
+        backend.call(bad_request)
+    assert backend.breaker.state == 'closed'
+
+def test_timeout_adapts_to_p99():
+    backend = ResilientBackend('test', ['http://a'], max_timeout=60, min_timeout=0.5)
+    assert backend.timeout() == 60
+    for _ in range(backend.min_samples):
+        backend.latency.record(0.4)
+    assert backend.timeout() == pytest.approx(0.8)
+
+def test_hedged_request_uses_fastest_url():
+    backend = ResilientBackend('test', ['http://slow', 'http://fast'], max_timeout=5, hedge=True, hedge_delay=0.05)
+    
+    def post(url, timeout):
+        time.sleep(0.5 if url == 'http://slow' else 0)
+        return url
+    
+    start_time = time.time()
+    assert backend.call(post) == 'http://fast'
+    assert time.time() - start_time < 0.3
+    assert backend.hedged_calls == 1
+
+def test_hedged_request_fails_over():
+    backend = ResilientBackend('test', ['http://down', 'http://up'], max_timeout=5, hedge=True, hedge_delay=1)
+    
+    def post(url, timeout):
+        if url == 'http://down':
+            raise requests.ConnectionError("down")
+        return url
+    
+    assert backend.call(post) == 'http://up'
+
+def test_liveportrait_degrades_fast_when_open(monkeypatch):
+    monkeypatch.setenv('LIVEPORTRAIT_ENABLED', 'true')
+    client = LivePortraitClient()
+    client.backend.breaker.state = 'open'
+    client.backend.breaker.opened_at = time.time()
+    
+    with patch('requests.post') as mock_post:
+        assert client.generate("Hello") is None
+        mock_post.assert_not_called()
+    client.backend.breaker.record_success()
+
+def test_metrics_exposes_breakers(test_client):
+    LivePortraitClient()
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.get_json()['backends']['liveportrait']['state'] in ('closed', 'open', 'half_open')
@@ -0,0 +1,100 @@
+import json
+from unittest.mock import MagicMock, patch
+from src.clients.rails_client import RailsClient
+from src.services.chat_service import ChatService
+from src.services.conversation import Conversation
+from src.services.summary_service import SummaryService, prompt_history
+
+SESSION = "123e4567-e89b-12d3-a456-426614174000"
+
+def _interactions(count: int) -> list:
+    return [
+        {"prompt": f"q{n}", "response": f"a{n}", "created_at": f"2024-01-01T00:{n % 60:02d}:00"}
+        for n in range(count)
+    ]
+
+def _summary_service(keep=2, trigger=5):
+    service = SummaryService()
+    service.keep_turns, service.trigger_turns, service.trigger_tokens = keep, trigger, 10_000
+    service.rails_client = MagicMock()
+    service.ollama.request = MagicMock(return_value={"content": " Sam likes trains. "})
+    return service
+
+def test_fold_summarizes_all_but_recent_turns():
+    service = _summary_service()
+    session = {"session_uuid": SESSION, "summary": "Sam is 9.", "summarized_turns": 2}
+
+    assert service.fold(session, _interactions(7), "test-user") == "Sam likes trains."
+
+    prompt = service.ollama.request.call_args.args[0]
+    assert "Sam is 9." in prompt and "User: q2" in prompt and "User: q4" in prompt
+    assert "q1" not in prompt and "q5" not in prompt
+    service.rails_client.update_chat_session.assert_called_once_with(
+        SESSION, "test-user", summary="Sam likes trains.", summarized_turns=5
+    )
+
+def test_prompt_history_stays_bounded_on_long_sessions():
+    service = _summary_service()
+    session = {"session_uuid": SESSION, "summary": "Sam likes trains.", "summarized_turns": 197}
+
+    with patch.object(service, 'maybe_fold') as maybe_fold:
+        history = prompt_history(session, _interactions(200), "test-user", service)
+
+    maybe_fold.assert_called_once()
+    assert history[0] == {"role": "system", "content": "Summary of the conversation so far: Sam likes trains."}
+    assert [m["content"] for m in history[1:]] == ["q197", "a197", "q198", "a198", "q199", "a199"]
+
+    with patch.dict('os.environ', {'CONVERSATION_HISTORY_TURNS': '2'}):
+        assert len(prompt_history(session, _interactions(200), "test-user")) == 4
+
+def test_folding_runs_once_in_background():
+    service = _summary_service()
+    session = {"session_uuid": SESSION, "summary": None}
+
+    assert service.maybe_fold(session, _interactions(4), "test-user") is None
+    first = service.maybe_fold(session, _interactions(5), "test-user")
+    first.result(timeout=5)
+    service.rails_client.update_chat_session.assert_called_once()
+    assert service.rails_client.update_chat_session.call_args.kwargs["summarized_turns"] == 3
+
+def test_chat_service_sends_summary_and_recent_turns():
+    service = ChatService()
+    service.summary_service = _summary_service(trigger=50)
+    service.rails_client = MagicMock()
+    service.rails_client.get_chat_session.return_value = {
+        "session_uuid": SESSION, "summary": "Sam likes trains.", "summarized_turns": 8
+    }
+    service.rails_client.get_interactions.return_value = _interactions(10)
+    service.rails_client.create_interaction.return_value = {"id": 1}
+    service.ollama_client.request = MagicMock(return_value={"content": "Choo choo!"})
+
+    service.send_text_message(SESSION, "More trains?", "test-user")
+
+    history = service.ollama_client.request.call_args.kwargs["history"]
+    assert history[0]["role"] == "system"
+    assert [m["content"] for m in history[1:]] == ["q8", "a8", "q9", "a9"]
+
+def test_conversation_keeps_summary_in_front_of_recent_turns():
+    service = MagicMock()
+    service.rails_client.get_chat_session.return_value = {"session_uuid": SESSION}
+    service.build_history.return_value = [{"role": "system", "content": "Summary"}] + [
+        {"role": "user", "content": f"q{n}"} for n in range(6)
+    ]
+    service.ollama_client.stream.side_effect = lambda *args, **kwargs: iter(["Ok."])
+    service.create_interaction.return_value = {"id": 1}
+
+    with patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        conversation = Conversation("test-user", lambda event: None, chat_service=service, history_turns=2)
+    conversation.open(SESSION)
+    conversation.send_text("Hi")
+
+    history = service.ollama_client.stream.call_args.kwargs["history"]
+    assert [m["content"] for m in history] == ["Summary", "q2", "q3", "q4", "q5"]
+
+def test_rails_client_updates_session():
+    response = MagicMock(content=b'{"session_uuid": "uuid-1", "summary": "S"}')
+    with patch('requests.patch', return_value=response) as mock_patch:
+        RailsClient().update_chat_session("uuid-1", "user-1", summary="S", summarized_turns=3)
+
+    assert mock_patch.call_args.args[0].endswith("/chat_sessions/uuid-1")
+    assert json.loads(mock_patch.call_args.kwargs["data"]) == {"summary": "S", "summarized_turns": 3}
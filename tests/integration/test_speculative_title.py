@@ -0,0 +1,56 @@
+import time
+from unittest.mock import MagicMock
+from src.services.chat_service import ChatService
+from src.services.title_service import TitleService
+
+def _service(speculative=True):
+    service = ChatService()
+    service.title_service = TitleService()
+    service.title_service.speculative = speculative
+    service.rails_client = MagicMock()
+    service.rails_client.create_chat_session.return_value = {"session_uuid": "uuid-1"}
+    service.rails_client.create_interaction.return_value = {"id": 1}
+    return service
+
+def test_title_and_reply_run_in_parallel():
+    service = _service()
+    
+    def slow_reply(*args, **kwargs):
+        time.sleep(0.2)
+        return {"content": "Reply"}
+    
+    def slow_title(*args, **kwargs):
+        time.sleep(0.15)
+        return {"content": "Title"}
+    
+    service.ollama_client.request = slow_reply
+    service.title_service.ollama.request = slow_title
+    
+    start_time = time.time()
+    result = service.create_text_session("Hello there", "test-user")
+    
+    assert time.time() - start_time < 0.3
+    assert result['title'] == "Title"
+    assert result['response'] == "Reply"
+    assert service.rails_client.create_chat_session.call_args.kwargs['title'] == "Title"
+
+def test_slow_title_does_not_delay_reply():
+    service = _service()
+    service.ollama_client.request = MagicMock(return_value={"content": "Reply"})
+    service.title_service.ollama.request = lambda *args, **kwargs: time.sleep(0.5) or {"content": "Late"}
+    
+    start_time = time.time()
+    result = service.create_text_session("Hello there", "test-user")
+    
+    assert time.time() - start_time < 0.3
+    assert result['title'] == "Hello there"
+    assert result['response'] == "Reply"
+
+def test_failed_title_falls_back():
+    title_service = TitleService()
+    title_service.speculative = True
+    title_service.generate_title = MagicMock(side_effect=Exception("Title model down"))
+    
+    title, reply = title_service.generate_title_with_reply("x" * 60, lambda: "Reply")
+    assert title == "x" * 50 + "..."
+    assert reply == "Reply"
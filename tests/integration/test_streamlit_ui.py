@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from streamlit.testing.v1 import AppTest
+from ui.chat_session_manager import ChatSessionManager
+
+def _service(chunks):
+    service = MagicMock()
+    service.ollama_client.stream.side_effect = lambda *args, **kwargs: iter(chunks)
+    service.ollama_client.llm_model = 'llama3.2'
+    service.title_service.generate_title.return_value = "Greetings"
+    service.rails_client.create_chat_session.return_value = {"session_uuid": "uuid-1"}
+    service.create_interaction.return_value = {"id": 7}
+    return service
+
+def test_manager_streams_tokens_and_reuses_session():
+    service = _service(["Hello", " there", "."])
+    with patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        manager = ChatSessionManager(service)
+
+    assert list(manager.response_generator("Hi")) == ["Hello", " there", "."]
+    assert manager.session_uuid == "uuid-1"
+    assert {'first_token_ms', 'generation_ms', 'session_ms', 'persist_ms', 'total_ms'} <= set(manager.timings)
+
+    assert "".join(manager.response_generator("And now?")) == "Hello there."
+    service.rails_client.create_chat_session.assert_called_once()
+    assert 'session_ms' not in manager.timings
+    history = service.ollama_client.stream.call_args.kwargs['history']
+    assert history == [{'role': 'user', 'content': 'Hi'}, {'role': 'assistant', 'content': 'Hello there.'}]
+
+def test_manager_raises_stream_errors():
+    service = _service([])
+    service.ollama_client.stream.side_effect = ConnectionError("Ollama down")
+    with patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        manager = ChatSessionManager(service)
+
+    with pytest.raises(ConnectionError):
+        list(manager.response_generator("Hi"))
+
+def test_turn_after_failed_or_abandoned_turn_gets_its_own_reply():
+    replies = iter([ConnectionError("Ollama down"), ["first"], ["second", " reply"], ["third"]])
+
+    def stream(*args, **kwargs):
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return iter(reply)
+
+    service = _service([])
+    service.ollama_client.stream.side_effect = stream
+    with patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        manager = ChatSessionManager(service)
+
+    with pytest.raises(ConnectionError):
+        list(manager.response_generator("Hi"))
+    assert list(manager.response_generator("Again")) == ["first"]
+
+    abandoned = manager.response_generator("Dropped")
+    assert next(abandoned) == "second"
+    abandoned.close()
+    assert list(manager.response_generator("Last")) == ["third"]
+
+def test_app_keeps_manager_across_reruns():
+    service = _service(["Hello", " there."])
+    with patch('src.services.chat_service.get_chat_service', return_value=service), \
+         patch('src.services.conversation.get_audio_service', return_value=MagicMock()):
+        app = AppTest.from_file('../../app.py', default_timeout=10).run()
+        manager = app.session_state['chat_manager']
+
+        app.chat_input[0].set_value("Hi").run()
+        app.chat_input[0].set_value("Again").run()
+
+    assert app.session_state['chat_manager'] is manager
+    assert manager.session_uuid == "uuid-1"
+    service.rails_client.create_chat_session.assert_called_once()
+    assert [m['content'] for m in app.session_state['messages']] == ["Hi", "Hello there.", "Again", "Hello there."]
+    assert 'total_ms' in app.session_state['messages'][-1]['timings']
+    assert not app.exception
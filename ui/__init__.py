@@ -1 +1 @@
-from .ollama_client import OllamaClient
\ No newline at end of file
+from .chat_session_manager import ChatSessionManager
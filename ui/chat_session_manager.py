@@ -1,28 +1,63 @@
-import time
-from src.services.chat_service import ChatService
+import queue
+import threading
+from src.services.conversation import Conversation
+
+_DONE = object()
 
 class ChatSessionManager:
-    def __init__(self):
-        self.chat_service = ChatService()
-        self.session_uuid = None
-
-    def response_generator(self, prompt):
-        start_time = time.time()
-
-        firebase_uid = 'dev-user'
-        
-        if self.session_uuid:
-            result = self.chat_service.send_text_message(self.session_uuid, prompt, firebase_uid)
-        else:
-            result = self.chat_service.create_text_session(prompt, firebase_uid)
-            self.session_uuid = result["session_uuid"]
-        
-        full_response = result["response"]
-        
-        chunk_size = 5
-        for i in range(0, len(full_response), chunk_size):
-            yield full_response[i:i + chunk_size]
-            time.sleep(0.01)
-
-        total_time_elapsed = time.time() - start_time
-        yield f"\n\n---\n⏱️ Total Process Time: {total_time_elapsed:.2f} seconds\n"
+    """
+    One Streamlit chat, kept in st.session_state across reruns.
+
+    Wraps a Conversation, so the session is created on the first prompt and
+    reused afterwards, and the recent turns stay in memory instead of being
+    fetched again for every prompt.
+
+    Args:
+        chat_service: ChatService shared by the Streamlit process
+        firebase_uid: User the sessions belong to
+    """
+    def __init__(self, chat_service=None, firebase_uid: str = 'dev-user'):
+        self.conversation = Conversation(firebase_uid, None, chat_service=chat_service)
+        self.timings = {}
+        self._worker = None
+
+    @property
+    def session_uuid(self):
+        return self.conversation.session_uuid
+
+    def response_generator(self, prompt: str):
+        """
+        Yield the reply as the model streams it; the stage timings of the turn
+        are left in self.timings.
+
+        The turn runs on a worker thread that only fills the turn's own event
+        queue, so every Streamlit call stays on the script thread and events of
+        a failed or abandoned turn never reach the next one.
+        """
+        if self._worker is not None:
+            # A turn Streamlit stopped reading still updates the history when it ends
+            self._worker.join()
+        self.timings = {}
+        events = queue.Queue()
+        self.conversation.emit = events.put
+        worker = self._worker = threading.Thread(target=self._run, args=(prompt, events), name='streamlit-turn', daemon=True)
+        worker.start()
+        while True:
+            event = events.get()
+            if event is _DONE:
+                break
+            if isinstance(event, Exception):
+                raise event
+            if event['type'] == 'token':
+                yield event['text']
+            elif event['type'] == 'reply':
+                self.timings = event['timings']
+        worker.join()
+
+    def _run(self, prompt: str, events: queue.Queue):
+        try:
+            self.conversation.send_text(prompt)
+        except Exception as e:
+            events.put(e)
+        finally:
+            events.put(_DONE)